@@ -0,0 +1,50 @@
+import os
+
+from airflow import DAG
+from airflow.decorators import task
+from datetime import datetime, timedelta
+
+from tasks.backfill import backfill
+from tasks.load_data import load_shard
+from tasks.partition import discover_shards
+from utils.config_loader import load_business_params
+from utils.metrics import TaskMetrics
+
+DATA_DIR = "/opt/airflow/data"
+OUTPUT_DIR = "/opt/airflow/outputs"
+N_SHARDS = int(os.getenv("RECO_SHARDS", "8"))
+
+default_args = {
+    "start_date": datetime(2025, 9, 1),
+    "retries": 1,
+    "retry_delay": timedelta(seconds=30),
+}
+
+# Ручной запуск с {"start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}: рекомендации на каждую дату as_of
+# из диапазона за один проход по данным шарда (tasks.backfill) вместо запуска push_reco_dag_v2 на каждый день.
+# Шарды пишут в один датасет outputs/recommendations_backfill/run=<start>_<end>/ (партиции as_of=<дата>).
+with DAG(
+    dag_id="push_reco_backfill",
+    default_args=default_args,
+    schedule=None,
+    catchup=False,
+    params={"start": "2025-06-01", "end": "2025-08-29"},
+    tags=["hackathon"]
+) as dag:
+
+    @task
+    def shards():
+        return discover_shards(os.path.join(DATA_DIR, "clients.csv"), N_SHARDS)
+
+    @task
+    def backfill_shard(shard, params=None, ds=None):
+        writer_id = f"shard_{shard['shard']}"
+        with TaskMetrics("backfill", ds, writer_id, root=OUTPUT_DIR) as m:
+            tx, tr, clients = load_shard(DATA_DIR, shard["shard"], shard["n_shards"])
+            m.rows_in = len(tx) + len(tr)
+            result = backfill(tx, tr, clients, params["start"], params["end"], root=OUTPUT_DIR,
+                              params=load_business_params(), writer_id=writer_id)
+            m.rows_out = result["rows"]
+            return result
+
+    backfill_shard.expand(shard=shards())
@@ -0,0 +1,172 @@
+"""
+Бенчмарк горячего пути: load_data → compute_signals_batch → compute_products_batch → select_top_k
+на синтетических данных (utils.synthetic); этапы названы по замеряемым функциям.
+
+Запуск из pipeline/dags:
+    python -m benchmarks.hot_path                       # 1k, 100k, 1M клиентов
+    python -m benchmarks.hot_path --sizes 1000 10000 --compare benchmarks/results/<baseline>.json
+    python -m benchmarks.hot_path --workers 8            # + этап parallel_chain (tasks.parallel) на 8 процессах
+
+Каждый размер считается в отдельном процессе, чтобы peak RSS не наследовался от предыдущего.
+Результат — JSON в benchmarks/results/<время>_<commit>.json: по строке на (размер, этап)
+с секундами, клиентами/с, строками/с и peak RSS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from tasks.compute_benefits import compute_products_batch
+from tasks.compute_signals import compute_signals_batch
+from tasks.load_data import load_data
+from tasks.parallel import run_chain_parallel
+from tasks.select_best_product import select_top_k
+from utils.synthetic import generate_frames, write_csv
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# замедление этапа больше чем в REGRESSION_RATIO раз относительно baseline помечается в --compare
+REGRESSION_RATIO = 1.2
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS — байты
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_size(n_clients, work_dir, tx_per_client=40, tr_per_client=10, seed=0, workers=0):
+    """
+    Прогон всех этапов для n_clients клиентов; CSV пишутся в work_dir. Возвращает записи по этапам.
+    workers > 0 добавляет этап parallel_chain: signals -> products -> top-k в run_chain_parallel.
+    """
+    tx, tr, clients = generate_frames(n_clients, tx_per_client, tr_per_client, seed=seed)
+    paths = write_csv(work_dir, tx, tr, clients)
+    n_rows = len(tx) + len(tr)
+    del tx, tr, clients
+
+    records = []
+
+    def stage(name, rows, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - start
+        records.append({
+            "clients": n_clients,
+            "stage": name,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "clients_per_sec": round(n_clients / seconds, 1) if seconds else None,
+            "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        })
+        return result
+
+    # кеш Parquet в work_dir пустой — меряем холодное чтение CSV
+    tx, tr, clients = stage("load_data", n_rows, load_data,
+                            paths["transactions"], paths["transfers"], paths["clients"])
+    signals = stage("compute_signals_batch", n_rows, compute_signals_batch, tx, tr, clients)
+    _, utility = stage("compute_products_batch", len(signals), compute_products_batch, signals)
+    stage("select_top_k", len(utility), select_top_k, utility)
+    if workers:
+        stage("parallel_chain", n_rows, run_chain_parallel, tx, tr, clients, workers)
+    return records
+
+
+def _run_in_child(args):
+    n_clients, tx_per_client, tr_per_client, seed, workers = args
+    with tempfile.TemporaryDirectory(prefix="reco_bench_") as work_dir:
+        return run_size(n_clients, work_dir, tx_per_client, tr_per_client, seed, workers)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes, tx_per_client=40, tr_per_client=10, seed=0, workers=0):
+    """Все размеры, каждый в свежем процессе (spawn). Возвращает документ для сохранения в JSON."""
+    # не multiprocessing.Pool: его процессы daemonic и не могут запускать пул для parallel_chain
+    ctx = multiprocessing.get_context("spawn")
+    records = []
+    for n_clients in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            records += pool.submit(_run_in_child, (n_clients, tx_per_client, tr_per_client, seed, workers)).result()
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "params": {"tx_per_client": tx_per_client, "tr_per_client": tr_per_client, "seed": seed,
+                   "workers": workers, "cpu_count": os.cpu_count()},
+        "results": records,
+    }
+
+
+def save(doc, results_dir=None):
+    results_dir = results_dir or RESULTS_DIR
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = doc["timestamp"].replace(":", "").replace("-", "")[:15]
+    path = os.path.join(results_dir, f"{stamp}_{doc['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare(doc, baseline):
+    """Строки (clients, stage, baseline_s, current_s, ratio, regression) для общих (размер, этап)."""
+    before = {(r["clients"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    rows = []
+    for r in doc["results"]:
+        key = (r["clients"], r["stage"])
+        if key in before and before[key]:
+            ratio = r["seconds"] / before[key]
+            rows.append((*key, before[key], r["seconds"], round(ratio, 2), ratio > REGRESSION_RATIO))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--tx-per-client", type=int, default=40)
+    parser.add_argument("--tr-per-client", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="процессов для этапа parallel_chain (0 — без него)")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    doc = run(args.sizes, args.tx_per_client, args.tr_per_client, args.seed, args.workers)
+    path = save(doc, args.results_dir)
+    for r in doc["results"]:
+        print(f"{r['clients']:>9} {r['stage']:<20} {r['seconds']:>9.3f}s {r['clients_per_sec'] or 0:>12.0f} cl/s "
+              f"{r['peak_rss_mb']:>8.1f} MB")
+    print(f"saved: {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            rows = compare(doc, json.load(f))
+        for clients, stage, before, after, ratio, regression in rows:
+            print(f"{clients:>9} {stage:<20} {before:>8.3f}s -> {after:>8.3f}s x{ratio}"
+                  + ("  REGRESSION" if regression else ""))
+        return 1 if any(r[-1] for r in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Нагрузочный бенчмарк онлайн-сервиса (serving.online): p50/p99 латентности и запросы/с.
+
+Запуск из pipeline/dags:
+    python -m benchmarks.online_latency --clients 1000000 --concurrency 64 --requests 50000
+
+Сервис поднимается в этом же процессе на свободном порту и загружает снапшот тем же путём, что в проде:
+outputs/<ds>/recommendations.csv из синтетических рекомендаций через reload(). concurrency keep-alive
+соединений шлют GET /recommendation/<code>: доля --miss-share запросов — клиенты вне снапшота
+(у каждого свои client_<code>_*_3m.csv), они идут через compute_client. Во время нагрузки (кроме --no-swap)
+публикуется recommendations.csv нового ds (os.replace заранее записанного файла, как combine в DAG)
+и вызывается reload(): CSV парсится в потоке, пока event loop обслуживает запросы.
+Результат — JSON в benchmarks/results/online_<время>_<commit>.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.hot_path import RESULTS_DIR, _git_commit
+from serving.online import OnlineService
+from tasks.compute_benefits import PRODUCTS
+from utils.synthetic import generate_frames
+
+
+def synthetic_recommendations(n_clients, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "client_code": np.arange(1, n_clients + 1),
+        "rank": 1,
+        "product": rng.choice(PRODUCTS, n_clients),
+        "benefit": rng.uniform(0, 50_000, n_clients),
+        "utility": rng.uniform(0, 100, n_clients),
+    })
+
+
+def write_miss_clients(data_dir, codes, seed=0):
+    """Файлы client_<code>_*_3m.csv и clients.csv для клиентов вне снапшота."""
+    tx, tr, clients = generate_frames(len(codes), seed=seed)
+    remap = dict(zip(clients["client_code"], codes))
+    os.makedirs(data_dir, exist_ok=True)
+    for kind, frame in (("transactions", tx), ("transfers", tr)):
+        for code, part in frame.groupby("client_code"):
+            part.drop(columns="client_code").to_csv(
+                os.path.join(data_dir, f"client_{remap[code]}_{kind}_3m.csv"), index=False)
+    clients.assign(client_code=codes).to_csv(os.path.join(data_dir, "clients.csv"), index=False)
+
+
+async def _worker(host, port, codes, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for code in codes:
+            start = time.perf_counter()
+            writer.write(f"GET /recommendation/{code} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append((code, time.perf_counter() - start))
+            if b" 200 " not in status_line:
+                errors.append(status_line.decode().strip())
+    finally:
+        writer.close()
+
+
+async def run(n_clients=100_000, concurrency=64, n_requests=20_000, swap=True, miss_share=0.05, seed=0):
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir, output_dir = os.path.join(work_dir, "data"), os.path.join(work_dir, "outputs")
+        rng = np.random.default_rng(seed + 1)
+        codes = rng.integers(1, n_clients + 1, n_requests)
+        # промахи — разные клиенты вне снапшота: каждый промах — полный расчёт, а не кеш
+        n_miss = int(round(n_requests * miss_share))
+        miss_codes = np.arange(n_clients + 1, n_clients + 1 + n_miss)
+        codes[rng.choice(n_requests, n_miss, replace=False)] = miss_codes
+        write_miss_clients(data_dir, miss_codes, seed)
+
+        for ds, recs_seed in (("2025-09-01", seed), ("2025-09-02", seed + 2)):
+            path = os.path.join(output_dir, ds, "recommendations.csv")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # второй снапшот пока не опубликован: подменяется в середине прогона
+            synthetic_recommendations(n_clients, recs_seed).to_csv(
+                path if ds == "2025-09-01" else f"{path}.tmp", index=False)
+        next_path = os.path.join(output_dir, "2025-09-02", "recommendations.csv")
+
+        service = OnlineService(data_dir=data_dir, output_dir=output_dir, poll_interval=3600)
+        await service.reload()
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        latencies, errors = [], []
+        swap_seconds = None
+
+        async def swap_midway():
+            nonlocal swap_seconds
+            while len(latencies) < n_requests // 2:
+                await asyncio.sleep(0.01)
+            started = time.perf_counter()
+            os.replace(f"{next_path}.tmp", next_path)
+            await service.reload()
+            swap_seconds = time.perf_counter() - started
+
+        start = time.perf_counter()
+        jobs = [_worker("127.0.0.1", port, part, latencies, errors) for part in np.array_split(codes, concurrency)]
+        if swap:
+            jobs.append(swap_midway())
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - start
+        server.close()
+        await server.wait_closed()
+
+    done = np.array([code for code, _ in latencies])
+    ms = np.array([latency for _, latency in latencies]) * 1000
+    miss = done > n_clients
+
+    def p99(values):
+        return round(float(np.percentile(values, 99)), 3) if len(values) else None
+
+    return {
+        "clients": n_clients,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "misses": int(miss.sum()),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": p99(ms),
+        "hit_p99_ms": p99(ms[~miss]),
+        "miss_p99_ms": p99(ms[miss]),
+        "max_ms": round(float(ms.max()), 3),
+        "swap_reload_ms": round(swap_seconds * 1000, 1) if swap_seconds is not None else None,
+        "swapped_to": service.snapshot.snapshot_id,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--no-swap", action="store_true")
+    parser.add_argument("--miss-share", type=float, default=0.05, help="доля запросов к клиентам вне снапшота")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.clients, args.concurrency, args.requests, swap=not args.no_swap,
+                             miss_share=args.miss_share))
+    now = datetime.now(timezone.utc)
+    doc = {"commit": _git_commit(), "timestamp": now.isoformat(timespec="seconds"), "result": result}
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"online_{now:%Y%m%dT%H%M%S}_{doc['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False))
+    print(f"saved: {path}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
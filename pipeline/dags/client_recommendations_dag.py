@@ -1,15 +1,54 @@
+import os
+import time
+from contextlib import nullcontext
+
+import pandas as pd
 from airflow import DAG
 from airflow.decorators import task
 from datetime import datetime, timedelta
 
-from tasks.load_data import load_data
-from tasks.compute_signals import compute_signals
-from tasks.compute_benefits import compute_products
-from tasks.select_best_product import select_best_product
+from tasks.load_data import load_shard
+from tasks.partition import discover_shards
+from tasks.compute_signals import compute_signals_batch, signals_for_client
+from tasks.incremental_signals import STATE_DIR, load_state, load_watermark, save_state, signals_from_state, update_state
+from tasks.compute_benefits import TRACE_LEVEL, compute_products_batch, explain_products_batch
+from tasks.select_best_product import select_top_k, top_k_to_frame
 from tasks.generate_summary import generate_summary
 from tasks.send_notification_with_mobile import send_notification
-from tasks.send_notification import send_notification_to_mobile
-from utils.config_loader import load_config
+from tasks.send_notification import send_notifications_batch
+from tasks.render_templates import TemplateRenderer
+from tasks.push_notification_redis import publish_notifications
+from utils.config_loader import load_business_params, load_product_plan, load_templates
+from utils.artifacts import write_frame, read_frame, remove_run
+from utils.push_cache import PushCache
+from utils.result_sink import ResultSink, read_dataset
+from utils.firebase import FcmBatchSender
+from utils.metrics import TaskMetrics, write_run_summary
+from utils.feature_store import FEATURE_STORE_DIR, publish_features
+
+DATA_DIR = "/opt/airflow/data"
+OUTPUT_DIR = "/opt/airflow/outputs"
+# число шардов по hash(client_code); каждый шард — отдельный mapped task на своём воркере
+N_SHARDS = int(os.getenv("RECO_SHARDS", "8"))
+TOP_K = 3
+# RECO_INCREMENTAL=1: сигналы из персистентного состояния по окну вместо пересчёта всех 3 месяцев
+INCREMENTAL = os.getenv("RECO_INCREMENTAL", "0") == "1"
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "5"))
+# клиенты с выгодой от этой суммы получают текст от LLM, остальные — по шаблону продукта
+RICH_COPY_MIN_BENEFIT = float(os.getenv("RICH_COPY_MIN_BENEFIT", "inf"))
+# FCM_SEND=1: отправлять готовые тексты в FCM пулом из FCM_WORKERS соединений
+FCM_SEND = os.getenv("FCM_SEND", "0") == "1"
+FCM_WORKERS = int(os.getenv("FCM_WORKERS", "32"))
+# STREAM_PUBLISH=1: публиковать готовые пуши в Redis Stream STREAM ("notifications") для внешних отправщиков
+STREAM_PUBLISH = os.getenv("STREAM_PUBLISH", "0") == "1"
+# SCORING_TRACE>=1: трейс скоринга по выборке клиентов шарда в датасет outputs/scoring_trace
+SCORING_TRACE_SAMPLE = int(os.getenv("SCORING_TRACE_SAMPLE", "100"))
+
+
+def _state_dir(shard, n_shards):
+    return os.path.join(STATE_DIR, f"shards_{n_shards}", f"shard_{shard}")
+
 
 default_args = {
     "start_date": datetime(2025, 9, 1),
@@ -27,54 +66,151 @@ with DAG(
 ) as dag:
 
     @task
-    def load():
-        tx, tr, clients = load_data(
-            "/opt/airflow/data/client_2_transactions_3m.csv",
-            "/opt/airflow/data/client_2_transfers_3m.csv",
-            "/opt/airflow/data/clients.csv"
-        )
-        client_code = 2
-        avg_monthly_balance = clients[clients['client_code'] == client_code]['avg_monthly_balance_KZT'].values[0]
-        return {"transactions": tx, "transfers": tr, "avg_monthly_balance": avg_monthly_balance}
+    def shards():
+        return discover_shards(os.path.join(DATA_DIR, "clients.csv"), N_SHARDS)
 
     @task
-    def compute(loaded):
-        signals = compute_signals(loaded)
-        return signals
-    
+    def load(shard, ds=None):
+        prefix = f"shard_{shard['shard']}"
+        with TaskMetrics("load", ds, prefix, root=OUTPUT_DIR) as m:
+            since, modified_after, scanned_at = None, None, None
+            if INCREMENTAL:
+                # delta-скан: только файлы, изменённые с прошлого скана, и строки новее watermark
+                scanned_at = time.time_ns()
+                since, modified_after = load_watermark(_state_dir(shard["shard"], shard["n_shards"]))
+            tx, tr, clients = load_shard(DATA_DIR, shard["shard"], shard["n_shards"], since=since,
+                                         modified_after=modified_after)
+            m.rows_in = m.rows_out = len(tx) + len(tr)
+            return {
+                "shard": shard["shard"],
+                "n_shards": shard["n_shards"],
+                "scanned_at": scanned_at,
+                "transactions": write_frame(tx, ds, f"{prefix}_transactions"),
+                "transfers": write_frame(tr, ds, f"{prefix}_transfers"),
+                "clients": write_frame(clients, ds, f"{prefix}_clients"),
+            }
+
+    @task
+    def compute(loaded, ds=None):
+        with TaskMetrics("compute", ds, f"shard_{loaded['shard']}", root=OUTPUT_DIR) as m:
+            tx = read_frame(loaded["transactions"], columns=["client_code", "date", "category", "amount"])
+            tr = read_frame(loaded["transfers"], columns=["client_code", "date", "type", "direction", "amount"])
+            clients = read_frame(loaded["clients"], columns=["client_code", "avg_monthly_balance_KZT"])
+            m.rows_in = len(tx) + len(tr)
+            if INCREMENTAL:
+                # состояние на шард: load уже прочитал только новые дни после watermark
+                path = _state_dir(loaded["shard"], loaded["n_shards"])
+                state = update_state(load_state(path), tx, tr)
+                state["scanned_at"] = loaded["scanned_at"]
+                save_state(state, path)
+                signals = signals_from_state(state, clients.set_index("client_code")["avg_monthly_balance_KZT"])
+            else:
+                signals = compute_signals_batch(tx, tr, clients)
+            m.rows_out = len(signals)
+            return {
+                "shard": loaded["shard"],
+                "clients": loaded["clients"],
+                "signals": write_frame(signals, ds, f"shard_{loaded['shard']}_signals"),
+            }
+
+    @task
+    def benefits(sigs, ds=None):
+        prefix = f"shard_{sigs['shard']}"
+        with TaskMetrics("benefits", ds, prefix, root=OUTPUT_DIR) as m:
+            # ставки из business_params.yaml и продукты из products.yaml: кеш на процесс,
+            # перечитываются и перекомпилируются при изменении файлов
+            signals = read_frame(sigs["signals"])
+            params = load_business_params()
+            plan = load_product_plan(params=params)
+            benefit, utility = compute_products_batch(signals, params, plan)
+            m.rows_in, m.rows_out = len(signals), benefit.size
+            if TRACE_LEVEL:
+                trace = explain_products_batch(signals, params, sample=SCORING_TRACE_SAMPLE, seed=sigs["shard"],
+                                               plan=plan)
+                with ResultSink(OUTPUT_DIR, "scoring_trace", run_id=ds, writer_id=prefix) as sink:
+                    sink.write_many(trace.to_dict("records"))
+            return {
+                **sigs,
+                "benefit": write_frame(benefit, ds, f"{prefix}_benefit"),
+                "utility": write_frame(utility, ds, f"{prefix}_utility"),
+            }
+
     @task
-    def benefits(sigs):
-        b = compute_products(sigs)
-        return b
+    def select_and_summary(ben, ds=None):
+        writer_id = f"shard_{ben['shard']}"
+        with TaskMetrics("select_and_summary", ds, writer_id, root=OUTPUT_DIR) as m:
+            signals = read_frame(ben["signals"])
+            clients = read_frame(ben["clients"])
+            names = clients.set_index("client_code")["name"].to_dict() if "name" in clients.columns else {}
+            recs = top_k_to_frame(select_top_k(read_frame(ben["utility"]), k=TOP_K), read_frame(ben["benefit"]))
+            m.rows_in = len(signals)
+            best = recs[recs["rank"] == 1]
+            summaries, items = [], []
+            for row in best.itertuples(index=False):
+                summary = generate_summary((row.product, {"benefit": row.benefit}))
+                sig = signals_for_client(signals, row.client_code)
+                items.append({
+                    "client_profile": {
+                        "client_code": row.client_code,
+                        "name": names.get(row.client_code),
+                        "avg_monthly_balance_KZT": sig["avg_balance"],
+                        "fcm_token": "dummytoken"
+                    },
+                    "best_product": row.product,
+                    "best_value": row.benefit,
+                    "category_spend": sig.get("category_spend", {}),
+                    "top3": sig.get("top_categories", []),
+                    "summary": summary,
+                    "rich_copy": row.benefit >= RICH_COPY_MIN_BENEFIT,
+                })
+                summaries.append(summary)
+            # сначала шаблоны; LLM (параллельно, с rate limit и кешем) — для rich copy и невалидных шаблонов
+            with ResultSink(OUTPUT_DIR, "push_logs", run_id=ds, writer_id=writer_id) as push_logs, \
+                    PushCache() as cache, \
+                    (FcmBatchSender(max_workers=FCM_WORKERS) if FCM_SEND else nullcontext()) as sender:
+                texts = send_notifications_batch(items, renderer=TemplateRenderer(load_templates()), sender=sender,
+                                                 sink=push_logs, concurrency=LLM_CONCURRENCY,
+                                                 rate_per_sec=LLM_RATE_PER_SEC, cache=cache)
+            if STREAM_PUBLISH:
+                publish_notifications(
+                    (str(item["client_profile"]["client_code"]), {"product": item["best_product"], "text": text})
+                    for item, text in zip(items, texts) if text is not None
+                )
+            recs["summary"] = recs["client_code"].map(dict(zip(best["client_code"], summaries)))
+            with ResultSink(OUTPUT_DIR, "recommendations", run_id=ds, writer_id=writer_id) as sink:
+                sink.write_many(recs)
+            m.rows_out = len(recs)
+            return {"rows": len(recs), "signals": ben["signals"]}
 
     @task
-    def select_and_summary(ben, sigs):
-        best = select_best_product(ben)
-        product, data = best
-        value = ben[product]["benefit"]
-        summary = generate_summary(best)
-        send_notification_to_mobile(
-            client_profile={
-            "client_code": 2,
-            "avg_monthly_balance_KZT": 1000000,
-            "fcm_token": "dummytoken"
-            },
-            best_product=product,
-            best_value=value,
-            category_spend=sigs.get("category_spend", {}),
-            top3=sigs.get("top_categories", []),
-            summary=summary
-        )
-        return summary
+    def combine(shard_results, ds=None):
+        recs = read_dataset(OUTPUT_DIR, "recommendations", ds)
+        if recs.empty:
+            # ни у одного шарда нет транзакций — снапшот без строк, но с заголовком
+            recs = pd.DataFrame(columns=["client_code", "rank", "product", "benefit", "utility", "summary"])
+        recs = recs.sort_values(["client_code", "rank"], kind="stable")
+        out_path = os.path.join(OUTPUT_DIR, ds, "recommendations.csv")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        # tmp + os.replace: онлайн-сервис (serving.online) не должен увидеть недописанный снапшот
+        recs.to_csv(f"{out_path}.tmp", index=False)
+        os.replace(f"{out_path}.tmp", out_path)
+        # сигналы всех шардов — новой дневной версией feature store (по шарду в памяти за раз)
+        publish_features((read_frame(r["signals"]) for r in shard_results), FEATURE_STORE_DIR, version=ds)
+        remove_run(ds)
+        return f"Рекомендации собраны: {out_path} ({sum(r['rows'] for r in shard_results)} строк)"
 
     @task
-    def notify(summary):
-        send_notification(summary)
+    def notify(summary, ds=None):
+        with TaskMetrics("notify", ds, "notify", root=OUTPUT_DIR) as m:
+            send_notification(summary)
+            m.rows_in = m.rows_out = 1
+        # сводка по всем таскам запуска: outputs/<ds>/metrics.json
+        write_run_summary(OUTPUT_DIR, ds)
 
-    # задаём пайплайн (flows)
-    loaded = load()
-    sigs = compute(loaded)
-    ben = benefits(sigs)
-    summary = select_and_summary(ben, sigs)
+    # задаём пайплайн (flows): map по шардам, затем reduce
+    loaded = load.expand(shard=shards())
+    sigs = compute.expand(loaded=loaded)
+    ben = benefits.expand(sigs=sigs)
+    shard_results = select_and_summary.expand(ben=ben)
 
-    notify(summary)
\ No newline at end of file
+    notify(combine(shard_results))
@@ -0,0 +1,324 @@
+"""
+Онлайн-сервис «лучший продукт для клиента X» поверх последнего батч-прогона DAG.
+
+    python -m serving.online --port 8090
+    GET /recommendation/<client_code>  -> {"client_code", "product", "utility", "benefit", "source", "snapshot"}
+    GET /health                        -> {"snapshot", "clients"}
+    POST /reload                       -> принудительная проверка нового снапшота
+
+Снапшот — outputs/<ds>/recommendations.csv последнего ds (rank 1 на клиента), в памяти как
+отсортированные numpy-массивы: поиск — searchsorted. Фоновая задача раз в poll_interval секунд
+ищет более новый файл, читает его в потоке и подменяет ссылку на снапшот одним присваиванием:
+запросы, начавшиеся до подмены, дочитывают старый снапшот, простоя нет.
+Клиентов, которых нет в снапшоте, считаем на лету (compute_signals → compute_products →
+select_best_product) по их файлам client_<code>_*_3m.csv в DATA_DIR.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.getenv("RECO_DATA_DIR", "/opt/airflow/data")
+OUTPUT_DIR = os.getenv("RECO_OUTPUT_DIR", "/opt/airflow/outputs")
+POLL_INTERVAL = float(os.getenv("RECO_SNAPSHOT_POLL", "30"))
+# сколько посчитанных на лету клиентов держать в памяти до следующего снапшота
+COMPUTED_CACHE_SIZE = 100_000
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class Snapshot:
+    """Лучший продукт на клиента: отсортированные client_code + параллельные массивы."""
+
+    def __init__(self, codes, products, product_idx, utility, benefit, snapshot_id=None):
+        self.codes = codes
+        self.products = products
+        self.product_idx = product_idx
+        self.utility = utility
+        self.benefit = benefit
+        self.snapshot_id = snapshot_id
+
+    @classmethod
+    def from_frame(cls, recs, snapshot_id=None):
+        """recs — client_code, rank, product, benefit, utility (recommendations.csv / top_k_to_frame)."""
+        best = recs[recs["rank"] == 1] if "rank" in recs.columns else recs
+        best = best.sort_values("client_code", kind="stable").drop_duplicates("client_code")
+        product_idx, products = pd.factorize(best["product"])
+        return cls(
+            best["client_code"].to_numpy(dtype=np.int64),
+            products.to_numpy(dtype=object),
+            product_idx.astype(np.int16),
+            best["utility"].to_numpy(dtype=np.float32),
+            best["benefit"].to_numpy(dtype=np.float32),
+            snapshot_id,
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get(self, client_code):
+        i = np.searchsorted(self.codes, client_code)
+        if i == len(self.codes) or self.codes[i] != client_code:
+            return None
+        return {
+            "client_code": int(client_code),
+            "product": self.products[self.product_idx[i]],
+            "utility": round(float(self.utility[i]), 3),
+            "benefit": round(float(self.benefit[i]), 2),
+        }
+
+
+def latest_snapshot_path(output_dir=OUTPUT_DIR):
+    """recommendations.csv с наибольшим ds (имена директорий — даты YYYY-MM-DD) или None."""
+    paths = sorted(glob.glob(os.path.join(output_dir, "*", "recommendations.csv")))
+    return paths[-1] if paths else None
+
+
+def load_snapshot(path):
+    recs = pd.read_csv(path, usecols=["client_code", "rank", "product", "benefit", "utility"])
+    snapshot_id = f"{os.path.basename(os.path.dirname(path))}@{os.stat(path).st_mtime_ns}"
+    return Snapshot.from_frame(recs, snapshot_id)
+
+
+def compute_client(client_code, data_dir=DATA_DIR, balances=None, params=None):
+    """
+    Рекомендация для клиента вне снапшота по его файлам; None, если транзакций нет.
+    params — BusinessParams батча (load_business_params()), чтобы оценки совпадали со снапшотом.
+    """
+    from tasks.compute_benefits import compute_products
+    from tasks.compute_signals import compute_signals
+    from tasks.load_data import TRANSACTIONS_SCHEMA, TRANSFERS_SCHEMA, _read_csv_typed
+    from tasks.select_best_product import select_best_product
+
+    tx_path = os.path.join(data_dir, f"client_{client_code}_transactions_3m.csv")
+    tr_path = os.path.join(data_dir, f"client_{client_code}_transfers_3m.csv")
+    if not os.path.exists(tx_path):
+        return None
+    transfers = _read_csv_typed(tr_path, TRANSFERS_SCHEMA) if os.path.exists(tr_path) else pd.DataFrame(
+        columns=["date", "type", "direction", "amount"]
+    )
+    signals = compute_signals({
+        "transactions": _read_csv_typed(tx_path, TRANSACTIONS_SCHEMA),
+        "transfers": transfers,
+        "avg_monthly_balance": (balances or {}).get(client_code, 0),
+    })
+    product, scores = select_best_product(compute_products(signals, client_code=client_code, params=params))
+    return {
+        "client_code": int(client_code),
+        "product": product,
+        "utility": round(float(scores["utility"]), 3),
+        "benefit": round(float(scores["benefit"]), 2),
+    }
+
+
+class OnlineService:
+    """
+    Состояние сервиса: текущий снапшот, кеш посчитанных на лету клиентов и фоновая подмена снапшота.
+    snapshot_source() -> путь к актуальному файлу (по умолчанию latest_snapshot_path).
+    """
+
+    def __init__(self, snapshot=None, data_dir=DATA_DIR, output_dir=OUTPUT_DIR, poll_interval=POLL_INTERVAL,
+                 snapshot_source=None, compute=compute_client, params_path=None):
+        self.snapshot = snapshot or Snapshot.from_frame(
+            pd.DataFrame(columns=["client_code", "rank", "product", "benefit", "utility"])
+        )
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self.snapshot_source = snapshot_source or (lambda: latest_snapshot_path(self.output_dir))
+        self.compute = compute
+        # business_params.yaml; load_business_params перечитывает его только при смене mtime
+        self.params_path = params_path
+        self._computed = OrderedDict()
+        self._inflight = {}
+        # балансы clients.csv для расчёта на лету: читаются в потоке первого промаха, сбрасываются в swap()
+        self._balances = None
+        self._balances_lock = threading.Lock()
+        self._balances_generation = 0
+        self._loaded_path = None
+        self._reload_lock = asyncio.Lock()
+
+    def swap(self, snapshot):
+        # одно присваивание: обработчики берут self.snapshot один раз в начале запроса
+        self.snapshot = snapshot
+        self._computed.clear()
+        # новый снапшот — новый прогон DAG: балансы перечитаются при следующем промахе
+        self._balances_generation += 1
+        self._balances = None
+
+    async def reload(self):
+        """Загружает снапшот, если файл новее текущего. True — снапшот подменён."""
+        async with self._reload_lock:
+            path = self.snapshot_source()
+            if path is None:
+                return False
+            key = (path, os.stat(path).st_mtime_ns)
+            if key == self._loaded_path:
+                return False
+            snapshot = await asyncio.to_thread(load_snapshot, path)
+            self.swap(snapshot)
+            self._loaded_path = key
+            logging.info(f"snapshot {snapshot.snapshot_id}: {len(snapshot)} клиентов")
+            return True
+
+    async def watch(self):
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:  # битый/недописанный файл — остаёмся на текущем снапшоте
+                logging.error(f"snapshot reload failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _balance_map(self):
+        """client_code -> avg_monthly_balance_KZT. Вызывается из потока to_thread, не из event loop."""
+        balances = self._balances
+        if balances is not None:
+            return balances
+        with self._balances_lock:
+            if self._balances is not None:
+                return self._balances
+            from tasks.load_data import CLIENTS_SCHEMA, read_cached
+
+            generation = self._balances_generation
+            path = os.path.join(self.data_dir, "clients.csv")
+            balances = {}
+            if os.path.exists(path):
+                clients = read_cached(path, CLIENTS_SCHEMA)
+                balances = clients.set_index("client_code")["avg_monthly_balance_KZT"].to_dict()
+            if generation == self._balances_generation:  # swap() во время чтения — не кешируем старое
+                self._balances = balances
+            return balances
+
+    def _compute(self, client_code):
+        from utils.config_loader import load_business_params
+
+        params = load_business_params(self.params_path) if self.params_path else None
+        return self.compute(client_code, self.data_dir, self._balance_map(), params)
+
+    async def recommend(self, client_code):
+        snapshot = self.snapshot
+        found = snapshot.get(client_code)
+        if found is not None:
+            return {**found, "source": "snapshot", "snapshot": snapshot.snapshot_id}
+        if client_code in self._computed:
+            self._computed.move_to_end(client_code)
+            result = self._computed[client_code]
+        else:
+            # параллельные запросы одного клиента ждут один расчёт
+            task = self._inflight.get(client_code)
+            if task is None:
+                task = asyncio.ensure_future(asyncio.to_thread(self._compute, client_code))
+                self._inflight[client_code] = task
+                task.add_done_callback(lambda _: self._inflight.pop(client_code, None))
+            result = await task
+            if snapshot is self.snapshot:
+                self._computed[client_code] = result
+                if len(self._computed) > COMPUTED_CACHE_SIZE:
+                    self._computed.popitem(last=False)
+        if result is None:
+            return None
+        return {**result, "source": "computed", "snapshot": snapshot.snapshot_id}
+
+    async def route(self, method, path):
+        """(status, body) для запроса."""
+        parts = path.split("?", 1)[0].strip("/").split("/")
+        if parts[0] == "recommendation" and len(parts) == 2:
+            if method != "GET":
+                return 405, {"error": "method not allowed"}
+            try:
+                client_code = int(parts[1])
+            except ValueError:
+                return 400, {"error": "client_code must be an integer"}
+            result = await self.recommend(client_code)
+            return (200, result) if result is not None else (404, {"error": "unknown client"})
+        if parts == ["health"]:
+            return 200, {"snapshot": self.snapshot.snapshot_id, "clients": len(self.snapshot)}
+        if parts == ["reload"]:
+            if method != "POST":
+                return 405, {"error": "method not allowed"}
+            return 200, {"reloaded": await self.reload(), "snapshot": self.snapshot.snapshot_id}
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader, writer):
+        """HTTP/1.1 с keep-alive: запросы одного соединения обрабатываются по очереди."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    status, body, version = 400, {"error": "bad request"}, "HTTP/1.0"
+                else:
+                    length = int(headers.get("content-length") or 0)
+                    if length:
+                        await reader.readexactly(length)
+                    try:
+                        status, body = await self.route(method, path)
+                    except Exception as e:
+                        logging.error(f"{method} {path}: {e}")
+                        status, body = 500, {"error": "internal error"}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                payload = json.dumps(body, ensure_ascii=False).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="0.0.0.0", port=8090):
+        """Загружает снапшот, запускает фоновую подмену и сервер. Возвращает asyncio.Server."""
+        await self.reload()
+        self._watcher = asyncio.ensure_future(self.watch())
+        return await asyncio.start_server(self.handle, host, port)
+
+    def stop(self):
+        watcher = getattr(self, "_watcher", None)
+        if watcher is not None:
+            watcher.cancel()
+
+
+async def serve(host="0.0.0.0", port=8090, **kwargs):
+    server = await OnlineService(**kwargs).start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online recommendation endpoint")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--params", help="business_params.yaml, те же ставки, что у батча (по умолчанию — встроенные)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    asyncio.run(serve(args.host, args.port, data_dir=args.data_dir, output_dir=args.output_dir,
+                      poll_interval=args.poll_interval, params_path=args.params))
+
+
+if __name__ == "__main__":
+    main()
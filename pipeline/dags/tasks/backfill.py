@@ -0,0 +1,236 @@
+"""
+Backfill истории рекомендаций: сигналы по окну WINDOW_DAYS и top-k на каждую дату as_of из диапазона
+за одну загрузку данных, вместо отдельного запуска DAG на каждый день.
+
+    python -m tasks.backfill --start 2025-06-01 --end 2025-08-29             # данные из RECO_DATA_DIR
+    python -m tasks.backfill --start ... --end ... --transactions tx.csv --transfers tr.csv --clients clients.csv
+
+Строки читаются один раз и сворачиваются в дневные агрегаты по (клиент, категория, день), (клиент, день)
+для переводов и (клиент, день) для дневных трат. По ним строятся префиксные суммы внутри каждой группы,
+и агрегат окна (as_of - WINDOW_DAYS, as_of] для любой даты — разность двух префиксов, найденных
+searchsorted. Не аддитивен только first_seen (тай-брейк топ-категорий): это минимум по дням окна,
+он считается одним minimum.reduceat по дневным ячейкам.
+
+Результат — датасет <root>/recommendations_backfill/run=<start>_<end>/writer=<шард>.<версия>/as_of=<дата>/
+part-*.parquet (ResultSink, partition_by="as_of"; читать через read_dataset), как recommendations.csv,
+но с колонкой as_of.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from tasks.compute_benefits import compute_products_batch
+from tasks.compute_signals import aggregate_transfers, signals_from_aggregates
+from tasks.incremental_signals import WINDOW_DAYS
+from tasks.load_data import load_data, load_shard
+from tasks.select_best_product import select_top_k, top_k_to_frame
+from utils.config_loader import load_business_params
+from utils.result_sink import ResultSink
+
+DATA_DIR = os.getenv("RECO_DATA_DIR", "/opt/airflow/data")
+OUTPUT_DIR = os.getenv("RECO_OUTPUT_DIR", "/opt/airflow/outputs")
+DATASET = "recommendations_backfill"
+TOP_K = 3
+
+
+class _Prefix:
+    """
+    Префиксные суммы дневных значений внутри групп. Строки отсортированы по (группа, день),
+    поэтому дни окна группы — непрерывный срез [lo, hi), а сумма по нему — cum[hi] - cum[lo].
+    """
+
+    def __init__(self, group, day, values, n_days):
+        self.n_days = n_days
+        key = group * (n_days + 1) + day
+        # выход groupby уже отсортирован по (группа, день) — тогда без перестановки
+        self.order = slice(None) if (np.diff(key) > 0).all() else np.argsort(key, kind="stable")
+        self.key = key[self.order]
+        group = group[self.order]
+        self.groups = group[np.concatenate([[True], group[1:] != group[:-1]])] if len(group) else group
+        self.cum = {name: np.concatenate([[0], np.cumsum(v[self.order])]) for name, v in values.items()}
+
+    def bounds(self, first_day, last_day):
+        """[lo, hi) строк каждой группы из self.groups с днями в [first_day, last_day]."""
+        # дни вне [0, n_days) заходили бы в ключи соседних групп
+        first_day, last_day = max(first_day, 0), min(last_day, self.n_days - 1)
+        if last_day < first_day:
+            empty = np.zeros(len(self.groups), dtype=np.int64)
+            return empty, empty
+        base = self.groups * (self.n_days + 1)
+        return (np.searchsorted(self.key, base + first_day, side="left"),
+                np.searchsorted(self.key, base + last_day, side="right"))
+
+    def sums(self, lo, hi):
+        return {name: cum[hi] - cum[lo] for name, cum in self.cum.items()}
+
+
+def _window_min(values, lo, hi):
+    # minimum.reduceat по чередующимся границам [lo0, hi0, lo1, hi1, ...]: чётные элементы — минимум
+    # среди [lo_i, hi_i); все срезы непустые, sentinel в конце допускает hi == len(values)
+    padded = np.append(values, values[-1] if len(values) else 0)
+    return np.minimum.reduceat(padded, np.column_stack([lo, hi]).ravel())[::2]
+
+
+class CumulativeAggregates:
+    """
+    Дневные кумулятивные агрегаты всех клиентов; window(as_of) — сигналы окна без прохода по строкам.
+
+    transactions — columns: client_code, date, category, amount
+    transfers    — columns: client_code, date, type, direction, amount
+    clients      — columns: client_code, avg_monthly_balance_KZT
+    """
+
+    def __init__(self, transactions, transfers, clients, window_days=WINDOW_DAYS):
+        self.window_days = window_days
+        self.balances = clients.set_index("client_code")["avg_monthly_balance_KZT"]
+        tx_day = pd.to_datetime(transactions["date"]).dt.normalize()
+        tr_day = pd.to_datetime(transfers["date"]).dt.normalize()
+        self.day0 = min(d for d in (tx_day.min(), tr_day.min()) if not pd.isna(d))
+        n_days = int((max(d for d in (tx_day.max(), tr_day.max()) if not pd.isna(d)) - self.day0).days) + 1
+
+        category = pd.Categorical(transactions["category"])
+        self.categories = category.categories
+        self.n_categories = len(self.categories)
+        codes = transactions["client_code"].to_numpy(dtype=np.int64)
+        self.clients = np.unique(codes)
+        client_idx = np.searchsorted(self.clients, codes)
+        day = (tx_day - self.day0).dt.days.to_numpy().astype(np.int64)
+
+        # (клиент, категория, день): сумма, число строк и позиция первой строки — как aggregate_transactions
+        # (строки без категории groupby там отбрасывает; в дневные траты они входят)
+        rows = pd.DataFrame({
+            "cell": client_idx * self.n_categories + category.codes,
+            "day": day,
+            "amount": transactions["amount"].to_numpy(),
+            "first_seen": np.arange(len(transactions)),
+        })[category.codes >= 0]
+        cells = rows.groupby(["cell", "day"]).agg(
+            amount=("amount", "sum"), count=("amount", "size"), first_seen=("first_seen", "min")
+        )
+        self.by_category = _Prefix(
+            cells.index.get_level_values("cell").to_numpy(dtype=np.int64),
+            cells.index.get_level_values("day").to_numpy(dtype=np.int64),
+            {"amount": cells["amount"].to_numpy(dtype=float), "count": cells["count"].to_numpy(dtype=np.int64)},
+            n_days,
+        )
+        self.first_seen = cells["first_seen"].to_numpy()[self.by_category.order]
+
+        # (клиент, день): сумма трат за день, её квадрат и факт наличия трат — для spending_stability
+        daily = transactions["amount"].groupby([client_idx, day]).sum()
+        spend = daily.to_numpy(dtype=float)
+        self.daily = _Prefix(
+            daily.index.get_level_values(0).to_numpy(dtype=np.int64),
+            daily.index.get_level_values(1).to_numpy(dtype=np.int64),
+            {"sum": spend, "sum_sq": spend * spend, "days": np.ones(len(spend), dtype=np.int64)},
+            n_days,
+        )
+
+        flows = aggregate_transfers(transfers, by_day=True)
+        self.flow_clients = np.unique(flows.index.get_level_values("client_code").to_numpy(dtype=np.int64))
+        self.flows = _Prefix(
+            np.searchsorted(self.flow_clients, flows.index.get_level_values("client_code").to_numpy(dtype=np.int64)),
+            (flows.index.get_level_values("date") - self.day0).days.to_numpy().astype(np.int64),
+            {c: flows[c].to_numpy(dtype=float) for c in flows.columns},
+            n_days,
+        )
+
+    def _days(self, as_of):
+        last = int((pd.Timestamp(as_of).normalize() - self.day0).days)
+        return last - self.window_days + 1, last
+
+    def window(self, as_of, details=True):
+        """Сигналы по окну (as_of - window_days, as_of] — как compute_signals_batch по строкам окна."""
+        first, last = self._days(as_of)
+
+        prefix = self.by_category
+        lo, hi = prefix.bounds(first, last)
+        present = hi > lo
+        if not present.any():
+            return pd.DataFrame(index=pd.Index([], dtype=np.int64, name="client_code"))
+        lo, hi, cell = lo[present], hi[present], prefix.groups[present]
+        sums = prefix.sums(lo, hi)
+        by_category = pd.DataFrame(
+            {"amount": sums["amount"], "count": sums["count"], "first_seen": _window_min(self.first_seen, lo, hi)},
+            index=pd.MultiIndex.from_arrays(
+                [self.clients[cell // self.n_categories],
+                 pd.Categorical.from_codes(cell % self.n_categories, self.categories)],
+                names=["client_code", "category"],
+            ),
+        )
+
+        lo, hi = self.daily.bounds(first, last)
+        daily = self.daily.sums(lo, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = daily["days"].astype(float)
+            mean = daily["sum"] / n
+            # std по дням с тратами (ddof=1, как pandas): NaN при одном дне
+            var = np.maximum(daily["sum_sq"] - daily["sum"] * mean, 0) / (n - 1)
+            stability = 1 - np.where(n > 1, np.sqrt(var), np.nan) / mean
+        active = daily["days"] > 0
+        stability = pd.Series(stability[active], index=self.clients[self.daily.groups[active]])
+
+        lo, hi = self.flows.bounds(first, last)
+        sums = self.flows.sums(lo, hi)
+        active = hi > lo
+        flows = pd.DataFrame({c: v[active] for c, v in sums.items()},
+                             index=self.flow_clients[self.flows.groups[active]])
+
+        return signals_from_aggregates(by_category, None, flows, self.balances, details=details, stability=stability)
+
+
+def backfill(transactions, transfers, clients, start, end, root=None, k=TOP_K, params=None,
+             window_days=WINDOW_DAYS, writer_id=None):
+    """
+    Рекомендации top-k на каждую дату as_of из [start, end] в один датасет DATASET, партиция — as_of.
+    Возвращает {"dataset": путь запуска, "dates": число дат, "rows": число строк}.
+    """
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+    # шард без транзакций и переводов: строк нет, но запуск датасета тот же
+    has_rows = len(transactions) or len(transfers)
+    aggregates = CumulativeAggregates(transactions, transfers, clients, window_days) if has_rows else None
+    run_id = f"{dates[0]:%Y-%m-%d}_{dates[-1]:%Y-%m-%d}"
+    rows = 0
+    with ResultSink(root or OUTPUT_DIR, DATASET, run_id=run_id, writer_id=writer_id or "backfill",
+                    fmt="parquet", partition_by="as_of") as sink:
+        for as_of in dates if aggregates else ():
+            signals = aggregates.window(as_of, details=False)
+            if signals.empty:
+                continue
+            benefit, utility = compute_products_batch(signals, params)
+            recs = top_k_to_frame(select_top_k(utility, k=k), benefit)
+            recs.insert(0, "as_of", f"{as_of:%Y-%m-%d}")
+            sink.write_frame(recs)
+            rows += len(recs)
+    return {"dataset": sink.dataset_dir, "dates": len(dates), "rows": rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, help="первая дата as_of, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="последняя дата as_of, YYYY-MM-DD")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="clients.csv и client_<code>_*_3m.csv")
+    parser.add_argument("--transactions", help="один CSV транзакций всех клиентов (вместе с --transfers и --clients)")
+    parser.add_argument("--transfers")
+    parser.add_argument("--clients")
+    parser.add_argument("--params", help="business_params.yaml (по умолчанию — ставки score_*)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--window-days", type=int, default=WINDOW_DAYS)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    if args.transactions:
+        tx, tr, clients = load_data(args.transactions, args.transfers, args.clients)
+    else:
+        tx, tr, clients = load_shard(args.data_dir, 0, 1)
+    params = load_business_params(args.params) if args.params else None
+    result = backfill(tx, tr, clients, args.start, args.end, root=args.output_dir, k=args.top_k,
+                      params=params, window_days=args.window_days)
+    print(f"{result['rows']} rows for {result['dates']} dates -> {result['dataset']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
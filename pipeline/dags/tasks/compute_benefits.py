@@ -1,4 +1,61 @@
 import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.config_loader import DEFAULT_PRODUCTS_PATH, BusinessParams, load_product_plan
+
+# ставки score_* по умолчанию — значения configs/business_params.yaml
+DEFAULT_PARAMS = BusinessParams()
+
+# --- trace --- #
+# SCORING_TRACE: 0 — выключен (по умолчанию; сообщения даже не форматируются),
+# 1 — DAG пишет трейс скоринга (explain_products_batch), 2 — compute_products ещё и печатает объяснения в лог.
+# Записи одного вызова compute_products собирает ScoringTrace, переданный вызывающим.
+TRACE_OFF, TRACE_RECORDS, TRACE_VERBOSE = 0, 1, 2
+TRACE_LEVEL = int(os.getenv("SCORING_TRACE", "0"))
+
+
+class ScoringTrace:
+    """
+    Объяснения одного вызова compute_products: reason codes по продуктам и итоговые записи.
+    Создаётся на вызов и передаётся в compute_products(trace=...), поэтому параллельные
+    вызовы (serving.online в потоках) ничего не делят и не копят между клиентами.
+    """
+
+    def __init__(self, client_code=None, verbose=False):
+        self.client_code = client_code
+        self.verbose = verbose
+        self.records = []
+        self._reasons = {}
+
+    def explain(self, label, reason, message, *args):
+        self._reasons.setdefault(label, []).append(reason)
+        if self.verbose:
+            print(f"[{label}] " + message.format(*args))
+
+    def finish(self, label, benefit=0, benefit_score=0, usage_score=0, utility=0):
+        self.records.append({
+            "client_code": self.client_code,
+            "product": label,
+            "benefit": benefit,
+            "benefit_score": benefit_score,
+            "usage_score": usage_score,
+            "utility": utility,
+            "reasons": ",".join(self._reasons.pop(label, [])),
+        })
+
+
+def _explain(trace, label, reason, message, *args):
+    """Без trace — no-op: message даже не форматируется."""
+    if trace is not None:
+        trace.explain(label, reason, message, *args)
+
+
+def _finish(trace, label, *scores):
+    if trace is not None:
+        trace.finish(label, *scores)
 
 # --- helpers --- #
 
@@ -12,71 +69,89 @@ def normalize(value, max_value):
     # Use min to cap the score at 100
     return min(100, (value / max_value) * 100)
 
-def make_score(benefit, usage_signal, max_value, alpha, beta, label):
+def make_score(benefit, usage_signal, max_value, alpha, beta, label, trace=None):
     """
     Calculates the final utility score based on benefit and usage signals.
-    Provides detailed logging for transparency.
+    Records an explanation into trace (ScoringTrace) when one is given.
     """
     if benefit <= 0:
-        print(f"[{label}] No potential benefit ({benefit:.2f} KZT). Utility is 0.")
+        _explain(trace, label, "NO_BENEFIT", "No potential benefit ({:.2f} KZT). Utility is 0.", benefit)
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
     benefit_score = normalize(benefit, max_value)
     usage_score = min(usage_signal, 100)
     utility = (alpha * benefit_score) + (beta * usage_score)
 
-    print(f"[{label}] Benefit: {benefit:.2f} KZT | Benefit Score: {benefit_score:.1f} | "
-          f"Usage Score: {usage_score:.1f} | Final Utility: {utility:.1f}")
-    
+    _explain(trace, label, "SCORED", "Benefit: {:.2f} KZT | Benefit Score: {:.1f} | "
+             "Usage Score: {:.1f} | Final Utility: {:.1f}", benefit, benefit_score, usage_score, utility)
+    _finish(trace, label, benefit, benefit_score, usage_score, utility)
+
     return {"benefit": benefit, "utility": utility}
 
+
+def _cap_cashback(benefit, params, label, trace):
+    """Выгода кешбэчной карты не больше params.cashback_cap (как min(..., cashback_cap) в products.yaml)."""
+    if benefit > params.cashback_cap:
+        _explain(trace, label, "CASHBACK_CAP", "Benefit {:.2f} KZT capped at {:.2f} KZT.", benefit, params.cashback_cap)
+        return params.cashback_cap
+    return benefit
+
+
 # --- scorers per product with explanations --- #
+# ставки — из params (utils.config_loader.BusinessParams), формулы совпадают с configs/products.yaml
 
-def score_travel_card(signals, alpha=0.9, beta=0.1): # <- Изменено: Выгода теперь важнее
+def score_travel_card(signals, alpha=0.9, beta=0.1, trace=None, params=DEFAULT_PARAMS): # <- Изменено: Выгода теперь важнее
     label = "Карта для путешествий"
     if 'travel_spend' not in signals:
-        print(f"[{label}] Missing 'travel_spend' signal. Skipping.")
+        _explain(trace, label, "MISSING_SIGNAL", "Missing 'travel_spend' signal. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
-    benefit = 0.04 * signals['travel_spend']
+    benefit = params.travel_cashback_rate * signals['travel_spend']
     if signals['travel_spend'] > 0:
-        print(f"[{label}] Detected travel spending. Base benefit is {benefit:.2f} KZT.")
+        _explain(trace, label, "TRAVEL_SPEND", "Detected travel spending. Base benefit is {:.2f} KZT.", benefit)
     else:
-        print(f"[{label}] No travel spending detected. Benefit is 0.")
+        _explain(trace, label, "NO_TRAVEL_SPEND", "No travel spending detected. Benefit is 0.")
+    benefit = _cap_cashback(benefit, params, label, trace)
 
     usage_signal = signals.get('travel_count', 0)
     if usage_signal > 10:
-        print(f"[{label}] Frequent travel purchases detected. High usage signal.")
+        _explain(trace, label, "FREQUENT_TRAVEL", "Frequent travel purchases detected. High usage signal.")
     
     # <- Изменено: Увеличили max_value, чтобы повысить benefit_score для этого продукта
     return make_score(benefit, usage_signal,
                       max_value=70_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_premium_card(signals, alpha=0.7, beta=0.3):
+def score_premium_card(signals, alpha=0.7, beta=0.3, trace=None, params=DEFAULT_PARAMS):
     label = "Премиальная карта"
     if 'total_spend' not in signals or 'avg_balance' not in signals:
-        print(f"[{label}] Missing required signals 'total_spend' or 'avg_balance'. Skipping.")
+        _explain(trace, label, "MISSING_SIGNAL", "Missing required signals 'total_spend' or 'avg_balance'. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
         
-    base_cashback_rate = 0.02 if signals['avg_balance'] < 100_000 else 0.04
-    premium_extra = 0.04 * signals.get('premium_spend', 0)
+    base_cashback_rate = (params.premium_base_rate if signals['avg_balance'] < params.premium_balance_threshold
+                          else params.premium_high_balance_rate)
+    premium_extra = params.premium_category_bonus * signals.get('premium_spend', 0)
     benefit = base_cashback_rate * signals['total_spend'] + premium_extra
     
-    print(f"[{label}] Base cashback rate is {base_cashback_rate*100:.0f}% based on avg balance.")
+    _explain(trace, label, "BASE_RATE", "Base cashback rate is {:.0f}% based on avg balance.", base_cashback_rate * 100)
     if signals.get('premium_spend', 0) > 0:
-        print(f"[{label}] Additional {premium_extra:.2f} KZT benefit from premium spending.")
+        _explain(trace, label, "PREMIUM_SPEND", "Additional {:.2f} KZT benefit from premium spending.", premium_extra)
+    benefit = _cap_cashback(benefit, params, label, trace)
         
     return make_score(benefit, signals.get('premium_count', 50),
                       max_value=100_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_credit_card(signals, alpha=1.0, beta=0.0):
+def score_credit_card(signals, alpha=1.0, beta=0.0, trace=None, params=DEFAULT_PARAMS):
     label = "Кредитная карта"
     if 'category_spend' not in signals or 'online_spend' not in signals or 'total_spend' not in signals:
-        print(f"[{label}] Missing signals: 'category_spend', 'online_spend', or 'total_spend'. Skipping.")
+        _explain(trace, label, "MISSING_SIGNAL", "Missing signals: 'category_spend', 'online_spend', or 'total_spend'. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
     top_spend = sum(signals['category_spend'].get(cat, 0)
@@ -85,154 +160,274 @@ def score_credit_card(signals, alpha=1.0, beta=0.0):
     total_spend = signals['total_spend']
 
     if total_spend <= 0:
-        print(f"[{label}] Total spending is zero. No benefit from credit card.")
+        _explain(trace, label, "ZERO_TOTAL_SPEND", "Total spending is zero. No benefit from credit card.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
-    relevant_spend_share = (top_spend + online_spend) / total_spend
-    relevant_spend_share = min(relevant_spend_share, 1.0)
-
-    max_benefit_value = 80_000
-    benefit = relevant_spend_share * max_benefit_value
+    benefit = params.credit_card_rate_top3 * top_spend + params.credit_card_online_rate * online_spend
     
-    print(f"[{label}] Share of spending in relevant categories: {relevant_spend_share:.1%}. "
-          f"Calculated benefit: {benefit:.2f} KZT.")
+    _explain(trace, label, "RELEVANT_SPEND", "Cashback on top categories ({:.2f} KZT) and online ({:.2f} KZT). "
+             "Calculated benefit: {:.2f} KZT.", top_spend, online_spend, benefit)
+    benefit = _cap_cashback(benefit, params, label, trace)
     
     return make_score(benefit, 0,
-                      max_value=max_benefit_value,
+                      max_value=80_000,
                       alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_cash_loan(signals, alpha=0.5, beta=0.5): # <- Изменено: Уменьшили вес выгоды, увеличили вес usage
+def score_cash_loan(signals, alpha=0.5, beta=0.5, trace=None, params=DEFAULT_PARAMS): # <- Изменено: Уменьшили вес выгоды, увеличили вес usage
     label = "Кредит наличными"
     if 'cash_gap_ratio' not in signals:
-        print(f"[{label}] Missing 'cash_gap_ratio' signal. Skipping.")
+        _explain(trace, label, "MISSING_SIGNAL", "Missing 'cash_gap_ratio' signal. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
         
     cash_gap = signals['cash_gap_ratio']
-    
-    if cash_gap <= 0.5:
+    threshold = params.loan_value_buffer_rate
+
+    if cash_gap <= threshold:
         benefit = 0
-        print(f"[{label}] Cash gap is too low ({cash_gap:.1%}). No benefit for a cash loan.")
+        _explain(trace, label, "LOW_CASH_GAP", "Cash gap is too low ({:.1%}). No benefit for a cash loan.", cash_gap)
     else:
-        severity_multiplier = (cash_gap - 0.5) * 2
+        severity_multiplier = (cash_gap - threshold) / (1 - threshold)
         severity_multiplier = min(severity_multiplier, 1.0)
-        
-        # <- Изменено: Уменьшили max_value, чтобы "утихомирить" высокий benefit
-        max_benefit_value = 150_000 
-        benefit = severity_multiplier * max_benefit_value
+        benefit = severity_multiplier * params.cash_loan_max_benefit
 
-        print(f"[{label}] Significant cash gap detected ({cash_gap:.1%}). "
-              f"Benefit multiplier: {severity_multiplier:.2f}.")
+        _explain(trace, label, "CASH_GAP", "Significant cash gap detected ({:.1%}). "
+                 "Benefit multiplier: {:.2f}.", cash_gap, severity_multiplier)
 
+    # <- Изменено: Уменьшили max_value, чтобы "утихомирить" высокий benefit
     return make_score(benefit, signals.get('loan_interest', 30),
-                      max_value=max_benefit_value, alpha=alpha, beta=beta,
-                      label=label)
+                      max_value=150_000, alpha=alpha, beta=beta,
+                      label=label, trace=trace)
 
 
-def score_fx(signals, alpha=0.5, beta=0.5):
+def score_fx(signals, alpha=0.5, beta=0.5, trace=None, params=DEFAULT_PARAMS):
     label = "Обмен валют"
     fx_activity = signals.get('fx_activity', 0)
     if fx_activity > 0:
-        benefit = 0.01 * fx_activity * 100_000
-        print(f"[{label}] Detected foreign currency activity. Benefit: {benefit:.2f} KZT.")
+        benefit = params.fx_saving_per_tx * fx_activity
+        _explain(trace, label, "FX_ACTIVITY", "Detected foreign currency activity. Benefit: {:.2f} KZT.", benefit)
     else:
         benefit = 0
-        print(f"[{label}] No foreign currency activity. Benefit is 0.")
+        _explain(trace, label, "NO_FX_ACTIVITY", "No foreign currency activity. Benefit is 0.")
     
     return make_score(benefit, signals.get('fx_count', 40),
                       max_value=150_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_savings(signals, alpha=0.8, beta=0.2):
+def score_savings(signals, alpha=0.8, beta=0.2, trace=None, params=DEFAULT_PARAMS):
     label = "Депозит сберегательный"
     if 'avg_balance' not in signals or signals['avg_balance'] <= 0:
-        print(f"[{label}] No average balance available. Skipping.")
+        _explain(trace, label, "NO_BALANCE", "No average balance available. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
         
-    benefit = 0.03 * signals['avg_balance']
-    print(f"[{label}] Benefit calculated as 3% of average balance ({signals['avg_balance']:.2f}).")
+    benefit = params.deposit_saving_frozen_rate_annual / 12 * signals['avg_balance']
+    _explain(trace, label, "BALANCE_RATE", "Benefit calculated as {:.2%} annual / 12 of average balance ({:.2f}).",
+             params.deposit_saving_frozen_rate_annual, signals['avg_balance'])
     
     return make_score(benefit, signals.get('savings_interest', 60),
                       max_value=100_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_accumulative_deposit(signals, alpha=0.7, beta=0.3):
+def score_accumulative_deposit(signals, alpha=0.7, beta=0.3, trace=None, params=DEFAULT_PARAMS):
     label = "Депозит накопительный"
     if 'avg_balance' not in signals or signals['avg_balance'] <= 0:
-        print(f"[{label}] No average balance available. Skipping.")
+        _explain(trace, label, "NO_BALANCE", "No average balance available. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
         
-    benefit = 0.025 * signals['avg_balance']
-    print(f"[{label}] Benefit calculated as 2.5% of average balance ({signals['avg_balance']:.2f}).")
+    benefit = params.deposit_accumulative_rate_annual / 12 * signals['avg_balance']
+    _explain(trace, label, "BALANCE_RATE", "Benefit calculated as {:.2%} annual / 12 of average balance ({:.2f}).",
+             params.deposit_accumulative_rate_annual, signals['avg_balance'])
 
     return make_score(benefit, signals.get('accum_interest', 60),
                       max_value=80_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_multi_deposit(signals, alpha=0.7, beta=0.3):
+def score_multi_deposit(signals, alpha=0.7, beta=0.3, trace=None, params=DEFAULT_PARAMS):
     label = "Депозит мультивалютный"
     if 'avg_balance' not in signals or signals['avg_balance'] <= 0:
-        print(f"[{label}] No average balance available. Skipping.")
+        _explain(trace, label, "NO_BALANCE", "No average balance available. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
         
-    benefit = 0.02 * signals['avg_balance']
-    print(f"[{label}] Benefit calculated as 2% of average balance ({signals['avg_balance']:.2f}).")
+    benefit = params.deposit_multicurr_rate_annual / 12 * signals['avg_balance']
+    _explain(trace, label, "BALANCE_RATE", "Benefit calculated as {:.2%} annual / 12 of average balance ({:.2f}).",
+             params.deposit_multicurr_rate_annual, signals['avg_balance'])
     
     return make_score(benefit, signals.get('multi_interest', 50),
                       max_value=70_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_investments(signals, alpha=0.8, beta=0.2):
+def score_investments(signals, alpha=0.8, beta=0.2, trace=None, params=DEFAULT_PARAMS):
     label = "Инвестиции"
     if 'avg_balance' not in signals or signals['avg_balance'] <= 0:
-        print(f"[{label}] No average balance available. Skipping.")
+        _explain(trace, label, "NO_BALANCE", "No average balance available. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
-    benefit = 0.015 * signals['avg_balance']
-    print(f"[{label}] Benefit calculated as 1.5% of average balance ({signals['avg_balance']:.2f}).")
+    benefit = params.investment_expected_annual_return / 12 * signals['avg_balance']
+    _explain(trace, label, "BALANCE_RATE", "Benefit calculated as {:.2%} annual / 12 of average balance ({:.2f}).",
+             params.investment_expected_annual_return, signals['avg_balance'])
 
     return make_score(benefit, signals.get('invest_interest', 50),
                       max_value=60_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 
-def score_gold(signals, alpha=0.9, beta=0.1):
+def score_gold(signals, alpha=0.9, beta=0.1, trace=None, params=DEFAULT_PARAMS):
     label = "Золотые слитки"
     if 'avg_balance' not in signals or signals['avg_balance'] <= 0:
-        print(f"[{label}] No average balance available. Skipping.")
+        _explain(trace, label, "NO_BALANCE", "No average balance available. Skipping.")
+        _finish(trace, label)
         return {"benefit": 0, "utility": 0}
 
-    benefit = 0.01 * signals['avg_balance']
-    print(f"[{label}] Benefit calculated as 1% of average balance ({signals['avg_balance']:.2f}).")
+    benefit = params.gold_expected_annual_return / 12 * signals['avg_balance']
+    _explain(trace, label, "BALANCE_RATE", "Benefit calculated as {:.2%} annual / 12 of average balance ({:.2f}).",
+             params.gold_expected_annual_return, signals['avg_balance'])
 
     return make_score(benefit, signals.get('gold_interest', 40),
                       max_value=50_000, alpha=alpha, beta=beta,
-                      label=label)
+                      label=label, trace=trace)
 
 # --- orchestrator --- #
 
-def compute_products(signals):
-    print("\n--- Starting Product Scoring ---")
+def compute_products(signals, client_code=None, trace=None, params=None):
+    """
+    Скоринг всех продуктов одного клиента. params — BusinessParams (load_business_params()),
+    по умолчанию DEFAULT_PARAMS; те же ставки, что у compute_products_batch, дают те же оценки.
+    trace — ScoringTrace для объяснений; без него при SCORING_TRACE=2 объяснения печатаются
+    во временный trace этого вызова.
+    """
+    params = params or DEFAULT_PARAMS
+    if trace is None and TRACE_LEVEL >= TRACE_VERBOSE:
+        trace = ScoringTrace(client_code, verbose=True)
+    if trace is not None and trace.verbose:
+        print("\n--- Starting Product Scoring ---")
     recommendations = {
-        "Карта для путешествий": score_travel_card(signals),
-        "Премиальная карта": score_premium_card(signals),
-        "Кредитная карта": score_credit_card(signals),
-        "Кредит наличными": score_cash_loan(signals),
-        "Обмен валют": score_fx(signals),
-        "Депозит сберегательный": score_savings(signals),
-        "Депозит накопительный": score_accumulative_deposit(signals),
-        "Депозит мультивалютный": score_multi_deposit(signals),
-        "Инвестиции": score_investments(signals),
-        "Золотые слитки": score_gold(signals),
+        "Карта для путешествий": score_travel_card(signals, trace=trace, params=params),
+        "Премиальная карта": score_premium_card(signals, trace=trace, params=params),
+        "Кредитная карта": score_credit_card(signals, trace=trace, params=params),
+        "Кредит наличными": score_cash_loan(signals, trace=trace, params=params),
+        "Обмен валют": score_fx(signals, trace=trace, params=params),
+        "Депозит сберегательный": score_savings(signals, trace=trace, params=params),
+        "Депозит накопительный": score_accumulative_deposit(signals, trace=trace, params=params),
+        "Депозит мультивалютный": score_multi_deposit(signals, trace=trace, params=params),
+        "Инвестиции": score_investments(signals, trace=trace, params=params),
+        "Золотые слитки": score_gold(signals, trace=trace, params=params),
     }
-    print("--- Finished Product Scoring ---\n")
+    if trace is not None and trace.verbose:
+        print("--- Finished Product Scoring ---\n")
     return recommendations
 
+# --- batch scorer: все клиенты × все продукты --- #
+
+PRODUCTS = [
+    "Карта для путешествий",
+    "Премиальная карта",
+    "Кредитная карта",
+    "Кредит наличными",
+    "Обмен валют",
+    "Депозит сберегательный",
+    "Депозит накопительный",
+    "Депозит мультивалютный",
+    "Инвестиции",
+    "Золотые слитки",
+]
+
+
+def _top_spend(signals):
+    if "top_spend" in signals.columns:
+        return signals["top_spend"].to_numpy(dtype=float)
+    return np.array([
+        sum(spend.get(cat, 0) for cat in top)
+        for spend, top in zip(signals["category_spend"], signals["top_categories"])
+    ], dtype=float)
+
+
+# колонки, которые план products.yaml умеет досчитать, если их нет в таблице сигналов
+_RESOLVERS = {"top_spend": _top_spend}
+
+
+def _plan(params, plan):
+    return plan or load_product_plan(DEFAULT_PRODUCTS_PATH, params or DEFAULT_PARAMS)
+
+
+def _score_arrays(signals, plan):
+    """make_score по матрицам плана products.yaml: normalize + cap usage, нулевая польза без выгоды."""
+    benefit, usage = plan.evaluate(signals, _RESOLVERS)
+    return score_matrices(benefit, usage, plan.alpha, plan.beta, plan.max_value)
+
+
+def score_matrices(benefit, usage, alpha, beta, max_value):
+    """
+    make_score на массивах: последняя ось — продукты, alpha / beta / max_value транслируются
+    по ней (например форма (variants, 1, products) для перебора весов в tasks.param_sweep).
+    Возвращает benefit, benefit_score, usage_score, utility, benefit_capped, usage_capped.
+    """
+    positive = benefit > 0
+    benefit = np.where(positive, benefit, 0)
+    # как normalize: при max_value <= 0 оценка выгоды 0, а не inf/NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(max_value > 0, benefit / max_value, 0.0)
+    benefit_score = np.where(positive, np.minimum(100, ratio * 100), 0)
+    usage_score = np.where(positive, np.minimum(usage, 100), 0)
+    utility = alpha * benefit_score + beta * usage_score
+    return benefit, benefit_score, usage_score, utility, benefit >= max_value, usage >= 100
+
+
+def compute_products_batch(signals, params=None, plan=None):
+    """
+    Векторный compute_products для таблицы сигналов (index client_code),
+    например из compute_signals_batch.
+    params — utils.config_loader.BusinessParams (load_business_params()); по умолчанию DEFAULT_PARAMS.
+    plan — ProductPlan (load_product_plan()); по умолчанию configs/products.yaml из репозитория
+    со ставками params.
+
+    Возвращает (benefit, utility) — DataFrame клиенты × продукты плана.
+    """
+    plan = _plan(params, plan)
+    benefit, _, _, utility, _, _ = _score_arrays(signals, plan)
+    return (
+        pd.DataFrame(benefit, index=signals.index, columns=plan.products),
+        pd.DataFrame(utility, index=signals.index, columns=plan.products),
+    )
+
+
+def explain_products_batch(signals, params=None, sample=None, seed=0, plan=None):
+    """
+    Трейс скоринга для батча: длинная таблица client_code × product с компонентами
+    make_score и reasons (NO_BENEFIT / BENEFIT_CAPPED / USAGE_CAPPED / SCORED).
+    sample — число случайных клиентов (детерминированно по seed), None — все.
+    """
+    if sample is not None and sample < len(signals):
+        signals = signals.sample(n=sample, random_state=seed).sort_index()
+    plan = _plan(params, plan)
+    benefit, benefit_score, usage_score, utility, benefit_capped, usage_capped = _score_arrays(signals, plan)
+
+    positive = benefit > 0
+    reasons = np.where(positive, "SCORED", "NO_BENEFIT").astype(object)
+    reasons = np.where(positive & benefit_capped, "BENEFIT_CAPPED," + reasons, reasons)
+    reasons = np.where(positive & usage_capped, "USAGE_CAPPED," + reasons, reasons)
+
+    n_clients, n_products = benefit.shape
+    return pd.DataFrame({
+        "client_code": np.repeat(signals.index.to_numpy(), n_products),
+        "product": np.tile(plan.products, n_clients),
+        "benefit": benefit.ravel(),
+        "benefit_score": benefit_score.ravel(),
+        "usage_score": usage_score.ravel(),
+        "utility": utility.ravel(),
+        "reasons": reasons.ravel(),
+    })
+
 # Пример использования с вашими исходными данными:
 # example_signals = {
 #     'travel_spend': 437894.0,
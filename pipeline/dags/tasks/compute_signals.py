@@ -1,5 +1,7 @@
-from utils.categories import TRAVEL_CATEGORIES, PREMIUM_CATEGORIES, ONLINE_CATEGORIES
+from utils.categories import REGISTRY, SPEND_GROUPS
+import numpy as np
 import pandas as pd
+
 # def compute_signals(client_profile, transactions):
 #     total_spend = transactions['amount'].sum()
 #     category_spend = transactions.groupby('category')['amount'].sum().to_dict()
@@ -31,24 +33,23 @@ def compute_signals(client_data):
     transactions = client_data['transactions'].copy()
     transfers = client_data['transfers'].copy()
     avg_balance = client_data['avg_monthly_balance']
+    if isinstance(transactions['category'].dtype, pd.CategoricalDtype):
+        # load_data отдаёт category как categorical; value_counts/groupby по нему тянут все категории
+        transactions['category'] = transactions['category'].astype(object)
 
     # --- Суммы и частоты ---
     total_spend = transactions['amount'].sum()
     category_spend = transactions.groupby('category')['amount'].sum().to_dict()
     category_count = transactions['category'].value_counts().to_dict()  # сколько раз тратили в категории
 
-    travel_spend = sum(category_spend.get(c, 0) for c in TRAVEL_CATEGORIES)
-    premium_spend = sum(category_spend.get(c, 0) for c in PREMIUM_CATEGORIES)
-    online_spend = sum(category_spend.get(c, 0) for c in ONLINE_CATEGORIES)
-
-    travel_count = sum(category_count.get(c, 0) for c in TRAVEL_CATEGORIES)
-    premium_count = sum(category_count.get(c, 0) for c in PREMIUM_CATEGORIES)
-    online_count = sum(category_count.get(c, 0) for c in ONLINE_CATEGORIES)
+    # суммы по группам: одна матрица принадлежности (категории × группы) из REGISTRY
+    categories, groups = list(category_spend), list(SPEND_GROUPS)
+    member = REGISTRY.membership(REGISTRY.encode(categories), groups)
+    group_spend = dict(zip(groups, member.T @ np.array([category_spend[c] for c in categories], dtype=float)))
+    group_count = dict(zip(groups, member.T @ np.array([category_count[c] for c in categories], dtype=np.int64)))
 
     # --- Shares (доли) ---
-    travel_share = travel_spend / total_spend if total_spend > 0 else 0
-    premium_share = premium_spend / total_spend if total_spend > 0 else 0
-    online_share = online_spend / total_spend if total_spend > 0 else 0
+    group_share = {g: group_spend[g] / total_spend if total_spend > 0 else 0 for g in groups}
 
     # --- Расходная стабильность ---
     transactions['date'] = pd.to_datetime(transactions['date'])
@@ -75,8 +76,7 @@ def compute_signals(client_data):
     top_category = top_categories[0] if top_categories else None
 
     # --- Proxy-флаг: любитель роскоши / украшений ---
-    JEWELRY_CATEGORIES = ["jewelry", "luxury", "boutique", "elite_restaurant"]
-    jewelry_need = int(any(cat in JEWELRY_CATEGORIES for cat in top_categories))
+    jewelry_need = int(REGISTRY.membership(REGISTRY.encode(top_categories), ["jewelry"]).any())
 
     # --- Сигналы ---
     signals = {
@@ -84,16 +84,10 @@ def compute_signals(client_data):
         "category_spend": category_spend,
         "category_count": category_count,
 
-        "travel_spend": travel_spend,
-        "premium_spend": premium_spend,
-        "online_spend": online_spend,
-        "travel_count": travel_count,
-        "premium_count": premium_count,
-        "online_count": online_count,
-
-        "travel_share": travel_share,
-        "premium_share": premium_share,
-        "online_share": online_share,
+        # <group>_spend / _count / _share по каждой группе SPEND_GROUPS
+        **{f"{g}_spend": group_spend[g] for g in groups},
+        **{f"{g}_count": group_count[g] for g in groups},
+        **{f"{g}_share": group_share[g] for g in groups},
 
         "monthly_spend_avg": total_spend / 1.5,  # если данные за полмесяца, делим на 1.5 мес
         "spending_stability": spending_stability,
@@ -112,4 +106,178 @@ def compute_signals(client_data):
         "avg_balance": avg_balance
     }
 
-    return signals
\ No newline at end of file
+    return signals
+
+# --- Batch mode: все клиенты за один проход --- #
+
+SIGNAL_KEYS = [
+    "total_spend", "category_spend", "category_count",
+    *(f"{g}_spend" for g in SPEND_GROUPS),
+    *(f"{g}_count" for g in SPEND_GROUPS),
+    *(f"{g}_share" for g in SPEND_GROUPS),
+    "monthly_spend_avg", "spending_stability",
+    "fx_activity", "fx_share",
+    "inflow_outflow_ratio", "cash_gap_ratio", "savings_propensity",
+    "top_categories", "top_category", "jewelry_need",
+    "avg_balance",
+]
+
+
+def aggregate_transactions(transactions):
+    """
+    Один grouped-проход по транзакциям всех клиентов.
+
+    Возвращает:
+      by_category — index (client_code, category): amount (сумма), count, first_seen
+                    (позиция первой строки — тай-брейк для топ-категорий, как у value_counts)
+      daily       — index (client_code, date): сумма трат за день
+    """
+    tx = transactions[["client_code", "date", "category", "amount"]]
+    by_category = (
+        tx.assign(first_seen=np.arange(len(tx)))
+          .groupby(["client_code", "category"], observed=True)
+          .agg(amount=("amount", "sum"), count=("amount", "size"), first_seen=("first_seen", "min"))
+    )
+    day = pd.to_datetime(tx["date"]).dt.normalize().rename("date")
+    daily = tx["amount"].groupby([tx["client_code"], day]).sum()
+    return by_category, daily
+
+
+def aggregate_transfers(transfers, by_day=False):
+    """
+    Один проход по переводам: total_in, total_out, fx_count, n_transfers по client_code
+    (by_day=True — по (client_code, date), для инкрементального состояния).
+    """
+    tr = transfers
+    is_fx = tr["type"].astype(str).str.contains("fx", case=False)
+    flows = pd.DataFrame({
+        "client_code": tr["client_code"],
+        "total_in": tr["amount"].where(tr["direction"] == "in", 0),
+        "total_out": tr["amount"].where(tr["direction"] == "out", 0),
+        "fx_count": is_fx.astype(int),
+        "n_transfers": 1,
+    })
+    if by_day:
+        flows["date"] = pd.to_datetime(tr["date"]).dt.normalize()
+        return flows.groupby(["client_code", "date"]).sum()
+    return flows.groupby("client_code").sum()
+
+
+def _group_sums(by_category, groups):
+    """
+    amount/count по всем группам одной агрегацией: коды категорий -> пары (строка, группа)
+    из масок REGISTRY -> один bincount по (client_code, группа).
+    Возвращает (amount, count) — DataFrame client_code × groups.
+    """
+    index = by_category.index
+    cat_level, client_level = index.names.index("category"), index.names.index("client_code")
+    # кодируем уникальные категории уровня, а не строки; -1 в codes MultiIndex (NaN) -> код -1
+    lookup = np.append(REGISTRY.encode(index.levels[cat_level]), -1)
+    rows, group = np.nonzero(REGISTRY.membership(lookup[index.codes[cat_level]], groups))
+    cell = index.codes[client_level][rows].astype(np.int64) * len(groups) + group
+
+    clients = index.levels[client_level]
+    size = len(clients) * len(groups)
+    amount = np.bincount(cell, weights=by_category["amount"].to_numpy(dtype=float)[rows], minlength=size)
+    count = np.bincount(cell, weights=by_category["count"].to_numpy()[rows], minlength=size)
+    return (
+        pd.DataFrame(amount.reshape(-1, len(groups)), index=clients, columns=groups),
+        pd.DataFrame(count.reshape(-1, len(groups)).astype(np.int64), index=clients, columns=groups),
+    )
+
+
+def _category_dicts(column):
+    """Series с MultiIndex (client_code, category) -> Series client_code -> {category: value}."""
+    clients = column.index.get_level_values(0)
+    categories = column.index.get_level_values(1)
+    values = column.tolist()
+    out = {}
+    for client, category, value in zip(clients, categories, values):
+        out.setdefault(client, {})[category] = value
+    return pd.Series(out, dtype=object)
+
+
+def signals_from_aggregates(by_category, daily, flows, balances, details=True, stability=None):
+    """
+    Собирает таблицу сигналов (одна строка на client_code) из агрегатов.
+    balances — Series client_code -> avg_monthly_balance.
+    details=False пропускает dict/list-колонки (category_spend, category_count, top_categories).
+    stability — готовая spending_stability по client_code (tasks.backfill считает её из префиксных
+    сумм); тогда daily не используется.
+    """
+    clients = by_category.index.get_level_values("client_code").unique().sort_values()
+    out = pd.DataFrame(index=clients)
+
+    totals = by_category.groupby(level="client_code")[["amount", "count"]].sum().reindex(clients, fill_value=0)
+    total_spend = totals["amount"]
+    out["total_spend"] = total_spend
+    if details:
+        out["category_spend"] = _category_dicts(by_category["amount"]).reindex(clients)
+        out["category_count"] = _category_dicts(by_category["count"]).reindex(clients)
+
+    groups = list(SPEND_GROUPS)
+    amount, count = (frame.reindex(clients, fill_value=0) for frame in _group_sums(by_category, groups))
+    for name in groups:
+        out[f"{name}_spend"] = amount[name]
+    for name in groups:
+        out[f"{name}_count"] = count[name]
+    for name in groups:
+        out[f"{name}_share"] = (amount[name] / total_spend).where(total_spend > 0, 0)
+
+    out["monthly_spend_avg"] = total_spend / 1.5
+
+    if stability is None:
+        by_day = daily.groupby(level="client_code")
+        stability = 1 - by_day.std() / by_day.mean()
+    out["spending_stability"] = stability.reindex(clients, fill_value=0)
+
+    flows = flows.reindex(clients, fill_value=0)
+    out["fx_activity"] = flows["fx_count"]
+    out["fx_share"] = (flows["fx_count"] / flows["n_transfers"]).where(flows["n_transfers"] > 0, 0)
+    out["inflow_outflow_ratio"] = flows["total_in"] / (flows["total_out"] + 1)
+    out["cash_gap_ratio"] = (flows["total_out"] - flows["total_in"]) / (flows["total_in"] + 1)
+
+    avg_balance = balances.groupby(level=0).first().reindex(clients)
+    out["savings_propensity"] = avg_balance / (total_spend + 1)
+
+    # топ-3 по частоте, при равенстве — порядок первого появления
+    ranked = by_category.reset_index().sort_values(
+        ["client_code", "count", "first_seen"], ascending=[True, False, True]
+    )
+    ranked = ranked[ranked.groupby("client_code").cumcount() < 3].astype({"category": object})
+    by_client = ranked.groupby("client_code")
+    if details:
+        out["top_categories"] = by_client["category"].agg(list).reindex(clients)
+    out["top_category"] = by_client["category"].first().reindex(clients)
+    out["top_spend"] = by_client["amount"].sum().reindex(clients, fill_value=0)
+    out["jewelry_need"] = (
+        pd.Series(REGISTRY.membership(REGISTRY.encode(ranked["category"]), ["jewelry"])[:, 0], index=ranked.index)
+        .groupby(ranked["client_code"]).any()
+        .reindex(clients, fill_value=False).astype(int)
+    )
+    out["avg_balance"] = avg_balance
+    out.index.name = "client_code"
+    return out
+
+
+def compute_signals_batch(transactions, transfers, clients, details=True):
+    """
+    Batch-версия compute_signals для всех клиентов сразу.
+
+    transactions — columns: client_code, date, category, amount
+    transfers    — columns: client_code, type, direction, amount
+    clients      — columns: client_code, avg_monthly_balance_KZT
+
+    Возвращает DataFrame (index client_code) с теми же сигналами, что compute_signals,
+    плюс top_spend — сумма трат в топ-категориях (нужна скорингу кредитной карты).
+    """
+    by_category, daily = aggregate_transactions(transactions)
+    flows = aggregate_transfers(transfers)
+    balances = clients.set_index("client_code")["avg_monthly_balance_KZT"]
+    return signals_from_aggregates(by_category, daily, flows, balances, details=details)
+
+
+def signals_for_client(table, client_code):
+    """Строка batch-таблицы в формате dict, как возвращает compute_signals."""
+    row = table.loc[client_code]
+    return {key: row[key] for key in SIGNAL_KEYS if key in table.columns}
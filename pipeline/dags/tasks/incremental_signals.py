@@ -0,0 +1,156 @@
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from tasks.compute_signals import aggregate_transfers, signals_from_aggregates
+
+# Персистентное состояние агрегатов между запусками DAG
+STATE_DIR = os.getenv("RECO_STATE_DIR", "/opt/airflow/state")
+WINDOW_DAYS = 90
+
+
+def empty_state():
+    return {
+        # (client_code, date, category): amount, count, first_seen
+        "categories": pd.DataFrame(
+            columns=["amount", "count", "first_seen"],
+            index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([]), []], names=["client_code", "date", "category"]),
+        ),
+        # (client_code, date): total_in, total_out, fx_count, n_transfers
+        "transfers": pd.DataFrame(
+            columns=["total_in", "total_out", "fx_count", "n_transfers"],
+            index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=["client_code", "date"]),
+        ),
+        "watermark": None,   # последняя учтённая дата/время транзакции
+        "next_seen": 0,      # сквозной номер строки для тай-брейка топ-категорий
+        "scanned_at": None,  # time.time_ns() начала последнего delta-скана (load_shard(modified_after=...))
+    }
+
+
+def _aggregate_categories_daily(transactions, first_seen):
+    tx = transactions[["client_code", "date", "category", "amount"]]
+    day = pd.to_datetime(tx["date"]).dt.normalize()
+    return (
+        tx.assign(date=day, category=tx["category"].astype(object), first_seen=first_seen + np.arange(len(tx)))
+          .groupby(["client_code", "date", "category"])
+          .agg(amount=("amount", "sum"), count=("amount", "size"), first_seen=("first_seen", "min"))
+    )
+
+
+def _fold(acc, part, agg):
+    if acc.empty:
+        return part
+    if part.empty:
+        return acc
+    return pd.concat([acc, part]).groupby(level=list(acc.index.names)).agg(agg)
+
+
+def update_state(state, transactions, transfers, as_of=None, window_days=WINDOW_DAYS):
+    """
+    Добавляет в состояние только строки новее watermark и выбрасывает дни, вышедшие из окна
+    (as_of - window_days, as_of]. as_of по умолчанию — новый watermark.
+
+    Строки с датой <= watermark считаются уже учтёнными: сравнение строгое, чтобы повтор запуска
+    на тех же файлах не удваивал суммы. Поэтому источник должен дописывать строки в порядке времени:
+    строка, появившаяся после запуска с датой <= watermark (в том числе ровно на watermark),
+    в состояние не попадёт — такие поздние данные учитываются только полным пересчётом
+    (новое состояние с пустого каталога).
+    """
+    watermark = state["watermark"]
+    if watermark is not None:
+        # поздние строки с датой == watermark отбрасываются намеренно (см. docstring)
+        transactions = transactions[pd.to_datetime(transactions["date"]) > watermark]
+        transfers = transfers[pd.to_datetime(transfers["date"]) > watermark]
+
+    categories = _fold(
+        state["categories"],
+        _aggregate_categories_daily(transactions, state["next_seen"]),
+        {"amount": "sum", "count": "sum", "first_seen": "min"},
+    )
+    flows = _fold(state["transfers"], aggregate_transfers(transfers, by_day=True), "sum")
+
+    dates = [d for d in (watermark, pd.to_datetime(transactions["date"]).max(),
+                         pd.to_datetime(transfers["date"]).max()) if d is not None and not pd.isna(d)]
+    watermark = max(dates) if dates else None
+    as_of = pd.Timestamp(as_of) if as_of is not None else watermark
+
+    if as_of is not None:
+        start = as_of.normalize() - pd.Timedelta(days=window_days - 1)
+        categories = categories[categories.index.get_level_values("date") >= start]
+        flows = flows[flows.index.get_level_values("date") >= start]
+
+    return {
+        "categories": categories,
+        "transfers": flows,
+        "watermark": watermark,
+        "next_seen": state["next_seen"] + len(transactions),
+        "scanned_at": state.get("scanned_at"),
+    }
+
+
+def signals_from_state(state, balances, details=True):
+    """Сигналы по окну из состояния — тот же результат, что compute_signals_batch по строкам окна."""
+    categories = state["categories"]
+    by_category = categories.groupby(level=["client_code", "category"]).agg(
+        amount=("amount", "sum"), count=("count", "sum"), first_seen=("first_seen", "min")
+    )
+    daily = categories["amount"].groupby(level=["client_code", "date"]).sum()
+    flows = state["transfers"].groupby(level="client_code").sum()
+    return signals_from_aggregates(by_category, daily, flows, balances, details=details)
+
+
+def load_state(state_dir=None):
+    state_dir = state_dir or STATE_DIR
+    meta_path = os.path.join(state_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return empty_state()
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return {
+        "categories": pd.read_parquet(os.path.join(state_dir, meta["categories"])),
+        "transfers": pd.read_parquet(os.path.join(state_dir, meta["transfers"])),
+        "watermark": pd.Timestamp(meta["watermark"]) if meta["watermark"] else None,
+        "next_seen": meta["next_seen"],
+        "scanned_at": meta.get("scanned_at"),
+    }
+
+
+def load_watermark(state_dir=None):
+    """(watermark, scanned_at) из meta.json без чтения агрегатов — для delta-скана load_shard."""
+    meta_path = os.path.join(state_dir or STATE_DIR, "meta.json")
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return (pd.Timestamp(meta["watermark"]) if meta["watermark"] else None), meta.get("scanned_at")
+
+
+def save_state(state, state_dir=None):
+    """
+    Новая версия пишется в файлы с уникальным суффиксом, затем атомарно подменяется meta.json,
+    так что упавший на середине запуск не портит предыдущее состояние.
+    """
+    state_dir = state_dir or STATE_DIR
+    os.makedirs(state_dir, exist_ok=True)
+    version = uuid.uuid4().hex[:12]
+    meta = {
+        "categories": f"categories.{version}.parquet",
+        "transfers": f"transfers.{version}.parquet",
+        "watermark": state["watermark"].isoformat() if state["watermark"] is not None else None,
+        "next_seen": int(state["next_seen"]),
+        "scanned_at": state.get("scanned_at"),
+    }
+    state["categories"].to_parquet(os.path.join(state_dir, meta["categories"]))
+    state["transfers"].to_parquet(os.path.join(state_dir, meta["transfers"]))
+
+    tmp_path = os.path.join(state_dir, f"meta.json.{version}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(state_dir, "meta.json"))
+
+    for name in os.listdir(state_dir):
+        if name.endswith(".parquet") and name not in (meta["categories"], meta["transfers"]):
+            os.remove(os.path.join(state_dir, name))
@@ -1,10 +1,157 @@
+import hashlib
+import json
+import os
+import uuid
 import pandas as pd
-from typing import Tuple
-
-def load_data(tx_path: str, tr_path: str, clients_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    tx = pd.read_csv(tx_path)
-    tr = pd.read_csv(tr_path)
-    clients = pd.read_csv(clients_path)
-    # небольшая валидация
-    assert not tx.empty
-    return tx, tr, clients
\ No newline at end of file
+from typing import Optional, Tuple
+
+# Схемы входных файлов: только нужные колонки, явные dtypes, даты парсятся один раз при загрузке.
+TRANSACTIONS_SCHEMA = {
+    "dtypes": {"client_code": "int64", "category": "category", "amount": "float32", "currency": "category"},
+    "dates": ["date"],
+}
+TRANSFERS_SCHEMA = {
+    "dtypes": {"client_code": "int64", "type": "category", "direction": "category",
+               "amount": "float32", "currency": "category"},
+    "dates": ["date"],
+}
+CLIENTS_SCHEMA = {
+    "dtypes": {"client_code": "int64", "name": "str", "status": "category", "age": "float32",
+               "city": "category", "avg_monthly_balance_KZT": "float64"},
+    "dates": [],
+}
+
+# Parquet-копии CSV; по умолчанию рядом с данными, в .cache/
+CACHE_DIR = os.getenv("RECO_CACHE_DIR")
+
+
+def _read_csv_typed(path: str, schema: dict) -> pd.DataFrame:
+    wanted = set(schema["dtypes"]) | set(schema["dates"])
+    df = pd.read_csv(path, usecols=lambda c: c in wanted,
+                     dtype=schema["dtypes"])
+    for c in schema["dates"]:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c])
+    return df
+
+
+def iter_csv_chunks(path: str, schema: dict, chunksize: int):
+    """
+    Чтение CSV кусками по chunksize строк с теми же колонками/dtypes, что _read_csv_typed.
+    Категориальные колонки читаются строками: у каждого куска был бы свой набор категорий.
+    """
+    wanted = set(schema["dtypes"]) | set(schema["dates"])
+    dtypes = {c: ("str" if t == "category" else t) for c, t in schema["dtypes"].items()}
+    for chunk in pd.read_csv(path, usecols=lambda c: c in wanted, dtype=dtypes, chunksize=chunksize):
+        for c in schema["dates"]:
+            if c in chunk.columns:
+                chunk[c] = pd.to_datetime(chunk[c])
+        yield chunk
+
+
+def _cache_path(path: str, schema: dict, cache_dir: Optional[str]) -> str:
+    """
+    Ключ кеша — hash от (путь, размер, mtime, схема): любое изменение файла или схемы даёт новый ключ.
+    Версии одного файла лежат в своём каталоге <cache_dir>/<имя файла>/<ключ>.parquet.
+    """
+    st = os.stat(path)
+    key = json.dumps([os.path.abspath(path), st.st_size, st.st_mtime_ns, schema], sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    cache_dir = cache_dir or CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(path)), ".cache")
+    return os.path.join(cache_dir, os.path.basename(path), f"{digest}.parquet")
+
+
+def read_cached(path: str, schema: dict, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    CSV -> типизированный DataFrame через Parquet-кеш.
+    Первый запуск парсит CSV и сохраняет Parquet-копию, следующие читают её.
+    Безопасно при параллельных задачах: копия публикуется os.replace из уникального временного файла,
+    удаляются только версии с другим ключом.
+    """
+    cached = _cache_path(path, schema, cache_dir)
+    try:
+        return pd.read_parquet(cached)
+    except FileNotFoundError:
+        pass
+
+    df = _read_csv_typed(path, schema)
+    version_dir = os.path.dirname(cached)
+    os.makedirs(version_dir, exist_ok=True)
+    tmp_path = f"{cached}.{uuid.uuid4().hex}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cached)
+    for name in os.listdir(version_dir):
+        if name.endswith(".parquet") and name != os.path.basename(cached):
+            try:
+                os.remove(os.path.join(version_dir, name))  # устаревшие версии этого файла
+            except FileNotFoundError:
+                pass  # уже удалила параллельная задача
+    return df
+
+
+def load_data(tx_path: str, tr_path: str, clients_path: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    tx = read_cached(tx_path, TRANSACTIONS_SCHEMA)
+    tr = read_cached(tr_path, TRANSFERS_SCHEMA)
+    clients = read_cached(clients_path, CLIENTS_SCHEMA)
+    return tx, tr, clients
+
+
+def load_shard(data_dir: str, shard: int, n_shards: int, since: Optional[pd.Timestamp] = None,
+               modified_after: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Данные одного шарда: клиенты из clients.csv, попавшие в shard,
+    и их файлы client_{code}_transactions_3m.csv / client_{code}_transfers_3m.csv.
+    Все файлы читаются через Parquet-кеш read_cached.
+
+    Delta-скан для инкрементального режима (tasks.incremental_signals):
+      since          — watermark: строки с date <= since не возвращаются
+      modified_after — время прошлого скана (time.time_ns()): файлы клиентов с mtime раньше него
+                       не читаются — все их строки уже учтены. clients.csv читается всегда.
+    """
+    from tasks.partition import clients_in_shard
+
+    def changed(path):
+        return modified_after is None or os.stat(path).st_mtime_ns >= modified_after
+
+    def read(path, schema, code):
+        df = read_cached(path, schema)
+        if since is not None:
+            df = df[df["date"] > since]
+        return df.assign(client_code=code)
+
+    clients = clients_in_shard(read_cached(os.path.join(data_dir, "clients.csv"), CLIENTS_SCHEMA), shard, n_shards)
+    tx_parts, tr_parts = [], []
+    for code in clients["client_code"]:
+        tx_path = os.path.join(data_dir, f"client_{code}_transactions_3m.csv")
+        tr_path = os.path.join(data_dir, f"client_{code}_transfers_3m.csv")
+        if not os.path.exists(tx_path):
+            continue
+        if changed(tx_path):
+            tx_parts.append(read(tx_path, TRANSACTIONS_SCHEMA, code))
+        if os.path.exists(tr_path) and changed(tr_path):
+            tr_parts.append(read(tr_path, TRANSFERS_SCHEMA, code))
+    # у шарда может не быть ни одного файла (мало клиентов) — тогда пустые таблицы с той же схемой
+    tx = _concat_typed(tx_parts, TRANSACTIONS_SCHEMA)
+    tr = _concat_typed(tr_parts, TRANSFERS_SCHEMA)
+    return tx, tr, clients
+
+
+def empty_frame(schema: dict) -> pd.DataFrame:
+    """Пустая таблица с колонками и dtypes схемы, как у _read_csv_typed."""
+    columns = {c: pd.Series(dtype=t) for c, t in schema["dtypes"].items()}
+    columns.update({c: pd.Series(dtype="datetime64[ns]") for c in schema["dates"]})
+    return pd.DataFrame(columns)
+
+
+def _concat_typed(parts, schema: dict) -> pd.DataFrame:
+    if not parts:
+        return empty_frame(schema)
+    return _as_categories(pd.concat(parts, ignore_index=True), schema)
+
+
+def _as_categories(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    # concat категориальных колонок с разными наборами категорий даёт object — возвращаем category
+    for c, t in schema["dtypes"].items():
+        if t == "category" and c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
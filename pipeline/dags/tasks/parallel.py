@@ -0,0 +1,107 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from tasks.compute_benefits import compute_products_batch
+from tasks.compute_signals import compute_signals_batch
+from tasks.select_best_product import select_top_k, top_k_to_frame
+from utils.artifacts import read_frame, write_frame
+
+# процессов на таск по умолчанию: все ядра воркера (RECO_WORKERS переопределяет)
+DEFAULT_WORKERS = int(os.getenv("RECO_WORKERS", "0")) or os.cpu_count() or 1
+# кусков на процесс: мелкие куски выравнивают нагрузку, если клиенты сильно различаются по числу операций
+CHUNKS_PER_WORKER = 4
+
+
+def split_by_client(codes, n_chunks):
+    """
+    Границы кусков по отсортированным client_code: n_chunks непрерывных диапазонов клиентов примерно
+    одинакового размера. Возвращает список массивов client_code в порядке возрастания.
+    """
+    codes = np.unique(np.asarray(codes))
+    n_chunks = max(1, min(n_chunks, len(codes)))
+    return [part for part in np.array_split(codes, n_chunks) if len(part)]
+
+
+def _rows_for(frame, sorted_codes, chunk):
+    # frame отсортирован по client_code (stable), поэтому строки клиентов куска — один срез
+    start = np.searchsorted(sorted_codes, chunk[0], side="left")
+    stop = np.searchsorted(sorted_codes, chunk[-1], side="right")
+    return frame.iloc[start:stop].reset_index(drop=True)
+
+
+def _run_chunk(paths, out_dir, name, k, params, details):
+    """Цепочка signals -> benefits -> top-k для одного куска; вход и выход — Arrow-файлы в out_dir."""
+    tx = read_frame(paths["transactions"])
+    tr = read_frame(paths["transfers"])
+    clients = read_frame(paths["clients"])
+    signals = compute_signals_batch(tx, tr, clients, details=details)
+    benefit, utility = compute_products_batch(signals, params)
+    recs = top_k_to_frame(select_top_k(utility, k=k), benefit)
+    return {
+        "signals": write_frame(signals, "out", f"{name}_signals", root=out_dir),
+        "benefit": write_frame(benefit, "out", f"{name}_benefit", root=out_dir),
+        "utility": write_frame(utility, "out", f"{name}_utility", root=out_dir),
+        "recommendations": write_frame(recs, "out", f"{name}_recommendations", root=out_dir),
+    }
+
+
+def run_chain_parallel(transactions, transfers, clients, workers=None, n_chunks=None, k=3, params=None,
+                       details=False, work_dir=None, mp_context=None):
+    """
+    compute_signals_batch -> compute_products_batch -> select_top_k на всех ядрах одного таска.
+
+    Клиенты делятся на непрерывные диапазоны client_code; данные каждого куска пишутся
+    в Arrow IPC (utils.artifacts.write_frame) во временную директорию в work_dir, процессы
+    ProcessPoolExecutor читают их через memory map и так же возвращают результаты файлами —
+    через pickle идут только пути. Куски склеиваются в порядке client_code, поэтому результат
+    не зависит от числа процессов и совпадает с однопроцессным прогоном.
+
+    Возвращает dict: signals, benefit, utility (index client_code) и recommendations (top-k).
+    """
+    workers = workers or DEFAULT_WORKERS
+    # сигналы считаются по клиентам с транзакциями (как в compute_signals_batch) — по ним и делим
+    chunks = split_by_client(transactions["client_code"], n_chunks or workers * CHUNKS_PER_WORKER)
+
+    tx = transactions.sort_values("client_code", kind="stable")
+    tr = transfers.sort_values("client_code", kind="stable")
+    cl = clients.sort_values("client_code", kind="stable")
+    tx_codes, tr_codes, cl_codes = (f["client_code"].to_numpy() for f in (tx, tr, cl))
+
+    tmp_dir = tempfile.mkdtemp(prefix="reco_parallel_", dir=work_dir)
+    try:
+        inputs = []
+        for i, chunk in enumerate(chunks):
+            name = f"chunk_{i:05d}"
+            inputs.append({
+                "transactions": write_frame(_rows_for(tx, tx_codes, chunk), "in", f"{name}_tx", root=tmp_dir),
+                "transfers": write_frame(_rows_for(tr, tr_codes, chunk), "in", f"{name}_tr", root=tmp_dir),
+                "clients": write_frame(_rows_for(cl, cl_codes, chunk), "in", f"{name}_clients", root=tmp_dir),
+            })
+
+        args = [(paths, tmp_dir, f"chunk_{i:05d}", k, params, details) for i, paths in enumerate(inputs)]
+        if workers > 1 and multiprocessing.current_process().daemon:
+            # daemonic-процесс (например, prefork-воркер Celery) не может запускать дочерние процессы
+            logging.warning("run_chain_parallel: daemonic process, chunks run sequentially")
+            workers = 1
+        if workers <= 1:
+            outputs = [_run_chunk(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+                # submit + result по порядку кусков: склейка детерминирована независимо от порядка завершения
+                futures = [pool.submit(_run_chunk, *a) for a in args]
+                outputs = [f.result() for f in futures]
+
+        return {
+            key: pd.concat([read_frame(out[key]) for out in outputs],
+                           ignore_index=(key == "recommendations"))
+            for key in ("signals", "benefit", "utility", "recommendations")
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,207 @@
+"""
+What-if перебор ставок и весов скоринга по готовой таблице сигналов без перезапуска DAG.
+
+    python -m tasks.param_sweep grid.yaml                      # сигналы — текущая версия feature store
+    python -m tasks.param_sweep grid.yaml --signals <файл.arrow> --out sweep.csv
+
+grid.yaml:
+    variants:                       # явные варианты: поля business_params.yaml и "<продукт>.alpha|beta|max_value"
+      - name: savings_8pct
+        deposit_saving_frozen_rate_annual: 0.08
+    grid:                           # и/или декартово произведение значений
+      deposit_saving_frozen_rate_annual: [0.04, 0.06, 0.08]
+      "Инвестиции.alpha": [0.6, 0.8]
+
+Все варианты считаются за один проход: изменяемые параметры компилируются в план products.yaml
+как переменные формы (V, 1), поэтому формулы, победитель и суммы считаются сразу для V вариантов
+numpy-трансляцией. Ось вариантов получают только продукты, зависящие от перебираемых ставок и весов,
+остальные скорятся один раз. Клиенты идут кусками, чтобы матрицы V × кусок помещались в память.
+Вариант "base" (ставки без изменений) всегда первый — относительно него считаются дельты.
+"""
+import argparse
+import itertools
+import sys
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from tasks.compute_benefits import _RESOLVERS, score_matrices
+from utils.artifacts import read_frame
+from utils.config_loader import DEFAULT_PRODUCTS_PATH, BusinessParams, load_business_params, load_config
+from utils.feature_store import FeatureStore
+from utils.product_spec import compile_products
+
+# элементов в матрице вариантов × клиентов на один кусок (~32 МБ на float64-массив)
+SWEEP_CELLS = 4_000_000
+_WEIGHTS = ("alpha", "beta", "max_value")
+
+
+def grid(**axes):
+    """Декартово произведение: grid(gold_expected_annual_return=[0.02, 0.03]) -> список вариантов-словарей."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def _variant_name(variant):
+    return ",".join(f"{k}={v}" for k, v in variant.items())
+
+
+def _split_variant(variant, products):
+    """{ключ: значение} -> (ставки BusinessParams, {(product, weight): значение})."""
+    rates, weights = {}, {}
+    for key, value in variant.items():
+        product, _, weight = key.rpartition(".")
+        if product and weight in _WEIGHTS:
+            if product not in products:
+                raise ValueError(f"unknown product in sweep key '{key}'")
+            weights[(product, weight)] = float(value)
+        else:
+            rates[key] = value
+    return rates, weights
+
+
+def sweep(signals, variants, params=None, plan_path=None, chunk_size=None):
+    """
+    signals  — таблица сигналов (index client_code), как для compute_products_batch
+    variants — список словарей изменений; ключ "name" — подпись варианта (иначе собирается из ключей)
+    params   — базовые ставки (по умолчанию BusinessParams()), plan_path — products.yaml
+
+    Возвращает (summary, mix, mix_delta):
+      summary   — по строке на вариант: total_benefit выгоды лучших продуктов, её дельта к base,
+                  switched — сколько клиентов сменили лучший продукт относительно base
+      mix       — варианты × продукты: число клиентов, для которых продукт лучший
+      mix_delta — mix минус строка base
+    """
+    base = params or BusinessParams()
+    spec = load_config(plan_path or DEFAULT_PRODUCTS_PATH)
+    products = [p["name"] for p in spec.get("products") or []]
+
+    names, rate_sets, weight_sets = ["base"], [{}], [{}]
+    for i, variant in enumerate(variants):
+        variant = dict(variant)
+        name = str(variant.pop("name", None) or _variant_name(variant) or f"variant_{i}")
+        rates, weights = _split_variant(variant, products)
+        BusinessParams.from_dict({**asdict(base), **rates})  # проверка имён ставок
+        names.append(name)
+        rate_sets.append(rates)
+        weight_sets.append(weights)
+
+    varied = sorted(set().union(*rate_sets))
+    plan = compile_products(spec, base, variables=varied)
+    base_rates = asdict(base)
+    # (V, 1) — транслируется по оси клиентов
+    variables = {
+        name: np.array([float(r.get(name, base_rates[name])) for r in rate_sets])[:, None] for name in varied
+    } or None
+    weights = {}
+    for weight in _WEIGHTS:
+        values = np.tile(getattr(plan, weight), (len(names), 1))
+        for v, overrides in enumerate(weight_sets):
+            for (product, w), value in overrides.items():
+                if w == weight:
+                    values[v, plan.products.index(product)] = value
+        weights[weight] = values  # (V, P)
+    # (P,) — перебирается ли вес у продукта
+    varies = {weight: (values != values[0]).any(axis=0) for weight, values in weights.items()}
+
+    n_variants, n_products = len(names), len(plan.products)
+    chunk_size = chunk_size or max(1, SWEEP_CELLS // n_variants)
+    counts = np.zeros((n_variants, n_products), dtype=np.int64)
+    total_benefit = np.zeros(n_variants)
+    switched = np.zeros(n_variants, dtype=np.int64)
+    for start in range(0, len(signals), chunk_size):
+        chunk = signals.iloc[start:start + chunk_size]
+        n = len(chunk)
+        columns = plan.evaluate_columns(chunk, _RESOLVERS, variables)
+        # продукты, не зависящие от перебираемых параметров, скорятся один раз на клиента;
+        # ось вариантов (V, n) — только у остальных
+        fixed = [
+            j for j, (b, u) in enumerate(columns)
+            if np.ndim(b) < 2 and np.ndim(u) < 2 and not any(varies[w][j] for w in _WEIGHTS)
+        ]
+        best_value, best_idx, best_benefit = np.full(n, -np.inf), np.full(n, n_products), np.zeros(n)
+        if fixed:
+            benefit, _, _, utility, _, _ = score_matrices(
+                np.column_stack([np.broadcast_to(columns[j][0], n) for j in fixed]),
+                np.column_stack([np.broadcast_to(columns[j][1], n) for j in fixed]),
+                *(weights[w][0, fixed] for w in _WEIGHTS),
+            )
+            utility = np.where(np.isnan(utility), -np.inf, utility)
+            pos = np.argmax(utility, axis=1)
+            rows = np.arange(n)
+            best_value, best_idx, best_benefit = utility[rows, pos], np.asarray(fixed)[pos], benefit[rows, pos]
+        for j in range(n_products):
+            if j in fixed:
+                continue
+            benefit, usage = columns[j]
+            # веса, которые у продукта не перебираются, — скаляры, тогда ось вариантов появляется
+            # только там, где она есть в формуле
+            alpha, beta, max_value = (weights[w][:, j, None] if varies[w][j] else weights[w][0, j] for w in _WEIGHTS)
+            benefit, _, _, utility, _, _ = score_matrices(benefit, usage, alpha, beta, max_value)
+            # лучший продукт как в select_top_k: при равной utility — меньший индекс
+            better = (utility > best_value) | ((utility == best_value) & (j < best_idx))
+            best_value = np.where(better, utility, best_value)
+            best_idx = np.where(better, j, best_idx)
+            best_benefit = np.where(better, benefit, best_benefit)
+        # NaN не проходит сравнения; все продукты NaN у клиента — select_top_k отдал бы первый
+        best_idx = np.where(best_idx == n_products, 0, best_idx)
+        best_idx = np.broadcast_to(best_idx, (n_variants, n))
+        counts += np.bincount(
+            (best_idx + np.arange(n_variants)[:, None] * n_products).ravel(), minlength=n_variants * n_products
+        ).reshape(n_variants, n_products)
+        total_benefit += np.broadcast_to(best_benefit, (n_variants, n)).sum(axis=1)
+        switched += (best_idx != best_idx[0]).sum(axis=1)
+
+    mix = pd.DataFrame(counts, index=pd.Index(names, name="variant"), columns=plan.products)
+    summary = pd.DataFrame({
+        "clients": len(signals),
+        "switched": switched,
+        "total_benefit": total_benefit,
+        "total_benefit_delta": total_benefit - total_benefit[0],
+    }, index=mix.index)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary["total_benefit_delta_pct"] = summary["total_benefit_delta"] / total_benefit[0] * 100
+    return summary, mix, mix - mix.iloc[0]
+
+
+def load_grid(path):
+    """variants + grid из yaml (формат — в docstring модуля)."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = yaml.safe_load(f) or {}
+    variants = list(raw.get("variants") or [])
+    if raw.get("grid"):
+        variants += grid(**raw["grid"])
+    return variants
+
+
+def _signals_from_store(root=None):
+    store = FeatureStore.open(root)
+    numeric = [c for c in store.columns if c not in store.details]
+    return pd.DataFrame({c: np.asarray(store.column(c)) for c in numeric}, index=np.asarray(store.codes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("grid", help="yaml с variants и/или grid")
+    parser.add_argument("--signals", help="Arrow-файл сигналов (по умолчанию — текущая версия feature store)")
+    parser.add_argument("--feature-store", help="корень feature store (RECO_FEATURE_STORE_DIR)")
+    parser.add_argument("--params", help="business_params.yaml для базовых ставок")
+    parser.add_argument("--products", help="products.yaml (по умолчанию из репозитория)")
+    parser.add_argument("--out", help="CSV: summary и дельты распределения по вариантам")
+    args = parser.parse_args(argv)
+
+    signals = read_frame(args.signals) if args.signals else _signals_from_store(args.feature_store)
+    params = load_business_params(args.params) if args.params else None
+    summary, _, mix_delta = sweep(signals, load_grid(args.grid), params, args.products)
+    report = summary.join(mix_delta.add_prefix("delta:"))
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(report.round(2))
+    if args.out:
+        report.to_csv(args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+
+def shard_of(client_codes, n_shards):
+    """
+    Стабильный номер шарда для каждого client_code.
+    Хеш client_code делится на n_shards равных диапазонов (hash range),
+    поэтому номер не зависит от порядка клиентов и от числа воркеров.
+    """
+    hashes = pd.util.hash_array(np.asarray(client_codes))
+    return ((hashes >> np.uint64(32)) * np.uint64(n_shards) >> np.uint64(32)).astype(int)
+
+
+def discover_shards(clients_path, n_shards):
+    """Список непустых шардов для dynamic task mapping: [{"shard": i, "n_shards": n, "size": k}, ...]."""
+    clients = pd.read_csv(clients_path, usecols=["client_code"])
+    sizes = np.bincount(shard_of(clients["client_code"], n_shards), minlength=n_shards)
+    return [
+        {"shard": i, "n_shards": n_shards, "size": int(size)}
+        for i, size in enumerate(sizes) if size > 0
+    ]
+
+
+def clients_in_shard(clients, shard, n_shards):
+    return clients[shard_of(clients["client_code"], n_shards) == shard]
@@ -1,13 +1,103 @@
+import os
+
 import redis
 import json
 
+# имя стрима — общее для всех продюсеров и StreamConsumer
+STREAM = os.getenv("NOTIFICATIONS_STREAM", "notifications")
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+# MAXLEN ~ для XADD: Redis обрезает стрим по целым узлам, без точного подсчёта на каждой записи
+STREAM_MAXLEN = int(os.getenv("NOTIFICATIONS_STREAM_MAXLEN", "1000000"))
+
+_pools = {}
+
+
+def get_client(host=REDIS_HOST, port=REDIS_PORT, db=0):
+    """redis.Redis поверх общего на процесс ConnectionPool (а не новое соединение на каждый вызов)."""
+    key = (host, port, db)
+    if key not in _pools:
+        _pools[key] = redis.ConnectionPool(host=host, port=port, db=db, decode_responses=True)
+    return redis.Redis(connection_pool=_pools[key])
+
+
 def push_notification_to_stream(**context):
-    r = redis.Redis(host="redis", port=6379, decode_responses=True)
+    r = get_client()
 
     client_id = context["params"]["client_id"]
     notification = context["params"]["notification"]
 
     r.xadd(
-        "notifications",  # stream name
-        {"clientId": client_id, "payload": json.dumps(notification)}
+        STREAM,
+        {"clientId": client_id, "payload": json.dumps(notification)},
+        maxlen=STREAM_MAXLEN,
+        approximate=True,
     )
+
+
+def publish_notifications(notifications, client=None, stream=STREAM, batch_size=500, maxlen=STREAM_MAXLEN):
+    """
+    Массовый XADD через pipeline: batch_size команд за один round-trip.
+    notifications — итерируемое пар (client_id, notification dict).
+    Возвращает число опубликованных записей.
+    """
+    client = client or get_client()
+    pipe = client.pipeline(transaction=False)
+    published = 0
+    pending = 0
+    for client_id, notification in notifications:
+        pipe.xadd(
+            stream,
+            {"clientId": client_id, "payload": json.dumps(notification, ensure_ascii=False)},
+            maxlen=maxlen,
+            approximate=True,
+        )
+        pending += 1
+        if pending >= batch_size:
+            published += sum(1 for entry_id in pipe.execute() if entry_id)
+            pending = 0
+    if pending:
+        published += sum(1 for entry_id in pipe.execute() if entry_id)
+    return published
+
+
+class StreamConsumer:
+    """
+    Читатель consumer group: XREADGROUP пачками по count, XACK после обработки.
+    Несколько процессов с одним group и разными consumer делят стрим между собой.
+    """
+
+    def __init__(self, group, consumer, client=None, stream=STREAM, count=100, block_ms=1000):
+        self.client = client or get_client()
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.count = count
+        self.block_ms = block_ms
+        try:
+            self.client.xgroup_create(stream, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self):
+        """Следующая пачка: [(entry_id, client_id, notification dict), ...]; пустой список по таймауту."""
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.count, block=self.block_ms
+        )
+        entries = []
+        for _, messages in response or []:
+            for entry_id, fields in messages:
+                entries.append((entry_id, fields["clientId"], json.loads(fields["payload"])))
+        return entries
+
+    def ack(self, entry_ids):
+        return self.client.xack(self.stream, self.group, *entry_ids) if entry_ids else 0
+
+    def consume(self, handler):
+        """Читает одну пачку, передаёт её в handler и подтверждает. Возвращает размер пачки."""
+        entries = self.read()
+        if entries:
+            handler(entries)
+            self.ack([entry_id for entry_id, _, _ in entries])
+        return len(entries)
@@ -0,0 +1,60 @@
+import string
+
+from utils.formatting import format_amount_kzt
+from utils.validators import red_policy_ok
+
+# категории, суммы по которым подставляются в шаблоны из configs/templates.yaml
+TAXI_CATEGORY = "Такси"
+RESTAURANT_CATEGORY = "Кафе и рестораны"
+
+
+def _compile(template):
+    """Шаблон -> [(литерал, имя поля | None), ...], разбирается один раз."""
+    return [(literal, field) for literal, field, _, _ in string.Formatter().parse(template)]
+
+
+def _product_key(name):
+    # "Инвестиции (брокерский счёт)" -> "Инвестиции": ключи шаблонов совпадают с PRODUCTS до скобок
+    return name.split(" (")[0].strip()
+
+
+class TemplateRenderer:
+    """
+    Быстрый рендер пушей по шаблонам продукта (utils.config_loader.load_templates).
+    render() возвращает None, если шаблона нет, не хватает полей или текст не прошёл red_policy_ok —
+    такие клиенты уходят в LLM.
+    """
+
+    def __init__(self, templates):
+        self.compiled = {_product_key(product): _compile(text) for product, text in templates.items()}
+
+    def render(self, product, fields):
+        parts = self.compiled.get(_product_key(product or ""))
+        if parts is None:
+            return None
+        out = []
+        for literal, field in parts:
+            out.append(literal)
+            if field is not None:
+                value = fields.get(field)
+                if value is None or value == "":
+                    return None
+                out.append(str(value))
+        text = "".join(out)
+        ok, _ = red_policy_ok(text)
+        return text if ok else None
+
+
+def template_fields(client_data):
+    """Поля шаблонов из client_data (как его собирает send_notification._client_data)."""
+    spend = client_data.get("category_spend") or {}
+    top3 = list(client_data.get("top3") or [])
+    fields = {
+        "name": client_data.get("name"),
+        "benefit": format_amount_kzt(client_data["best_value"]) if client_data.get("best_value") else None,
+        "taxi_sum": format_amount_kzt(spend[TAXI_CATEGORY]) if spend.get(TAXI_CATEGORY) else None,
+        "rest_sum": format_amount_kzt(spend[RESTAURANT_CATEGORY]) if spend.get(RESTAURANT_CATEGORY) else None,
+    }
+    for i in range(3):
+        fields[f"cat{i + 1}"] = top3[i] if i < len(top3) else None
+    return fields
@@ -1,5 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
 def select_best_product(benefits):
     return max(benefits.items(), key=lambda x: x[1]["utility"])
 
 # def select_best_products(benefits):
-#     return max(benefits.items(), key=lambda x: x[10])
\ No newline at end of file
+#     return max(benefits.items(), key=lambda x: x[10])
+
+
+# --- batch: top-k по матрице utility --- #
+
+TOP_K_DTYPE = np.dtype([
+    ("client", "i8"),    # client_code (или номер строки для ndarray)
+    ("rank", "i1"),      # 1 — лучший продукт
+    ("product", "i2"),   # индекс колонки в матрице utility
+    ("utility", "f4"),
+])
+
+
+def select_top_k(utility, k=3, eligible=None):
+    """
+    Top-k продуктов на клиента без полной сортировки (argpartition + сортировка k элементов).
+
+    utility  — DataFrame клиенты × продукты (например из compute_products_batch) или ndarray
+    eligible — bool-маска той же формы; False исключает продукт (например, уже есть у клиента)
+
+    Возвращает structured array TOP_K_DTYPE, отсортированный по (client, rank).
+    Исключённые продукты в результат не попадают, поэтому у клиента может быть меньше k строк.
+    При равной utility выше стоит продукт с меньшим индексом — как у select_best_product.
+    """
+    scores = np.asarray(utility, dtype=float)
+    clients = utility.index.to_numpy() if hasattr(utility, "index") else np.arange(len(scores))
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    if eligible is not None:
+        scores = np.where(np.asarray(eligible, dtype=bool), scores, -np.inf)
+
+    n_products = scores.shape[1]
+    k = min(k, n_products)
+    # срез должен вместить всю группу равных k-му значению, иначе argpartition возьмёт из неё
+    # произвольные продукты: m — максимум по строкам числа продуктов со score >= k-го по величине
+    m = n_products
+    if 0 < k < n_products and len(scores):
+        kth = np.partition(scores, n_products - k, axis=1)[:, n_products - k]
+        m = int((scores >= kth[:, None]).sum(axis=1).max())
+    if m < n_products:
+        idx = np.argpartition(-scores, m - 1, axis=1)[:, :m]
+    else:
+        idx = np.broadcast_to(np.arange(n_products), scores.shape)
+    top = np.take_along_axis(scores, idx, axis=1)
+
+    # (-utility, индекс продукта): при равенстве выше меньший индекс
+    order = np.lexsort((idx, -top))[:, :k]
+    idx = np.take_along_axis(idx, order, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+
+    keep = np.isfinite(top)
+    rows, ranks = np.nonzero(keep)
+    out = np.empty(len(rows), dtype=TOP_K_DTYPE)
+    out["client"] = clients[rows]
+    out["rank"] = ranks + 1
+    out["product"] = idx[keep]
+    out["utility"] = top[keep]
+    return out
+
+
+def top_k_to_frame(top, benefit):
+    """
+    Structured array из select_top_k -> DataFrame client_code, rank, product, benefit, utility.
+    benefit — матрица выгоды (DataFrame клиенты × продукты), её колонки дают имена продуктов.
+    """
+    rows = benefit.index.get_indexer(top["client"])
+    return pd.DataFrame({
+        "client_code": top["client"],
+        "rank": top["rank"],
+        "product": benefit.columns.to_numpy()[top["product"]],
+        "benefit": benefit.to_numpy()[rows, top["product"]],
+        "utility": top["utility"],
+    })
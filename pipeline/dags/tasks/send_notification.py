@@ -4,7 +4,8 @@ import logging
 import time
 import json
 import asyncio
-from utils.firebase import send_push_to_mobile  # Предполагается, что модуль существует
+import random
+from utils.firebase import send_push_to_mobile, invalid_tokens  # Предполагается, что модуль существует
 from tasks.generate_summary import generate_summary  # Для обратной совместимости
 
 
@@ -15,14 +16,20 @@ CSV_FILE = os.path.join(OUTPUTS_DIR, "push_logs.csv")
 
 def append_to_csv(row: dict):
     """Добавляет строку в CSV, создавая файл с заголовками при первом запуске"""
+    append_rows_to_csv([row])
+
+def append_rows_to_csv(rows: list):
+    """То же для многих строк: файл открывается и DictWriter создаётся один раз."""
+    if not rows:
+        return
     os.makedirs(OUTPUTS_DIR, exist_ok=True)
     file_exists = os.path.isfile(CSV_FILE)
 
     with open(CSV_FILE, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
         if not file_exists:
             writer.writeheader()
-        writer.writerow(row)
+        writer.writerows(rows)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -173,20 +180,226 @@ def generate_push_with_ai(client_data: dict, attempts: int = 3, backoff: float =
         return _gen_with_gemini(model_name, payload, attempts, backoff)
     return _gen_with_openai(model_name, payload, attempts, backoff)
 
-def send_notification_to_mobile(client_profile, best_product, best_value, category_spend, top3, summary):
-    # Подготовка данных клиента
-    client_data = {
+# --- async batch: один клиент провайдера, N запросов параллельно под rate limit --- #
+
+class OpenAIAsyncProvider:
+    name = "openai"
+
+    def __init__(self, model_name: str):
+        from openai import AsyncOpenAI
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("Не найден OPENAI_API_KEY. Установите переменную окружения.")
+        self.model_name = model_name
+        self.client = AsyncOpenAI(api_key=api_key)
+
+    async def generate(self, payload: dict, draft: str = None) -> str:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+        ]
+        if draft is not None:
+            messages += [
+                {"role": "assistant", "content": draft},
+                {"role": "user", "content": "Сохрани смысл и стиль, уложись строго в 180–220 символов."},
+            ]
+        resp = await self.client.chat.completions.create(
+            model=self.model_name, messages=messages, temperature=0.7 if draft is None else 0.4,
+        )
+        return resp.choices[0].message.content or ""
+
+
+class GeminiAsyncProvider:
+    name = "gemini"
+
+    def __init__(self, model_name: str):
+        import google.generativeai as genai
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("Не найден GOOGLE_API_KEY/GEMINI_API_KEY. Установите переменную окружения.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name, system_instruction=SYSTEM_PROMPT)
+
+    async def generate(self, payload: dict, draft: str = None) -> str:
+        parts = [json.dumps(payload, ensure_ascii=False)]
+        if draft is not None:
+            parts.append("Сохрани смысл и стиль, уложись строго в 180–220 символов. Верни только текст пуша.")
+        resp = await self.model.generate_content_async(parts)
+        return resp.text or ""
+
+
+def make_async_provider(provider: str = None, model_name: str = None):
+    """Инициализирует клиента один раз на весь батч (а не на каждый вызов, как generate_push_with_ai)."""
+    provider = (provider or PROVIDER).lower()
+    if provider == "openai":
+        return OpenAIAsyncProvider(model_name or os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+    return GeminiAsyncProvider(model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+
+
+async def _timed_generate(provider, payload, **kwargs):
+    # латентность и ошибки вызовов модели — в метрики текущего таска (utils.metrics.TaskMetrics)
+    from utils.metrics import record_call
+
+    start = time.perf_counter()
+    try:
+        text = await provider.generate(payload, **kwargs)
+    except Exception:
+        record_call("llm", time.perf_counter() - start, ok=False)
+        raise
+    record_call("llm", time.perf_counter() - start)
+    return text
+
+
+async def _generate_one(provider, client_data: dict, bucket, attempts: int, backoff: float) -> str:
+    payload = {"channel": "push", "client": client_data}
+    last_err = None
+    for i in range(attempts):
+        try:
+            await bucket.acquire()
+            text = _sanitize_push(await _timed_generate(provider, payload))
+            if 180 <= len(text) <= 220:
+                return text
+            await bucket.acquire()
+            return _sanitize_push(await _timed_generate(provider, payload, draft=text))
+        except Exception as e:
+            last_err = e
+            # jittered backoff: спит только эта корутина
+            await asyncio.sleep(backoff ** i * random.uniform(0.5, 1.5))
+    raise RuntimeError(f"Не удалось сгенерировать пуш: {last_err}")
+
+
+async def generate_pushes_async(clients: list, provider=None, concurrency: int = 8, rate_per_sec: float = 5.0,
+                                attempts: int = 3, backoff: float = 1.5, cache=None) -> list:
+    """
+    Тексты пушей для списка client_data в том же порядке.
+    concurrency — сколько запросов к модели одновременно, rate_per_sec — token bucket на все запросы.
+    cache — utils.push_cache.PushCache: попадания не ходят в модель, клиенты с одинаковым
+    fingerprint внутри батча генерируются один раз. Текст общий для всех клиентов с этим ключом,
+    поэтому модель получает shared_payload — без имени, client_code и других полей клиента.
+    Для клиента, у которого все попытки упали, в списке None (ошибка пишется в лог).
+    """
+    from utils.push_cache import fingerprint, shared_payload
+    from utils.rate_limit import TokenBucket
+
+    provider = provider or make_async_provider()
+    bucket = TokenBucket(rate_per_sec)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(client_data, client_code):
+        async with semaphore:
+            try:
+                return await _generate_one(provider, client_data, bucket, attempts, backoff)
+            except Exception as e:
+                logging.error(f"Ошибка генерации пуша для {client_code}: {e}")
+                return None
+
+    if cache is None:
+        return await asyncio.gather(*(run(c, c.get("client_code")) for c in clients))
+
+    provider_name = getattr(provider, "name", type(provider).__name__)
+    model_name = getattr(provider, "model_name", "")
+    keys = [fingerprint(provider_name, model_name, SYSTEM_PROMPT, c) for c in clients]
+    texts = {}
+    misses = {}
+    for key, client_data in zip(keys, clients):
+        if key in texts or key in misses:
+            continue
+        hit = cache.get(key)
+        if hit is not None:
+            texts[key] = hit
+        else:
+            misses[key] = client_data
+
+    generated = await asyncio.gather(*(run(shared_payload(c), c.get("client_code")) for c in misses.values()))
+    for key, text in zip(misses, generated):
+        texts[key] = text
+        if text is not None:
+            cache.set(key, text)
+    logging.info(f"push cache: {len(clients) - len(misses)} из {len(clients)} без вызова модели")
+    return [texts[key] for key in keys]
+
+
+def generate_pushes_batch(clients: list, **kwargs) -> list:
+    """Синхронная обёртка над generate_pushes_async для Airflow-тасков."""
+    return asyncio.run(generate_pushes_async(clients, **kwargs))
+
+
+def _client_data(client_profile, best_product, best_value, category_spend, top3, summary):
+    return {
         "client_code": client_profile.get("client_code", "client_10"),
         "avg_monthly_balance_KZT": client_profile.get("avg_monthly_balance_KZT", 1000000),
         "fcm_token": client_profile.get("fcm_token", ""),
         "client_id": client_profile.get("client_id", ""),
-        "best_product": best_product[0] if best_product else None,
+        # best_product — имя продукта или пара (product, scores) из select_best_product
+        "best_product": (best_product if isinstance(best_product, str) else best_product[0]) if best_product else None,
         "best_value": best_value if best_value else 0,
         "category_spend": category_spend if category_spend else {},
         "top3": top3 if top3 else [],
-        "summary": summary
+        "summary": summary,
+        "name": client_profile.get("name"),
     }
 
+
+def send_notifications_batch(items: list, renderer=None, sender=None, sink=None, **kwargs) -> list:
+    """
+    Батч-версия send_notification_to_mobile: items — dict-ы с ключами её аргументов
+    (+ необязательный rich_copy=True — всегда генерировать текст моделью).
+    С renderer (tasks.render_templates.TemplateRenderer) сначала пробуется шаблон продукта;
+    в LLM идут только rich_copy и клиенты, чей шаблон не отрендерился или не прошёл валидацию.
+    Тексты генерируются параллельно (generate_pushes_batch), результат пишется в push_logs.csv
+    или в sink (utils.result_sink.ResultSink), если он передан; commit — на стороне вызывающего.
+    С sender (utils.firebase.FcmBatchSender) готовые тексты отправляются на устройства одним батчем.
+    """
+    from tasks.render_templates import template_fields
+
+    clients = [_client_data(**{k: v for k, v in item.items() if k != "rich_copy"}) for item in items]
+    texts = [None] * len(clients)
+    if renderer is not None:
+        for i, (item, client_data) in enumerate(zip(items, clients)):
+            if not item.get("rich_copy"):
+                texts[i] = renderer.render(client_data["best_product"], template_fields(client_data))
+    pending = [i for i, text in enumerate(texts) if text is None]
+    if pending:
+        generated = generate_pushes_batch([clients[i] for i in pending], **kwargs)
+        for i, text in zip(pending, generated):
+            texts[i] = text
+    rows = [
+        {
+            "client_code": client_data["client_code"],
+            "product": client_data["best_product"],
+            "push_text": text if text is not None else f"Ошибка уведомления для {client_data['client_code']}"
+        }
+        for client_data, text in zip(clients, texts)
+    ]
+    if sink is not None:
+        sink.write_many(rows)
+    else:
+        append_rows_to_csv(rows)
+
+    if sender is not None:
+        messages = [
+            {
+                "token": client_data["fcm_token"],
+                "title": "Выгодное предложение",
+                "body": text,
+                "data": {"client_id": client_data["client_id"], "product": client_data["best_product"]},
+            }
+            for client_data, text in zip(clients, texts)
+            if text is not None and client_data["fcm_token"]
+        ]
+        results = sender.send_many(messages)
+        failed = [r for r in results if not r["ok"]]
+        logging.info(f"Пуши отправлены: {len(results) - len(failed)} из {len(results)}")
+        if failed:
+            logging.error(f"Ошибки отправки: {len(failed)}, недействительных токенов: {len(invalid_tokens(results))}")
+    return texts
+
+
+def send_notification_to_mobile(client_profile, best_product, best_value, category_spend, top3, summary):
+    # Подготовка данных клиента
+    client_data = _client_data(client_profile, best_product, best_value, category_spend, top3, summary)
+
     # # Проверка наличия токена
     # if not client_profile.get("fcm_token"):
     #     logging.error(f"Отсутствует fcm_token для клиента {client_data['client_code']}")
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from tasks.compute_signals import aggregate_transactions, aggregate_transfers, signals_from_aggregates
+from tasks.load_data import CLIENTS_SCHEMA, TRANSACTIONS_SCHEMA, TRANSFERS_SCHEMA, iter_csv_chunks, read_cached
+
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def _merge_categories(acc, part):
+    if acc is None:
+        return part
+    both = pd.concat([acc, part])
+    return both.groupby(level=["client_code", "category"]).agg(
+        amount=("amount", "sum"), count=("count", "sum"), first_seen=("first_seen", "min")
+    )
+
+
+def _merge_sums(acc, part):
+    if acc is None:
+        return part
+    return pd.concat([acc, part]).groupby(level=list(range(part.index.nlevels))).sum()
+
+
+def aggregate_transactions_streaming(tx_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    aggregate_transactions по файлу кусками: в памяти только текущий кусок и агрегаты
+    (client, category) и (client, day), размер которых не зависит от длины файла.
+    """
+    by_category, daily = None, None
+    offset = 0
+    for chunk in iter_csv_chunks(tx_path, TRANSACTIONS_SCHEMA, chunksize):
+        cat, day = aggregate_transactions(chunk)
+        cat["first_seen"] += offset  # позиция строки в файле, а не в куске
+        offset += len(chunk)
+        by_category = _merge_categories(by_category, cat)
+        daily = _merge_sums(daily, day)
+    return by_category, daily
+
+
+def aggregate_transfers_streaming(tr_path, chunksize=DEFAULT_CHUNKSIZE):
+    flows = None
+    for chunk in iter_csv_chunks(tr_path, TRANSFERS_SCHEMA, chunksize):
+        flows = _merge_sums(flows, aggregate_transfers(chunk))
+    return flows
+
+
+def compute_signals_streaming(tx_path, tr_path, clients_path, chunksize=DEFAULT_CHUNKSIZE, details=True):
+    """
+    Те же сигналы, что compute_signals_batch, но без загрузки файлов целиком:
+    пиковая память ~ chunksize строк + агрегаты по клиентам.
+    """
+    by_category, daily = aggregate_transactions_streaming(tx_path, chunksize)
+    flows = aggregate_transfers_streaming(tr_path, chunksize)
+    if flows is None:
+        flows = pd.DataFrame(columns=["total_in", "total_out", "fx_count", "n_transfers"])
+    clients = read_cached(clients_path, CLIENTS_SCHEMA)
+    balances = clients.set_index("client_code")["avg_monthly_balance_KZT"]
+    return signals_from_aggregates(by_category, daily, flows, balances, details=details)
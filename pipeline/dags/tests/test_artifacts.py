@@ -0,0 +1,26 @@
+import math
+
+from utils.artifacts import read_frame, remove_run, write_frame
+from tasks.compute_signals import compute_signals_batch
+from tests.test_signals import _make_client_frames
+
+
+def test_signals_roundtrip_through_artifacts(tmp_path):
+    tx, tr, clients = _make_client_frames(n_clients=5, seed=4)
+    table = compute_signals_batch(tx, tr, clients)
+
+    path = write_frame(table, "run-1", "signals", root=str(tmp_path))
+    restored = read_frame(path)
+
+    assert list(restored.index) == list(table.index)
+    assert restored.index.name == "client_code"
+    for code in table.index:
+        assert restored.loc[code, "category_spend"] == table.loc[code, "category_spend"]
+        assert restored.loc[code, "top_categories"] == table.loc[code, "top_categories"]
+        assert math.isclose(restored.loc[code, "total_spend"], table.loc[code, "total_spend"])
+
+    subset = read_frame(path, columns=["total_spend"])
+    assert list(subset.columns) == ["total_spend"]
+    assert list(subset.index) == list(table.index)
+    remove_run("run-1", root=str(tmp_path))
+    assert not (tmp_path / "run-1").exists()
@@ -0,0 +1,73 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from tasks.backfill import DATASET, CumulativeAggregates, backfill
+from tasks.compute_benefits import compute_products_batch
+from tasks.compute_signals import compute_signals_batch
+from tasks.select_best_product import select_top_k, top_k_to_frame
+from tests.test_signals import _make_client_frames
+from utils.result_sink import read_dataset
+
+
+def _frames(seed=11):
+    tx, tr, clients = _make_client_frames(n_clients=25, seed=seed)
+    rng = np.random.default_rng(seed)
+    tr["date"] = pd.Timestamp("2025-06-01") + pd.to_timedelta(rng.integers(0, 90, len(tr)), unit="D")
+    # строки не по дате: first_seen окна — минимум по дням, а не первый день
+    tx = tx.sample(frac=1, random_state=seed).reset_index(drop=True)
+    tx["category"] = tx["category"].astype("category")
+    return tx, tr, clients
+
+
+def _window_rows(frame, as_of, window):
+    start = as_of - pd.Timedelta(days=window - 1)
+    return frame[(frame["date"] >= start) & (frame["date"] <= as_of)]
+
+
+def test_cumulative_window_matches_batch_over_window_rows():
+    tx, tr, clients = _frames()
+    window = 30
+    aggregates = CumulativeAggregates(tx, tr, clients, window_days=window)
+
+    # включая окна, выходящие за начало и конец данных
+    for as_of in pd.date_range("2025-06-05", "2025-09-20", freq="9D"):
+        got = aggregates.window(as_of)
+        expected = compute_signals_batch(_window_rows(tx, as_of, window), _window_rows(tr, as_of, window), clients)
+        assert list(got.index) == list(expected.index)
+        assert list(got.columns) == list(expected.columns)
+        for key in ("total_spend", "travel_count", "fx_activity", "cash_gap_ratio", "spending_stability",
+                    "top_spend", "savings_propensity", "jewelry_need"):
+            for want, have in zip(expected[key], got[key]):
+                assert (math.isnan(want) and math.isnan(have)) or math.isclose(want, have, rel_tol=1e-9), key
+        assert got["top_categories"].tolist() == expected["top_categories"].tolist()
+        assert got["category_count"].tolist() == expected["category_count"].tolist()
+
+
+def test_window_without_transactions_is_empty():
+    tx, tr, clients = _frames()
+    assert CumulativeAggregates(tx, tr, clients).window("2025-01-01").empty
+
+
+def test_backfill_writes_dataset_partitioned_by_as_of(tmp_path):
+    tx, tr, clients = _frames(seed=4)
+    result = backfill(tx, tr, clients, "2025-08-20", "2025-08-24", root=str(tmp_path), window_days=30)
+    assert result["dates"] == 5
+
+    recs = read_dataset(str(tmp_path), DATASET, "2025-08-20_2025-08-24")
+    assert len(recs) == result["rows"]
+    assert sorted(recs["as_of"].unique()) == [f"2025-08-{d}" for d in range(20, 25)]
+    run_dir = tmp_path / DATASET / "run=2025-08-20_2025-08-24"
+    (writer_dir,) = [d for d in os.listdir(run_dir) if d.startswith("writer=backfill.")]
+    assert "as_of=2025-08-20" in os.listdir(run_dir / writer_dir)
+
+    as_of = pd.Timestamp("2025-08-22")
+    signals = compute_signals_batch(_window_rows(tx, as_of, 30), _window_rows(tr, as_of, 30), clients, details=False)
+    benefit, utility = compute_products_batch(signals)
+    expected = top_k_to_frame(select_top_k(utility, k=3), benefit)
+    got = recs[recs["as_of"] == "2025-08-22"].reset_index(drop=True)
+    assert got["client_code"].tolist() == expected["client_code"].tolist()
+    assert got["product"].tolist() == expected["product"].tolist()
+    np.testing.assert_allclose(got["utility"], expected["utility"], rtol=1e-6)
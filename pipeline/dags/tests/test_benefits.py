@@ -0,0 +1,122 @@
+import math
+
+from tasks import compute_benefits
+from tasks.compute_benefits import PRODUCTS, compute_products, compute_products_batch, explain_products_batch
+from tasks.compute_signals import compute_signals_batch, signals_for_client
+from tests.test_signals import _make_client_frames
+
+
+def test_compute_products_batch_matches_per_client():
+    tx, tr, clients = _make_client_frames(n_clients=30, seed=1)
+    table = compute_signals_batch(tx, tr, clients)
+    benefit, utility = compute_products_batch(table)
+
+    assert benefit.shape == (len(table), len(PRODUCTS))
+    assert list(utility.columns) == PRODUCTS
+    for code in table.index:
+        expected = compute_products(signals_for_client(table, code))
+        for product, scores in expected.items():
+            assert math.isclose(benefit.loc[code, product], scores["benefit"], abs_tol=1e-6), product
+            assert math.isclose(utility.loc[code, product], scores["utility"], abs_tol=1e-6), product
+
+
+def test_per_client_scores_read_the_same_params_and_caps():
+    from utils.config_loader import BusinessParams
+
+    tx, tr, clients = _make_client_frames(n_clients=30, seed=6)
+    table = compute_signals_batch(tx, tr, clients)
+    params = BusinessParams(travel_cashback_rate=0.5, credit_card_rate_top3=0.3, fx_saving_per_tx=2_000.0,
+                            loan_value_buffer_rate=0.2, gold_expected_annual_return=0.6, cashback_cap=5_000.0)
+    benefit, utility = compute_products_batch(table, params)
+
+    assert (benefit[["Карта для путешествий", "Премиальная карта", "Кредитная карта"]] <= 5_000.0).all().all()
+    assert (benefit != compute_products_batch(table)[0]).any().any()
+    for code in table.index:
+        for product, scores in compute_products(signals_for_client(table, code), params=params).items():
+            assert math.isclose(benefit.loc[code, product], scores["benefit"], abs_tol=1e-6), product
+            assert math.isclose(utility.loc[code, product], scores["utility"], abs_tol=1e-6), product
+
+
+def test_compute_products_batch_without_top_spend_column():
+    tx, tr, clients = _make_client_frames(n_clients=5, seed=2)
+    table = compute_signals_batch(tx, tr, clients)
+    _, with_column = compute_products_batch(table)
+    _, without_column = compute_products_batch(table.drop(columns="top_spend"))
+    assert (with_column == without_column).all().all()
+
+
+def test_scoring_trace_off_by_default_and_records_when_enabled(capsys):
+    tx, tr, clients = _make_client_frames(n_clients=3, seed=3)
+    table = compute_signals_batch(tx, tr, clients)
+    code, other = table.index[0], table.index[1]
+
+    compute_products(signals_for_client(table, code), client_code=code)
+    assert capsys.readouterr().out == ""
+
+    trace, other_trace = compute_benefits.ScoringTrace(code), compute_benefits.ScoringTrace(other)
+    scores = compute_products(signals_for_client(table, code), trace=trace)
+    compute_products(signals_for_client(table, other), trace=other_trace)
+    assert capsys.readouterr().out == ""
+    assert [r["product"] for r in trace.records] == list(scores)
+    for record in trace.records:
+        assert record["client_code"] == code and record["reasons"]
+        assert math.isclose(record["utility"], scores[record["product"]]["utility"], abs_tol=1e-6)
+    assert {r["client_code"] for r in other_trace.records} == {other}
+
+
+def test_explain_products_batch_matches_utility():
+    tx, tr, clients = _make_client_frames(n_clients=20, seed=4)
+    table = compute_signals_batch(tx, tr, clients)
+    _, utility = compute_products_batch(table)
+    trace = explain_products_batch(table)
+
+    assert len(trace) == len(table) * len(PRODUCTS)
+    pivot = trace.pivot(index="client_code", columns="product", values="utility")[PRODUCTS]
+    assert ((pivot.loc[utility.index] - utility).abs() < 1e-9).all().all()
+    assert set(trace.loc[trace["benefit"] <= 0, "reasons"]) <= {"NO_BENEFIT"}
+
+    sampled = explain_products_batch(table, sample=5, seed=1)
+    assert sampled["client_code"].nunique() == 5
+    assert sampled.equals(explain_products_batch(table, sample=5, seed=1))
+
+
+def test_select_top_k_matches_best_product_and_masks():
+    import numpy as np
+    from tasks.select_best_product import select_best_product, select_top_k
+
+    tx, tr, clients = _make_client_frames(n_clients=30, seed=3)
+    table = compute_signals_batch(tx, tr, clients)
+    benefit, utility = compute_products_batch(table)
+
+    top = select_top_k(utility, k=3)
+    assert len(top) == 3 * len(table)
+    best = top[top["rank"] == 1]
+    for row in best:
+        scores = {p: {"benefit": benefit.loc[row["client"], p], "utility": utility.loc[row["client"], p]}
+                  for p in PRODUCTS}
+        assert PRODUCTS[row["product"]] == select_best_product(scores)[0]
+    assert np.all(np.diff(top["utility"].reshape(-1, 3), axis=1) <= 0)
+
+    eligible = np.ones(utility.shape, dtype=bool)
+    eligible[:, best["product"][0]] = False
+    eligible[0, :] = False
+    masked = select_top_k(utility, k=3, eligible=eligible)
+    assert best["product"][0] not in masked["product"]
+    assert utility.index[0] not in masked["client"]
+
+
+def test_select_top_k_ties_go_to_lower_product_index():
+    import numpy as np
+    from tasks.select_best_product import select_top_k
+
+    utility = np.zeros((2, 10))
+    utility[0, 7] = 1
+    utility[1, [2, 5, 9]] = 3
+    top = select_top_k(utility, k=3)
+    assert top["product"].tolist() == [7, 0, 1, 2, 5, 9]
+
+    rng = np.random.default_rng(0)
+    utility = rng.integers(0, 3, size=(2000, 10)).astype(float)
+    top = select_top_k(utility, k=3)["product"].reshape(-1, 3)
+    assert (top[:, 0] == utility.argmax(axis=1)).all()
+    assert (top == np.argsort(-utility, axis=1, kind="stable")[:, :3]).all()
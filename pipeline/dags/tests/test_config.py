@@ -0,0 +1,54 @@
+import dataclasses
+import os
+
+import pytest
+
+from utils.config_loader import BusinessParams, load_business_params, load_config
+
+CONFIGS = os.path.join(os.path.dirname(__file__), "..", "..", "configs")
+
+
+def test_repo_business_params_match_scorer_defaults():
+    assert load_business_params(os.path.join(CONFIGS, "business_params.yaml")) == BusinessParams()
+
+
+def test_every_business_param_is_used_by_products():
+    # у каждой ставки один ключ, и он влияет на скоринг
+    products = open(os.path.join(CONFIGS, "products.yaml"), encoding="utf-8").read()
+    unused = [f.name for f in dataclasses.fields(BusinessParams) if f.name not in products]
+    assert unused == []
+
+
+def test_config_cache_reloads_only_on_mtime_change(tmp_path):
+    path = tmp_path / "params.yaml"
+    path.write_text("travel_cashback_rate: 0.04\n")
+    first = load_business_params(str(path))
+    assert load_business_params(str(path)) is first
+    assert load_config(str(path)) == {"travel_cashback_rate": 0.04}
+
+    path.write_text("travel_cashback_rate: 0.05\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    reloaded = load_business_params(str(path))
+    assert reloaded.travel_cashback_rate == 0.05
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        reloaded.travel_cashback_rate = 1.0
+
+
+def test_unknown_business_param_is_rejected():
+    with pytest.raises(ValueError):
+        BusinessParams.from_dict({"travel_cashback_rat": 0.04})
+
+
+def test_batch_scorer_reads_rates_from_params():
+    from tasks.compute_benefits import compute_products_batch
+    from tasks.compute_signals import compute_signals_batch
+    from tests.test_signals import _make_client_frames
+
+    table = compute_signals_batch(*_make_client_frames(n_clients=5, seed=8))
+    base, _ = compute_products_batch(table)
+    doubled, _ = compute_products_batch(table, BusinessParams(deposit_saving_frozen_rate_annual=0.12, cashback_cap=1.0))
+    has_balance = table["avg_balance"] > 0
+    assert (doubled["Депозит сберегательный"][has_balance] == 2 * base["Депозит сберегательный"][has_balance]).all()
+    assert (doubled["Карта для путешествий"] <= 1.0).all()
+    assert (doubled["Кредитная карта"] <= 1.0).all()
@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tasks.compute_signals import compute_signals_batch, signals_for_client
+from tests.test_signals import _make_client_frames
+from utils.feature_store import FeatureStore, build_index, publish_features
+
+
+def test_build_index_finds_every_key():
+    codes = np.array([7, -3, 1 << 40, 0, 12, 16, 32, 48])
+    keys, rows, bits = build_index(codes)
+    assert len(keys) == 1 << bits and (keys != np.iinfo(np.int64).min).sum() == len(codes)
+    assert sorted(rows[rows >= 0].tolist()) == list(range(len(codes)))
+    assert {int(keys[slot]): int(rows[slot]) for slot in np.flatnonzero(rows >= 0)} == \
+        {int(c): i for i, c in enumerate(codes)}
+
+
+def test_publish_and_lookup_matches_signals(tmp_path):
+    tx, tr, clients = _make_client_frames(n_clients=25, seed=6)
+    table = compute_signals_batch(tx, tr, clients)
+    shards = [table.iloc[:10], table.iloc[10:]]
+    publish_features(shards, root=str(tmp_path), version="2025-09-01")
+
+    store = FeatureStore.open(str(tmp_path))
+    assert store.version == "2025-09-01" and len(store) == len(table)
+    assert isinstance(store.column("total_spend"), np.memmap)
+    for code in table.index:
+        expected = signals_for_client(table, code)
+        got = store.get(code)
+        for key, value in expected.items():
+            if isinstance(value, (dict, list, str)) or value is None:
+                assert got[key] == value, key
+            elif isinstance(value, float) and math.isnan(value):
+                assert math.isnan(got[key]), key
+            else:
+                assert got[key] == pytest.approx(value), key
+    assert store.get(10_000) is None
+
+
+def test_new_version_switches_current_and_prunes(tmp_path):
+    tx, tr, clients = _make_client_frames(n_clients=5, seed=1)
+    table = compute_signals_batch(tx, tr, clients, details=False)
+    old = FeatureStore(publish_features(table, root=str(tmp_path), version="v1"))
+    for version in ("v2", "v3", "v4"):
+        publish_features(table.assign(total_spend=table["total_spend"] + 1), root=str(tmp_path),
+                         version=version, keep=2)
+
+    store = FeatureStore.open(str(tmp_path))
+    assert store.version == "v4"
+    assert sorted(p.name for p in (tmp_path / "versions").iterdir()) == ["v3", "v4"]
+    code = table.index[0]
+    # открытая до удаления версия продолжает читаться
+    assert old.get(code)["total_spend"] + 1 == pytest.approx(store.get(code)["total_spend"])
+
+    with pytest.raises(ValueError):
+        publish_features(pd.concat([table, table]), root=str(tmp_path), version="dup")
+    assert FeatureStore.open(str(tmp_path)).version == "v4"
@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.firebase import FcmBatchSender, invalid_tokens
+
+
+class _MockFcm(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, чтобы было видно переиспользование соединений
+    seen = {}
+    ports = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        token = body["to"]
+        with self.lock:
+            self.seen[token] = self.seen.get(token, 0) + 1
+            self.ports.add(self.client_address[1])
+            count = self.seen[token]
+        if token == "flaky" and count == 1:
+            self._reply(503, {})
+        elif token == "dead":
+            self._reply(200, {"success": 0, "failure": 1, "results": [{"error": "NotRegistered"}]})
+        elif token == "forbidden":
+            self._reply(401, {})
+        else:
+            self._reply(200, {"success": 1, "failure": 0, "results": [{"message_id": f"m-{token}"}]})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fcm_batch_sender_against_mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockFcm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        sender = FcmBatchSender(url=f"http://127.0.0.1:{server.server_port}/fcm/send",
+                                max_workers=4, backoff=0.01)
+        tokens = [f"t{i}" for i in range(40)] + ["flaky", "dead", "forbidden"]
+        results = sender.send_many([{"token": t, "title": "x", "body": "y"} for t in tokens])
+        sender.close()
+    finally:
+        server.shutdown()
+
+    assert [r["token"] for r in results] == tokens
+    by_token = {r["token"]: r for r in results}
+    assert all(by_token[f"t{i}"]["ok"] for i in range(40))
+    assert by_token["flaky"]["ok"] and by_token["flaky"]["attempts"] == 2
+    assert not by_token["forbidden"]["ok"] and by_token["forbidden"]["attempts"] == 1
+    assert invalid_tokens(results) == ["dead"]
+    assert len(_MockFcm.ports) <= 4  # соединения из пула, а не по одному на пуш
+
+
+def test_fcm_retry_after_is_never_shortened(monkeypatch):
+    import time
+    from types import SimpleNamespace
+
+    from utils import firebase
+
+    class _Throttled:
+        status_code = 503
+        headers = {"Retry-After": "2"}
+
+    delays, closed = [], []
+    monkeypatch.setattr(firebase, "time", SimpleNamespace(sleep=delays.append, perf_counter=time.perf_counter))
+    with FcmBatchSender(url="http://fcm.invalid/send", attempts=50, backoff=0.01) as sender:
+        sender.session.post = lambda *args, **kwargs: _Throttled()
+        sender.session.close = lambda: closed.append(True)
+        result = sender.send_one({"token": "t"})
+    assert not result["ok"] and result["attempts"] == 50
+    assert len(delays) == 49 and min(delays) >= 2 and max(delays) <= 3
+    assert closed == [True]  # with закрыл пул соединений
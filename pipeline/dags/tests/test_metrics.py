@@ -0,0 +1,65 @@
+import json
+import socket
+
+import pytest
+
+from utils.metrics import StatsdClient, TaskMetrics, record_call, write_run_summary
+
+
+def test_task_metrics_records_calls_statsd_and_run_summary(tmp_path):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(1)
+    statsd = StatsdClient("127.0.0.1", server.getsockname()[1], prefix="test")
+
+    record_call("llm", 0.5)  # вне TaskMetrics — не учитывается
+    with TaskMetrics("compute", "2025-09-01", "shard_0", root=str(tmp_path), statsd=statsd) as m:
+        m.rows_in, m.rows_out = 100, 10
+        record_call("llm", 0.2)
+        record_call("llm", 0.1, ok=False)
+        record_call("fcm", 0.05)
+    assert m.record["llm_calls"] == 2 and m.record["llm_errors"] == 1
+    assert m.record["llm_max_ms"] == pytest.approx(200)
+    assert m.record["fcm_calls"] == 1 and m.record["rows_out"] == 10
+    assert m.record["wall_s"] >= 0 and m.record["peak_rss_mb"] > 0
+
+    packets = set()
+    while True:
+        try:
+            packets.add(server.recv(1024).decode())
+        except socket.timeout:
+            break
+    assert "test.compute.rows_in:100|c" in packets
+    assert any(p.startswith("test.compute.wall_ms:") and p.endswith("|ms") for p in packets)
+    assert "test.compute.llm.calls:2|c" in packets
+
+    with pytest.raises(RuntimeError):
+        with TaskMetrics("compute", "2025-09-01", "shard_1", root=str(tmp_path), statsd=StatsdClient(None)) as m2:
+            m2.rows_in = 50
+            raise RuntimeError("boom")
+
+    with open(write_run_summary(str(tmp_path), "2025-09-01"), encoding="utf-8") as f:
+        summary = json.load(f)
+    compute = summary["tasks"]["compute"]
+    assert compute["writers"] == 2 and compute["rows_in"] == 150 and compute["llm_calls"] == 2
+    assert sorted(w["ok"] for w in summary["workers"]) == [False, True]
+
+
+def test_task_metrics_closes_only_its_own_statsd_socket(monkeypatch):
+    closed = []
+
+    class SpyStatsd(StatsdClient):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr("utils.metrics.StatsdClient", lambda: SpyStatsd("127.0.0.1", 9))
+    with TaskMetrics("compute", "2025-09-01") as own:
+        pass
+    assert closed == [own.statsd] and own.statsd._sock.fileno() == -1
+
+    shared = SpyStatsd("127.0.0.1", 9)
+    with TaskMetrics("compute", "2025-09-01", statsd=shared):
+        pass
+    assert shared not in closed and shared._sock.fileno() != -1
+    shared.close()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+
+import pandas as pd
+
+from serving.online import OnlineService, Snapshot, latest_snapshot_path
+from tasks.compute_benefits import compute_products
+from tasks.compute_signals import compute_signals
+from tasks.select_best_product import select_best_product
+from tests.test_signals import _make_client_frames
+
+
+async def _get(port, path, method="GET"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, body = raw.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+def _write_recs(output_dir, ds, rows):
+    path = os.path.join(output_dir, ds, "recommendations.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame(rows, columns=["client_code", "rank", "product", "benefit", "utility"]).to_csv(path, index=False)
+    return path
+
+
+def test_snapshot_lookup():
+    snapshot = Snapshot.from_frame(pd.DataFrame({
+        "client_code": [5, 2, 2], "rank": [1, 1, 2], "product": ["A", "B", "A"],
+        "benefit": [10.0, 20.0, 5.0], "utility": [1.5, 2.5, 0.5],
+    }), "s1")
+    assert snapshot.get(2) == {"client_code": 2, "product": "B", "utility": 2.5, "benefit": 20.0}
+    assert snapshot.get(3) is None and snapshot.get(99) is None and len(snapshot) == 2
+
+
+def test_online_service_snapshot_fallback_and_swap(tmp_path):
+    data_dir, output_dir = tmp_path / "data", tmp_path / "outputs"
+    data_dir.mkdir()
+    tx, tr, clients = _make_client_frames(n_clients=3, seed=2)
+    for code in (2, 3):
+        tx[tx["client_code"] == code].drop(columns="client_code").to_csv(
+            data_dir / f"client_{code}_transactions_3m.csv", index=False)
+        tr[tr["client_code"] == code].drop(columns="client_code").to_csv(
+            data_dir / f"client_{code}_transfers_3m.csv", index=False)
+    clients.to_csv(data_dir / "clients.csv", index=False)
+    _write_recs(str(output_dir), "2025-09-01", [(1, 1, "Инвестиции", 100.0, 42.0)])
+
+    balance = clients.set_index("client_code").loc[2, "avg_monthly_balance_KZT"]
+    signals = compute_signals({"transactions": tx[tx["client_code"] == 2], "transfers": tr[tr["client_code"] == 2],
+                               "avg_monthly_balance": balance})
+    expected_product, expected_scores = select_best_product(compute_products(signals))
+
+    async def scenario():
+        service = OnlineService(data_dir=str(data_dir), output_dir=str(output_dir), poll_interval=3600)
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            hit = await _get(port, "/recommendation/1")
+            computed = await _get(port, "/recommendation/2")
+            missing = await _get(port, "/recommendation/404")
+            bad = await _get(port, "/recommendation/abc")
+
+            _write_recs(str(output_dir), "2025-09-02", [(1, 1, "Золотые слитки", 1.0, 7.0),
+                                                         (2, 1, "Обмен валют", 2.0, 8.0)])
+            reload = await _get(port, "/reload", method="POST")
+            swapped = await _get(port, "/recommendation/2")
+            health = await _get(port, "/health")
+        finally:
+            service.stop()
+            server.close()
+            await server.wait_closed()
+        return hit, computed, missing, bad, reload, swapped, health
+
+    hit, computed, missing, bad, reload, swapped, health = asyncio.run(scenario())
+    assert hit == (200, {"client_code": 1, "product": "Инвестиции", "utility": 42.0, "benefit": 100.0,
+                         "source": "snapshot", "snapshot": hit[1]["snapshot"]})
+    assert hit[1]["snapshot"].startswith("2025-09-01@")
+    assert computed[0] == 200 and computed[1]["source"] == "computed"
+    assert computed[1]["product"] == expected_product
+    assert abs(computed[1]["utility"] - expected_scores["utility"]) < 1e-3
+    assert missing[0] == 404 and bad[0] == 400
+    assert reload == (200, {"reloaded": True, "snapshot": reload[1]["snapshot"]})
+    assert swapped[1]["product"] == "Обмен валют" and swapped[1]["source"] == "snapshot"
+    assert health[1]["clients"] == 2
+    assert latest_snapshot_path(str(output_dir)).endswith(os.path.join("2025-09-02", "recommendations.csv"))
+
+
+def test_online_balances_loaded_off_loop_and_reset_on_swap(tmp_path):
+    import threading
+
+    seen = []
+
+    def compute(client_code, data_dir, balances, params=None):
+        seen.append((threading.current_thread() is threading.main_thread(), balances.get(client_code)))
+        return {"client_code": client_code, "product": "Инвестиции", "utility": 1.0, "benefit": 1.0}
+
+    pd.DataFrame({"client_code": [5], "avg_monthly_balance_KZT": [10.0]}).to_csv(tmp_path / "clients.csv", index=False)
+    service = OnlineService(data_dir=str(tmp_path), output_dir=str(tmp_path), snapshot_source=lambda: None,
+                            compute=compute)
+
+    async def scenario():
+        await service.recommend(5)
+        assert service._balances == {5: 10.0}
+        pd.DataFrame({"client_code": [5], "avg_monthly_balance_KZT": [20.0]}).to_csv(
+            tmp_path / "clients.csv", index=False)
+        os.utime(tmp_path / "clients.csv", ns=(1, 1))  # новый ключ кеша read_cached
+        service.swap(Snapshot.from_frame(pd.DataFrame(columns=["client_code", "rank", "product", "benefit",
+                                                               "utility"])))
+        assert service._balances is None
+        await service.recommend(5)
+
+    asyncio.run(scenario())
+    assert seen == [(False, 10.0), (False, 20.0)]
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from tasks.compute_benefits import compute_products_batch
+from tasks.compute_signals import compute_signals_batch
+from tasks.parallel import run_chain_parallel, split_by_client
+from tasks.select_best_product import select_top_k, top_k_to_frame
+from tests.test_signals import _make_client_frames
+
+
+def test_split_by_client_contiguous_ranges():
+    chunks = split_by_client([5, 3, 3, 9, 1, 7], 4)
+    assert [c.tolist() for c in chunks] == [[1, 3], [5], [7], [9]]
+    assert len(split_by_client([1, 2], 10)) == 2
+
+
+def test_run_chain_parallel_matches_single_process(tmp_path):
+    tx, tr, clients = _make_client_frames(n_clients=40, seed=11)
+    tx = tx.sample(frac=1, random_state=0)  # порядок строк не важен для результата
+    signals = compute_signals_batch(tx.sort_values("client_code", kind="stable"), tr, clients, details=False)
+    benefit, utility = compute_products_batch(signals)
+    recs = top_k_to_frame(select_top_k(utility, k=3), benefit)
+
+    for workers in (1, 2):
+        out = run_chain_parallel(tx, tr, clients, workers=workers, n_chunks=5, work_dir=str(tmp_path))
+        pd.testing.assert_frame_equal(out["utility"], utility)
+        pd.testing.assert_frame_equal(out["benefit"], benefit)
+        pd.testing.assert_frame_equal(out["recommendations"], recs)
+        pd.testing.assert_frame_equal(out["signals"], signals, check_dtype=False)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,90 @@
+import copy
+
+import numpy as np
+import pytest
+
+from tasks.compute_benefits import compute_products_batch, normalize, score_matrices
+from tasks.compute_signals import compute_signals_batch
+from tasks.param_sweep import grid, load_grid, main, sweep
+from tasks.select_best_product import select_top_k
+from tests.test_signals import _make_client_frames
+from utils.artifacts import write_frame
+from utils.config_loader import DEFAULT_PRODUCTS_PATH, BusinessParams, load_product_plan
+
+
+def _best(signals, params=None, plan=None):
+    benefit, utility = compute_products_batch(signals, params, plan)
+    top = select_top_k(utility, k=1)
+    counts = np.bincount(top["product"], minlength=benefit.shape[1])
+    return counts, benefit.to_numpy()[np.arange(len(benefit)), top["product"]].sum()
+
+
+def test_sweep_matches_batch_scorer_per_variant():
+    table = compute_signals_batch(*_make_client_frames(n_clients=40, seed=3))
+    variants = [{"name": "rich_savings", "deposit_saving_frozen_rate_annual": 2.4}] + grid(
+        gold_expected_annual_return=[0.12, 3.6], cashback_cap=[10.0])
+    summary, mix, mix_delta = sweep(table, variants, chunk_size=7)
+
+    assert list(summary.index) == ["base", "rich_savings", "gold_expected_annual_return=0.12,cashback_cap=10.0",
+                                   "gold_expected_annual_return=3.6,cashback_cap=10.0"]
+    rates = [{}, {"deposit_saving_frozen_rate_annual": 2.4},
+             {"gold_expected_annual_return": 0.12, "cashback_cap": 10.0},
+             {"gold_expected_annual_return": 3.6, "cashback_cap": 10.0}]
+    for name, overrides in zip(summary.index, rates):
+        counts, total = _best(table, BusinessParams(**overrides))
+        assert (mix.loc[name].to_numpy() == counts).all()
+        assert summary.loc[name, "total_benefit"] == pytest.approx(total)
+    assert (mix_delta.loc["base"] == 0).all()
+    assert (mix.sum(axis=1) == len(table)).all()
+    assert summary.loc["rich_savings", "total_benefit_delta"] > 0
+
+
+def test_sweep_product_weights():
+    table = compute_signals_batch(*_make_client_frames(n_clients=30, seed=5))
+    summary, mix, _ = sweep(table, [{"Инвестиции.alpha": 1.0, "Кредитная карта.max_value": 1000}])
+
+    plan = copy.copy(load_product_plan(DEFAULT_PRODUCTS_PATH))
+    plan.alpha, plan.max_value = plan.alpha.copy(), plan.max_value.copy()
+    plan.alpha[plan.products.index("Инвестиции")] = 1.0
+    plan.max_value[plan.products.index("Кредитная карта")] = 1000
+    counts, total = _best(table, plan=plan)
+    name = summary.index[1]
+    assert (mix.loc[name].to_numpy() == counts).all()
+    assert summary.loc[name, "total_benefit"] == pytest.approx(total)
+    # каждый сменивший продукт клиент меняет распределение не больше чем на 2
+    assert summary.loc[name, "switched"] >= (mix.loc[name] - mix.loc["base"]).abs().sum() / 2
+
+
+@pytest.mark.parametrize("variant", [{"deposit_saving_frozen_rate": 0.1}, {"Ипотека.alpha": 0.5}])
+def test_sweep_rejects_unknown_keys(variant):
+    table = compute_signals_batch(*_make_client_frames(n_clients=3, seed=1))
+    with pytest.raises(ValueError):
+        sweep(table, [variant])
+
+
+def test_sweep_cli(tmp_path, capsys):
+    table = compute_signals_batch(*_make_client_frames(n_clients=10, seed=2))
+    signals_path = write_frame(table, "sweep", "signals", root=str(tmp_path))
+    grid_path = tmp_path / "grid.yaml"
+    grid_path.write_text("variants:\n  - name: more\n    deposit_saving_frozen_rate_annual: 1.2\n"
+                         "grid:\n  gold_expected_annual_return: [0.24, 0.36]\n", encoding="utf-8")
+    assert len(load_grid(str(grid_path))) == 3
+
+    out = tmp_path / "sweep.csv"
+    assert main([str(grid_path), "--signals", signals_path, "--out", str(out)]) == 0
+    assert "more" in capsys.readouterr().out
+    assert out.read_text(encoding="utf-8").count("\n") == 5
+
+
+def test_sweep_zero_max_value_scores_benefit_as_zero():
+    table = compute_signals_batch(*_make_client_frames(n_clients=20, seed=3))
+    summary, mix, _ = sweep(table, [{"Кредитная карта.max_value": 0}])
+
+    name = summary.index[1]
+    assert (mix.sum(axis=1) == len(table)).all()
+    assert np.isfinite(summary.loc[name].to_numpy(dtype=float)).all()
+
+    _, benefit_score, _, utility, _, _ = score_matrices(
+        np.array([[500.0, 500.0]]), np.array([[10.0, 10.0]]), 1.0, 0.0, np.array([0.0, 1000.0]))
+    assert benefit_score.tolist() == [[normalize(500, 0), normalize(500, 1000)]]
+    assert np.isfinite(utility).all()
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from tasks.partition import discover_shards, shard_of
+from tasks.load_data import load_shard
+from utils.result_sink import ResultSink, read_dataset
+
+
+def test_shard_of_is_stable_and_in_range():
+    codes = np.arange(1, 1001)
+    shards = shard_of(codes, 8)
+    assert shards.min() >= 0 and shards.max() < 8
+    assert (shard_of(codes[::-1], 8)[::-1] == shards).all()
+    assert np.bincount(shards).min() > 50
+
+
+def test_load_shard_and_combine(tmp_path):
+    pd.DataFrame({"client_code": [1, 2, 3], "avg_monthly_balance_KZT": [1.0, 2.0, 3.0]}).to_csv(
+        tmp_path / "clients.csv", index=False
+    )
+    for code in (1, 2, 3):
+        pd.DataFrame({"date": ["2025-06-01"], "category": ["Такси"], "amount": [100.0 * code]}).to_csv(
+            tmp_path / f"client_{code}_transactions_3m.csv", index=False
+        )
+
+    shards = discover_shards(tmp_path / "clients.csv", 2)
+    assert sum(s["size"] for s in shards) == 3
+
+    for s in shards:
+        tx, tr, clients = load_shard(str(tmp_path), s["shard"], s["n_shards"])
+        assert set(tx["client_code"]) == set(clients["client_code"])
+        assert tr.empty
+        recs = pd.DataFrame({"client_code": clients["client_code"], "rank": 1, "product": "x"})
+        with ResultSink(str(tmp_path / "out"), "recommendations", "r1", writer_id=f"shard_{s['shard']}") as sink:
+            sink.write_many(recs)
+
+    combined = read_dataset(str(tmp_path / "out"), "recommendations", "r1").sort_values(["client_code", "rank"])
+    assert combined["client_code"].tolist() == [1, 2, 3]
+
+
+def test_load_shard_reads_client_files_through_cache(tmp_path):
+    import os
+
+    from tasks.load_data import TRANSACTIONS_SCHEMA, read_cached
+
+    pd.DataFrame({"client_code": [1], "avg_monthly_balance_KZT": [1.0]}).to_csv(tmp_path / "clients.csv", index=False)
+    tx_path = tmp_path / "client_1_transactions_3m.csv"
+    pd.DataFrame({"date": ["2025-06-01"], "category": ["Такси"], "amount": [100.0]}).to_csv(tx_path, index=False)
+
+    tx, _, _ = load_shard(str(tmp_path), 0, 1)
+    versions = os.listdir(tmp_path / ".cache" / tx_path.name)
+    assert len(versions) == 1
+
+    # текущая версия не удаляется, устаревшая — удаляется
+    stale = tmp_path / ".cache" / tx_path.name / "0000000000000000.parquet"
+    stale.write_bytes(b"")
+    os.remove(tmp_path / ".cache" / tx_path.name / versions[0])
+    read_cached(str(tx_path), TRANSACTIONS_SCHEMA)
+    assert os.listdir(tmp_path / ".cache" / tx_path.name) == versions
+    assert read_cached(str(tx_path), TRANSACTIONS_SCHEMA)["amount"].tolist() == tx["amount"].tolist()
+
+
+def test_load_shard_without_files_returns_empty_typed_frames(tmp_path):
+    from tasks.backfill import backfill
+    from tasks.compute_signals import compute_signals_batch
+
+    pd.DataFrame({"client_code": [1, 2], "avg_monthly_balance_KZT": [1.0, 2.0]}).to_csv(
+        tmp_path / "clients.csv", index=False
+    )
+    tx, tr, clients = load_shard(str(tmp_path), 0, 1)
+    assert tx.empty and tr.empty and len(clients) == 2
+    assert isinstance(tx["category"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(tr["date"])
+
+    assert compute_signals_batch(tx, tr, clients).empty
+    assert backfill(tx, tr, clients, "2025-06-01", "2025-06-02", root=str(tmp_path / "out"))["rows"] == 0
+
+
+def test_load_shard_delta_scan_skips_old_files_and_rows(tmp_path):
+    import os
+    import time
+
+    from tasks.incremental_signals import empty_state, load_watermark, save_state, update_state
+
+    pd.DataFrame({"client_code": [1, 2], "avg_monthly_balance_KZT": [1.0, 2.0]}).to_csv(
+        tmp_path / "clients.csv", index=False
+    )
+    for code in (1, 2):
+        pd.DataFrame({"date": ["2025-06-01", "2025-06-02"], "category": ["Такси"] * 2, "amount": [1.0, 2.0]}).to_csv(
+            tmp_path / f"client_{code}_transactions_3m.csv", index=False
+        )
+    assert load_watermark(str(tmp_path / "state")) == (None, None)
+
+    scanned_at = time.time_ns()
+    tx, tr, _ = load_shard(str(tmp_path), 0, 1)
+    state = update_state(empty_state(), tx, tr)
+    state["scanned_at"] = scanned_at
+    save_state(state, str(tmp_path / "state"))
+    since, modified_after = load_watermark(str(tmp_path / "state"))
+    assert since == pd.Timestamp("2025-06-02") and modified_after == scanned_at
+
+    # у клиента 2 дописан новый день; файл клиента 1 не менялся
+    path = tmp_path / "client_2_transactions_3m.csv"
+    pd.DataFrame({"date": ["2025-06-01", "2025-06-02", "2025-06-03"], "category": ["Такси"] * 3,
+                  "amount": [1.0, 2.0, 3.0]}).to_csv(path, index=False)
+    os.utime(path, ns=(scanned_at + 1, scanned_at + 1))
+    os.utime(tmp_path / "client_1_transactions_3m.csv", ns=(scanned_at - 1, scanned_at - 1))
+
+    tx, tr, clients = load_shard(str(tmp_path), 0, 1, since=since, modified_after=modified_after)
+    assert tx["client_code"].tolist() == [2] and tx["amount"].tolist() == [3.0]
+    assert tr.empty and len(clients) == 2
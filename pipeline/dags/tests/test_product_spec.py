@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from tasks.compute_benefits import PRODUCTS, compute_products_batch
+from tasks.compute_signals import compute_signals_batch
+from tests.test_signals import _make_client_frames
+from utils.config_loader import DEFAULT_PRODUCTS_PATH, BusinessParams, load_product_plan
+from utils.product_spec import compile_products
+
+
+def test_repo_products_plan_is_cached():
+    # веса и формулы products.yaml сверяются с score_* в test_compute_products_batch_matches_per_client
+    plan = load_product_plan(DEFAULT_PRODUCTS_PATH)
+    assert plan.products == PRODUCTS
+    assert load_product_plan(DEFAULT_PRODUCTS_PATH) is plan
+    assert load_product_plan(DEFAULT_PRODUCTS_PATH, BusinessParams(gold_expected_annual_return=0.5)) is not plan
+
+
+def test_common_subexpressions_are_shared():
+    spec = {"products": [
+        {"name": "a", "when": "avg_balance > 0", "benefit": "deposit_saving_frozen_rate_annual * avg_balance", "max_value": 1,
+         "alpha": 1, "beta": 0},
+        {"name": "b", "when": "avg_balance > 0", "benefit": "avg_balance * deposit_saving_frozen_rate_annual + 1", "max_value": 1,
+         "alpha": 1, "beta": 0},
+    ]}
+    plan = compile_products(spec, BusinessParams())
+    assert plan.when[0] == plan.when[1]
+    columns = [payload for kind, payload, _ in plan.nodes if kind == "column"]
+    assert columns == ["avg_balance"]
+    # deposit_saving_frozen_rate_annual * avg_balance — один узел, b добавляет только "+ 1"
+    ops = [node for node in plan.nodes if node[0] == "op"]
+    assert len(ops) == 3
+
+
+def test_compiled_plan_scores_custom_product():
+    table = compute_signals_batch(*_make_client_frames(n_clients=6, seed=4))
+    spec = {
+        "defaults": {"gold_interest": 40},
+        "products": [{"name": "Слитки x2", "when": "avg_balance > 0", "benefit": "2 * gold_expected_annual_return / 12 * avg_balance",
+                      "usage": "gold_interest", "max_value": 50000, "alpha": 0.9, "beta": 0.1}],
+    }
+    benefit, utility = compute_products_batch(table, plan=compile_products(spec, BusinessParams()))
+    base, _ = compute_products_batch(table)
+    assert list(benefit.columns) == ["Слитки x2"]
+    np.testing.assert_allclose(benefit["Слитки x2"], 2 * base["Золотые слитки"])
+    assert (utility["Слитки x2"][benefit["Слитки x2"] == 0] == 0).all()
+
+
+@pytest.mark.parametrize("product, message", [
+    ({"name": "x", "benefit": "__import__('os')", "max_value": 1, "alpha": 1, "beta": 0}, "unsupported"),
+    ({"name": "x", "benefit": "min(avg_balance)", "max_value": 1, "alpha": 1, "beta": 0}, "arguments"),
+    ({"name": "x", "benefit": "avg_balance", "alpha": 1, "beta": 0}, "max_value"),
+    ({"name": "x", "benefit": "avg_balance", "max_value": 1, "alpha": 1, "beta": 0, "weight": 2}, "unknown"),
+])
+def test_invalid_product_spec_is_rejected(product, message):
+    with pytest.raises(ValueError, match=message):
+        compile_products({"products": [product]})
+
+
+def test_missing_signal_without_default_is_reported():
+    plan = compile_products({"products": [
+        {"name": "x", "benefit": "unknown_signal", "max_value": 1, "alpha": 1, "beta": 0},
+    ]})
+    table = compute_signals_batch(*_make_client_frames(n_clients=2, seed=1))
+    with pytest.raises(KeyError, match="unknown_signal"):
+        compute_products_batch(table, plan=plan)
@@ -0,0 +1,216 @@
+import asyncio
+import csv
+
+import pytest
+
+from tasks import send_notification
+from tasks.send_notification import generate_pushes_async, send_notifications_batch
+
+GOOD_TEXT = "Вы часто ездите на такси — " + "с тревел-картой часть трат вернётся кешбэком. " * 4 + "Открыть карту"
+GOOD_TEXT = GOOD_TEXT[:200]
+
+
+class FakeProvider:
+    """Локальный провайдер: считает параллельные вызовы и падает на заданных клиентах."""
+
+    def __init__(self, fail_first=(), short=()):
+        self.fail_first = set(fail_first)
+        self.short = set(short)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def generate(self, payload, draft=None):
+        code = payload["client"].get("client_code")  # для кешируемых текстов модель его не получает
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if code in self.fail_first:
+                self.fail_first.discard(code)
+                raise ConnectionError("temporary")
+            if code in self.short and draft is None:
+                return "коротко"
+            return f"{code}: {GOOD_TEXT}"
+        finally:
+            self.in_flight -= 1
+
+
+def test_generate_pushes_async_concurrency_order_and_retries():
+    provider = FakeProvider(fail_first={3}, short={5})
+    clients = [{"client_code": i} for i in range(20)]
+
+    texts = asyncio.run(generate_pushes_async(
+        clients, provider=provider, concurrency=4, rate_per_sec=1000, backoff=0.01
+    ))
+
+    assert [t.split(":")[0] for t in texts] == [str(i) for i in range(20)]
+    assert 1 < provider.max_in_flight <= 4
+    assert provider.calls == 20 + 1 + 1  # один ретрай и один запрос на исправление длины
+
+
+def test_generate_pushes_async_gives_up_with_none():
+    class Broken:
+        async def generate(self, payload, draft=None):
+            raise ConnectionError("down")
+
+    texts = asyncio.run(generate_pushes_async(
+        [{"client_code": 1}], provider=Broken(), attempts=2, rate_per_sec=1000, backoff=0.01
+    ))
+    assert texts == [None]
+
+
+def test_send_notifications_batch_writes_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(send_notification, "OUTPUTS_DIR", str(tmp_path))
+    monkeypatch.setattr(send_notification, "CSV_FILE", str(tmp_path / "push_logs.csv"))
+    items = [
+        {"client_profile": {"client_code": 1}, "best_product": "Премиальная карта", "best_value": 10.0,
+         "category_spend": {}, "top3": [], "summary": "s"},
+    ]
+    send_notifications_batch(items, provider=FakeProvider(), rate_per_sec=1000)
+    rows = list(csv.DictReader(open(tmp_path / "push_logs.csv", encoding="utf-8")))
+    assert rows[0]["product"] == "Премиальная карта"
+    assert rows[0]["push_text"].startswith("1: ")
+
+
+def test_push_cache_skips_provider_and_expires(tmp_path):
+    from utils.push_cache import PushCache
+
+    cache = PushCache(str(tmp_path / "cache.sqlite"))
+    clients = [
+        {"client_code": i, "best_product": "Премиальная карта", "best_value": 12_300 + i,
+         "top3": ["Такси"], "category_spend": {"Такси": 50_000 + i}}
+        for i in range(10)
+    ]
+    provider = FakeProvider()
+    first = asyncio.run(generate_pushes_async(clients, provider=provider, rate_per_sec=1000, cache=cache))
+    assert provider.calls == 1
+    assert len(set(first)) == 1
+
+    again = FakeProvider()
+    reopened = PushCache(str(tmp_path / "cache.sqlite"))
+    assert asyncio.run(generate_pushes_async(clients, provider=again, rate_per_sec=1000, cache=reopened)) == first
+    assert again.calls == 0
+
+    expired = PushCache(str(tmp_path / "cache.sqlite"), ttl=-1)
+    asyncio.run(generate_pushes_async(clients[:1], provider=again, rate_per_sec=1000, cache=expired))
+    assert again.calls == 1
+
+
+def test_push_cache_text_has_no_other_clients_data():
+    from utils.push_cache import CLIENT_FIELDS, PushCache
+
+    class Recording:
+        def __init__(self):
+            self.payloads = []
+
+        async def generate(self, payload, draft=None):
+            self.payloads.append(payload["client"])
+            return f"{payload['client'].get('name')}, {GOOD_TEXT}"
+
+    clients = [
+        send_notification._client_data({"client_code": code, "name": name, "fcm_token": f"t{code}"},
+                                       "Премиальная карта", 12_300, {"Такси": 50_000}, ["Такси"], f"summary {code}")
+        for code, name in [(1, "Айгерим"), (2, "Данияр")]
+    ]
+    provider = Recording()
+    with PushCache(":memory:") as cache:
+        texts = asyncio.run(generate_pushes_async(clients, provider=provider, rate_per_sec=1000, cache=cache))
+    assert len(provider.payloads) == 1 and not set(CLIENT_FIELDS) & set(provider.payloads[0])
+    assert texts[0] == texts[1] and "Айгерим" not in texts[1]
+
+
+def test_push_cache_lru_eviction():
+    from utils.push_cache import PushCache
+
+    cache = PushCache(":memory:", max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.conn.execute("UPDATE push_cache SET last_used = last_used + 10 WHERE key = 'a'")
+    cache.set("c", "3")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_push_cache_batches_touches_and_closes(tmp_path):
+    import sqlite3
+
+    from utils.push_cache import PushCache
+
+    path = str(tmp_path / "cache.sqlite")
+    with PushCache(path, touch_batch=2) as cache:
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.conn.execute("UPDATE push_cache SET last_used = 0")
+        cache.conn.commit()
+        assert cache.get("a") == "1"
+        last_used = dict(cache.conn.execute("SELECT key, last_used FROM push_cache").fetchall())
+        assert last_used == {"a": 0, "b": 0}  # чтение не пишет в базу
+        assert cache.get("b") == "2"            # touch_batch отметок — одна запись
+        last_used = dict(cache.conn.execute("SELECT key, last_used FROM push_cache").fetchall())
+        assert last_used["a"] > 0 and last_used["b"] > 0
+        cache.get("a")
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.conn.execute("SELECT 1")
+
+
+def _renderer():
+    import os
+    from tasks.render_templates import TemplateRenderer
+    from utils.config_loader import load_templates
+
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "configs", "templates.yaml")
+    return TemplateRenderer(load_templates(path))
+
+
+def test_template_renderer_fills_fields_and_rejects_missing():
+    from tasks.render_templates import template_fields
+
+    renderer = _renderer()
+    data = {"name": "Айгерим", "best_value": 1234.5, "category_spend": {"Такси": 27400.0}, "top3": ["Такси"]}
+    text = renderer.render("Карта для путешествий", template_fields(data))
+    assert text.startswith("Айгерим, в июне у вас траты на такси 27 400 ₸.")
+    assert "≈1 234,50 ₸" in text
+
+    assert renderer.render("Кредитная карта", template_fields(data)) is None  # только одна топ-категория
+    assert renderer.render("Инвестиции", template_fields(data)).startswith("Айгерим, попробуйте")
+    assert renderer.render("Неизвестный продукт", template_fields(data)) is None
+
+
+def test_send_notifications_batch_template_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(send_notification, "OUTPUTS_DIR", str(tmp_path))
+    monkeypatch.setattr(send_notification, "CSV_FILE", str(tmp_path / "push_logs.csv"))
+    base = {"best_value": 10.0, "category_spend": {}, "top3": [], "summary": "s"}
+    items = [
+        {"client_profile": {"client_code": 1, "name": "Алия"}, "best_product": "Обмен валют", **base},
+        {"client_profile": {"client_code": 2, "name": "Ерлан"}, "best_product": "Обмен валют",
+         "rich_copy": True, **base},
+        {"client_profile": {"client_code": 3}, "best_product": "Обмен валют", **base},
+    ]
+    provider = FakeProvider()
+    texts = send_notifications_batch(items, renderer=_renderer(), provider=provider, rate_per_sec=1000)
+    assert texts[0].startswith("Алия, вы часто платите в валюте.")
+    assert texts[1].startswith("2: ") and texts[2].startswith("3: ")
+    assert provider.calls == 2
+
+
+def test_send_notifications_batch_sends_through_sender(tmp_path, monkeypatch):
+    monkeypatch.setattr(send_notification, "OUTPUTS_DIR", str(tmp_path))
+    monkeypatch.setattr(send_notification, "CSV_FILE", str(tmp_path / "push_logs.csv"))
+
+    class RecordingSender:
+        def send_many(self, messages):
+            self.messages = messages
+            return [{"token": m["token"], "ok": True, "invalid_token": False} for m in messages]
+
+    base = {"best_product": "Обмен валют", "best_value": 10.0, "category_spend": {}, "top3": [], "summary": "s"}
+    items = [
+        {"client_profile": {"client_code": 1, "name": "Алия", "fcm_token": "tok-1"}, **base},
+        {"client_profile": {"client_code": 2, "name": "Ерлан"}, **base},
+    ]
+    sender = RecordingSender()
+    send_notifications_batch(items, renderer=_renderer(), sender=sender, provider=FakeProvider())
+    assert [m["token"] for m in sender.messages] == ["tok-1"]
+    assert sender.messages[0]["body"].startswith("Алия, ")
@@ -0,0 +1,24 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from tasks.push_notification_redis import StreamConsumer, publish_notifications
+
+
+def test_publish_pipelined_and_consume_with_group():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    notifications = [(f"client_{i}", {"text": f"push {i}"}) for i in range(25)]
+
+    assert publish_notifications(notifications, client=client, batch_size=10) == 25
+    assert client.xlen("notifications") == 25
+
+    a = StreamConsumer("senders", "a", client=client, count=10, block_ms=None)
+    b = StreamConsumer("senders", "b", client=client, count=10, block_ms=None)  # группа уже есть
+    seen = []
+    while a.consume(seen.extend) + b.consume(seen.extend):
+        pass
+
+    assert sorted(client_id for _, client_id, _ in seen) == sorted(c for c, _ in notifications)
+    assert seen[0][2] == {"text": "push 0"}
+    assert client.xpending("notifications", "senders")["pending"] == 0
+
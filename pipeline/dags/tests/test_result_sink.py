@@ -0,0 +1,69 @@
+import os
+
+import pandas as pd
+import pytest
+
+from utils.result_sink import ResultSink, read_dataset
+
+
+def test_result_sink_batches_partitions_and_commits(tmp_path):
+    sink = ResultSink(str(tmp_path), "recommendations", run_id="2025-09-01", writer_id="shard_0",
+                      batch_size=3, partition_by="rank")
+    for i in range(7):
+        sink.write({"client_code": i, "rank": 1 + i % 2, "product": "x"})
+    assert read_dataset(str(tmp_path), "recommendations", "2025-09-01").empty  # до commit ничего не видно
+
+    paths = sink.commit()
+    assert all(os.path.basename(p).startswith("part-shard_0-") for p in paths)
+    df = read_dataset(str(tmp_path), "recommendations", "2025-09-01")
+    assert sorted(df["client_code"]) == list(range(7))
+    assert set(df["rank"]) == {"1", "2"}
+    assert os.listdir(tmp_path / "recommendations" / "run=2025-09-01" / "_staging") == []
+
+
+def test_result_sink_writers_do_not_collide_and_retries_replace(tmp_path):
+    for writer, codes in (("shard_0", [1, 2]), ("shard_1", [3])):
+        with ResultSink(str(tmp_path), "push_logs", "r1", writer_id=writer) as sink:
+            sink.write_many(pd.DataFrame({"client_code": codes}))
+    with ResultSink(str(tmp_path), "push_logs", "r1", writer_id="shard_0") as sink:  # повтор таска
+        sink.write_many([{"client_code": 1}, {"client_code": 2}])
+
+    assert sorted(read_dataset(str(tmp_path), "push_logs", "r1")["client_code"]) == [1, 2, 3]
+
+    with pytest.raises(RuntimeError):
+        with ResultSink(str(tmp_path), "push_logs", "r1", writer_id="shard_1") as sink:
+            sink.write({"client_code": 99})
+            raise RuntimeError("task failed")
+    assert sorted(read_dataset(str(tmp_path), "push_logs", "r1")["client_code"]) == [1, 2, 3]
+
+
+def test_result_sink_write_frame_keeps_row_order_with_buffered_rows(tmp_path):
+    with ResultSink(str(tmp_path), "recs", "r1", writer_id="w", fmt="parquet", partition_by="as_of") as sink:
+        sink.write({"as_of": "2025-08-01", "client_code": 1})
+        sink.write_frame(pd.DataFrame({"as_of": ["2025-08-01", "2025-08-02"], "client_code": [2, 3]}))
+        sink.write_frame(pd.DataFrame({"as_of": [], "client_code": []}))
+
+    df = read_dataset(str(tmp_path), "recs", "r1")
+    assert df.groupby("as_of")["client_code"].apply(list).to_dict() == {"2025-08-01": [1, 2], "2025-08-02": [3]}
+
+
+def test_result_sink_retry_is_published_with_one_rename(tmp_path, monkeypatch):
+    from utils import result_sink
+
+    with ResultSink(str(tmp_path), "recs", "r1", writer_id="shard_0", batch_size=1) as sink:
+        sink.write_many([{"client_code": 1}, {"client_code": 2}])
+    run_dir = tmp_path / "recs" / "run=r1"
+    (first,) = [d for d in os.listdir(run_dir) if d.startswith("writer=")]
+
+    renames = []
+    real_rename = os.rename
+    monkeypatch.setattr(result_sink.os, "rename", lambda a, b: renames.append(b) or real_rename(a, b))
+    retry = ResultSink(str(tmp_path), "recs", "r1", writer_id="shard_0", batch_size=1)
+    retry.write_many([{"client_code": 3}, {"client_code": 4}, {"client_code": 5}])
+    # до commit читатель видит прошлую попытку целиком
+    assert sorted(read_dataset(str(tmp_path), "recs", "r1")["client_code"]) == [1, 2]
+    paths = retry.commit()
+
+    assert len(renames) == 1 and all(p.startswith(renames[0]) for p in paths)
+    assert sorted(read_dataset(str(tmp_path), "recs", "r1")["client_code"]) == [3, 4, 5]
+    assert first not in os.listdir(run_dir)
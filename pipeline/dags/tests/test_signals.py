@@ -10,3 +10,195 @@ def test_compute_signals_basic():
     signals = compute_signals(profile, df)
     assert signals["total_spend"] == 5000
     assert signals["travel_ratio"] > 0
+
+
+def _make_client_frames(n_clients=5, seed=0):
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    categories = ["Такси", "Отели", "Кафе и рестораны", "Едим дома", "Продукты питания", "jewelry"]
+    tx, tr = [], []
+    for code in range(1, n_clients + 1):
+        n = int(rng.integers(1, 30))
+        tx.append(pd.DataFrame({
+            "client_code": code,
+            "date": pd.Timestamp("2025-06-01") + pd.to_timedelta(rng.integers(0, 90, n), unit="D"),
+            "category": rng.choice(categories, n),
+            "amount": rng.integers(100, 50_000, n).astype(float),
+        }))
+        m = int(rng.integers(0, 10))
+        tr.append(pd.DataFrame({
+            "client_code": code,
+            "date": pd.Timestamp("2025-06-01"),
+            "type": rng.choice(["fx_buy", "p2p_out", "salary_in", "FX_sell"], m),
+            "direction": rng.choice(["in", "out"], m),
+            "amount": rng.integers(1_000, 200_000, m).astype(float),
+        }))
+    clients = pd.DataFrame({
+        "client_code": range(1, n_clients + 1),
+        "avg_monthly_balance_KZT": rng.integers(0, 500_000, n_clients).astype(float),
+    })
+    return pd.concat(tx, ignore_index=True), pd.concat(tr, ignore_index=True), clients
+
+
+def test_compute_signals_batch_matches_per_client():
+    import math
+    from tasks.compute_signals import compute_signals_batch, signals_for_client
+
+    tx, tr, clients = _make_client_frames(n_clients=20)
+    table = compute_signals_batch(tx, tr, clients)
+    assert list(table.index) == sorted(tx["client_code"].unique())
+
+    for code in table.index:
+        expected = compute_signals({
+            "transactions": tx[tx["client_code"] == code],
+            "transfers": tr[tr["client_code"] == code],
+            "avg_monthly_balance": clients.set_index("client_code").loc[code, "avg_monthly_balance_KZT"],
+        })
+        got = signals_for_client(table, code)
+        assert got.keys() == expected.keys()
+        for key, value in expected.items():
+            if isinstance(value, float) and math.isnan(value):
+                assert math.isnan(got[key]), key
+            elif isinstance(value, (dict, list, str)) or value is None:
+                assert got[key] == value, key
+            else:
+                assert math.isclose(got[key], value, rel_tol=1e-9, abs_tol=1e-9), key
+
+
+def test_load_data_typed_and_cached(tmp_path):
+    import os
+    import pandas as pd
+    from tasks.compute_signals import compute_signals_batch, signals_for_client
+    from tasks.load_data import load_data
+
+    tx, tr, clients = _make_client_frames(n_clients=4, seed=5)
+    tx.assign(name="x").to_csv(tmp_path / "tx.csv", index=False)
+    tr.to_csv(tmp_path / "tr.csv", index=False)
+    clients.to_csv(tmp_path / "clients.csv", index=False)
+    paths = [str(tmp_path / n) for n in ("tx.csv", "tr.csv", "clients.csv")]
+
+    tx1, tr1, clients1 = load_data(*paths)
+    assert isinstance(tx1["category"].dtype, pd.CategoricalDtype)
+    assert tx1["amount"].dtype == "float32"
+    assert pd.api.types.is_datetime64_any_dtype(tx1["date"])
+    assert "name" not in tx1.columns
+    assert len(os.listdir(tmp_path / ".cache")) == 3
+
+    tx2, _, _ = load_data(*paths)
+    pd.testing.assert_frame_equal(tx1, tx2)
+
+    table = compute_signals_batch(tx1, tr1, clients1)
+    code = table.index[0]
+    expected = compute_signals({
+        "transactions": tx1[tx1["client_code"] == code],
+        "transfers": tr1[tr1["client_code"] == code],
+        "avg_monthly_balance": 0.0,
+    })
+    got = signals_for_client(table, code)
+    assert got["top_categories"] == expected["top_categories"]
+    assert got["category_count"] == expected["category_count"]
+
+
+def test_compute_signals_streaming_matches_batch(tmp_path):
+    import math
+    from tasks.compute_signals import compute_signals_batch
+    from tasks.load_data import load_data
+    from tasks.stream_signals import compute_signals_streaming
+
+    tx, tr, clients = _make_client_frames(n_clients=15, seed=6)
+    tx.to_csv(tmp_path / "tx.csv", index=False)
+    tr.to_csv(tmp_path / "tr.csv", index=False)
+    clients.to_csv(tmp_path / "clients.csv", index=False)
+    paths = [str(tmp_path / n) for n in ("tx.csv", "tr.csv", "clients.csv")]
+
+    expected = compute_signals_batch(*load_data(*paths))
+    streamed = compute_signals_streaming(*paths, chunksize=7)
+
+    assert list(streamed.index) == list(expected.index)
+    assert list(streamed.columns) == list(expected.columns)
+    for code in expected.index:
+        for key in expected.columns:
+            want, got = expected.loc[code, key], streamed.loc[code, key]
+            if isinstance(want, float) and math.isnan(want):
+                assert math.isnan(got), key
+            elif isinstance(want, dict):
+                assert want.keys() == got.keys(), key
+                assert all(math.isclose(want[c], got[c], rel_tol=1e-6) for c in want), key
+            elif isinstance(want, (list, str)):
+                assert want == got, key
+            else:
+                assert math.isclose(want, got, rel_tol=1e-6, abs_tol=1e-9), key
+
+
+def test_incremental_state_matches_batch_over_window(tmp_path):
+    import math
+    import numpy as np
+    import pandas as pd
+    from tasks.compute_signals import compute_signals_batch
+    from tasks.incremental_signals import empty_state, load_state, save_state, signals_from_state, update_state
+
+    tx, tr, clients = _make_client_frames(n_clients=15, seed=7)
+    tx = tx.sort_values("date", kind="stable", ignore_index=True)
+    rng = np.random.default_rng(7)
+    tr["date"] = pd.Timestamp("2025-06-01") + pd.to_timedelta(rng.integers(0, 90, len(tr)), unit="D")
+    balances = clients.set_index("client_code")["avg_monthly_balance_KZT"]
+    cutoff, as_of, window = pd.Timestamp("2025-07-15"), pd.Timestamp("2025-08-29"), 60
+
+    state = update_state(empty_state(), tx[tx["date"] < cutoff], tr[tr["date"] < cutoff], window_days=window)
+    save_state(state, str(tmp_path))
+    state = update_state(load_state(str(tmp_path)), tx, tr, as_of=as_of, window_days=window)
+    got = signals_from_state(state, balances)
+
+    start = as_of - pd.Timedelta(days=window - 1)
+    in_window_tx = tx[(tx["date"] >= start) & (tx["date"] <= as_of)]
+    in_window_tr = tr[(tr["date"] >= start) & (tr["date"] <= as_of)]
+    expected = compute_signals_batch(in_window_tx, in_window_tr, clients)
+
+    assert list(got.index) == list(expected.index)
+    for code in expected.index:
+        for key in ("total_spend", "travel_count", "fx_activity", "cash_gap_ratio", "spending_stability", "top_spend"):
+            want, have = expected.loc[code, key], got.loc[code, key]
+            assert (math.isnan(want) and math.isnan(have)) or math.isclose(want, have, rel_tol=1e-9), key
+        assert got.loc[code, "top_categories"] == expected.loc[code, "top_categories"]
+        assert got.loc[code, "category_count"] == expected.loc[code, "category_count"]
+
+
+def test_category_registry_codes_and_group_sums():
+    import numpy as np
+    import pandas as pd
+    from tasks.compute_signals import _group_sums, aggregate_transactions
+    from utils.categories import CategoryRegistry
+
+    registry = CategoryRegistry({"a": ["x", "y"], "b": ["y", "z"]})
+    codes = registry.encode(pd.Series(["y", "new", "x", "y", None]))
+    assert codes[0] == codes[3] == registry.codes["y"] and codes[4] == -1
+    assert registry.membership(codes, ["a", "b"]).tolist() == [
+        [True, True], [False, False], [True, False], [True, True], [False, False],
+    ]
+    assert (registry.encode(pd.Series(["new", "z"], dtype="category")) == [codes[1], registry.codes["z"]]).all()
+
+    tx, _, _ = _make_client_frames(n_clients=15, seed=9)
+    by_category, _ = aggregate_transactions(tx.astype({"category": "category"}))
+    amount, count = _group_sums(by_category, ["travel", "premium", "jewelry"])
+    for name, cats in {"travel": ["Путешествия", "Отели", "Такси"], "jewelry": ["jewelry"]}.items():
+        expected = tx[tx["category"].isin(cats)].groupby("client_code")["amount"].agg(["sum", "size"])
+        expected = expected.reindex(amount.index, fill_value=0)
+        assert np.allclose(amount[name], expected["sum"])
+        assert (count[name] == expected["size"]).all()
+
+
+def test_registry_is_read_only_and_per_client_signals_cover_all_groups():
+    import pandas as pd
+    from tasks.compute_signals import SIGNAL_KEYS
+    from utils.categories import REGISTRY, SPEND_GROUPS
+
+    size = len(REGISTRY.codes)
+    assert (REGISTRY.encode(pd.Series(["unseen_1", "unseen_2"])) == -1).all()
+    assert len(REGISTRY.codes) == size == len(REGISTRY.masks)
+
+    tx, tr, clients = _make_client_frames(n_clients=1, seed=2)
+    signals = compute_signals({"transactions": tx, "transfers": tr, "avg_monthly_balance": 1.0})
+    assert list(signals) == SIGNAL_KEYS
+    for group in SPEND_GROUPS:
+        assert {f"{group}_spend", f"{group}_count", f"{group}_share"} <= set(signals)
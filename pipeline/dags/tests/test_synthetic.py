@@ -0,0 +1,28 @@
+from benchmarks.hot_path import compare, run_size
+from tasks.compute_signals import compute_signals_batch
+from tasks.load_data import load_data
+from utils.synthetic import CATEGORIES, generate_frames, write_csv
+
+
+def test_generate_frames_is_deterministic_and_loadable(tmp_path):
+    tx, tr, clients = generate_frames(50, seed=7)
+    again, _, _ = generate_frames(50, seed=7)
+    assert tx.equals(again)
+    assert set(tx["client_code"]) == set(clients["client_code"])
+    assert set(tx["category"].astype(str)) <= set(CATEGORIES)
+    assert set(tr["direction"].astype(str)) <= {"in", "out"}
+
+    paths = write_csv(str(tmp_path), tx, tr, clients)
+    tx2, tr2, clients2 = load_data(paths["transactions"], paths["transfers"], paths["clients"])
+    assert len(tx2) == len(tx) and len(tr2) == len(tr) and len(clients2) == len(clients)
+    assert len(compute_signals_batch(tx2, tr2, clients2)) == len(clients)
+
+
+def test_run_size_reports_every_stage(tmp_path):
+    records = run_size(100, str(tmp_path))
+    assert [r["stage"] for r in records] == [
+        "load_data", "compute_signals_batch", "compute_products_batch", "select_top_k"]
+    assert all(r["clients"] == 100 and r["seconds"] >= 0 and r["peak_rss_mb"] > 0 for r in records)
+
+    slower = {"results": [dict(r, seconds=r["seconds"] * 2 + 1) for r in records]}
+    assert all(row[-1] for row in compare(slower, {"results": records}))
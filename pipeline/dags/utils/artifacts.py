@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Общая директория для промежуточных данных между тасками (volume, смонтированный на всех воркерах).
+# Через XCom передаются только пути к файлам.
+ARTIFACTS_DIR = os.getenv("RECO_ARTIFACTS_DIR", "/opt/airflow/artifacts")
+
+_JSON_COLUMNS_KEY = b"reco_json_columns"
+
+
+def artifact_path(run_key, name, root=None):
+    return os.path.join(root or ARTIFACTS_DIR, str(run_key), f"{name}.arrow")
+
+
+def _is_nested(column):
+    first = column.dropna()
+    return not first.empty and isinstance(first.iloc[0], (dict, list))
+
+
+def write_frame(df, run_key, name, root=None):
+    """
+    Пишет DataFrame в Arrow IPC (feather v2, без сжатия — чтобы читать через memory map)
+    и возвращает путь. Запись атомарная: tmp-файл + os.replace.
+    dict/list-колонки (category_spend, top_categories) сохраняются как JSON-строки.
+    """
+    path = artifact_path(run_key, name, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    json_columns = [c for c in df.columns if df[c].dtype == object and _is_nested(df[c])]
+    if json_columns:
+        df = df.assign(**{
+            c: df[c].map(lambda v: None if v is None else json.dumps(v, ensure_ascii=False))
+            for c in json_columns
+        })
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_JSON_COLUMNS_KEY] = json.dumps(json_columns).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_table(path):
+    """Arrow-таблица поверх memory map: данные читаются с диска по мере обращения, без копии в heap."""
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_frame(path, columns=None):
+    table = read_table(path)
+    if columns is not None:
+        index_columns = [c for c in table.schema.pandas_metadata["index_columns"] if isinstance(c, str)]
+        table = table.select(index_columns + [c for c in columns if c not in index_columns])
+    df = table.to_pandas()
+    json_columns = json.loads((table.schema.metadata or {}).get(_JSON_COLUMNS_KEY, b"[]"))
+    for c in json_columns:
+        if c in df.columns:
+            df[c] = df[c].map(lambda v: None if v is None else json.loads(v))
+    return df
+
+
+def remove_run(run_key, root=None):
+    shutil.rmtree(os.path.join(root or ARTIFACTS_DIR, str(run_key)), ignore_errors=True)
@@ -1,3 +1,73 @@
+import numpy as np
+import pandas as pd
+
 TRAVEL_CATEGORIES = ["Путешествия", "Отели", "Такси"]
 PREMIUM_CATEGORIES = ["Ювелирные украшения", "Косметика и Парфюмерия", "Кафе и рестораны"]
 ONLINE_CATEGORIES = ["Едим дома", "Смотрим дома", "Играем дома"]
+# Повседневные категории: вместе со списками выше — полный справочник категорий трат
+EVERYDAY_CATEGORIES = ["Продукты питания", "Одежда и обувь", "Медицина", "Авто", "АЗС", "Спорт", "Развлечения",
+                       "Кино", "Питомцы", "Книги", "Цветы", "Подарки", "Ремонт дома", "Мебель", "Спа и массаж"]
+# Proxy-флаг jewelry_need: любитель роскоши / украшений среди топ-категорий
+JEWELRY_CATEGORIES = ["jewelry", "luxury", "boutique", "elite_restaurant"]
+
+# Группы, по которым считаются сигналы <group>_spend / _count / _share; новая группа — новая строка здесь
+SPEND_GROUPS = {
+    "travel": TRAVEL_CATEGORIES,
+    "premium": PREMIUM_CATEGORIES,
+    "online": ONLINE_CATEGORIES,
+}
+# все группы справочника: бит в маске категории — позиция группы в этом словаре
+GROUPS = {**SPEND_GROUPS, "jewelry": JEWELRY_CATEGORIES}
+
+
+class CategoryRegistry:
+    """
+    Справочник категорий: строка -> целочисленный код (один раз на категорию) и код -> битовая маска групп.
+    После создания только читается: неизвестные категории получают код -1 (ни в одной группе),
+    поэтому общий REGISTRY не растёт и безопасен из нескольких потоков (serving.online).
+
+        codes = REGISTRY.encode(df["category"])
+        member = REGISTRY.membership(codes, ["travel", "premium"])   # bool (строки × группы)
+    """
+
+    def __init__(self, groups):
+        if len(groups) > 64:
+            raise ValueError("CategoryRegistry supports at most 64 groups")
+        self.bits = {name: bit for bit, name in enumerate(groups)}
+        self.codes = {}
+        masks = []
+        for name, categories in groups.items():
+            for category in categories:
+                code = self._code(category, masks)
+                masks[code] |= 1 << self.bits[name]
+        self.masks = np.array(masks, dtype=np.uint64)
+
+    def _code(self, category, masks):
+        code = self.codes.get(category)
+        if code is None:
+            code = self.codes[category] = len(self.codes)
+            masks.append(0)
+        return code
+
+    def encode(self, categories):
+        """
+        Коды для последовательности/Series категорий. Словарь смотрится один раз на уникальное значение,
+        неизвестная категория и NaN — код -1.
+        """
+        if isinstance(getattr(categories, "dtype", None), pd.CategoricalDtype):
+            categorical = pd.Categorical(categories)
+            uniques, positions = categorical.categories, categorical.codes
+        else:
+            positions, uniques = pd.factorize(np.asarray(categories, dtype=object))
+        lookup = np.array([self.codes.get(c, -1) for c in uniques] + [-1], dtype=np.int64)
+        # позиция -1 (NaN) -> последний элемент lookup, код -1
+        return lookup[positions]
+
+    def membership(self, codes, groups):
+        """bool-матрица (len(codes) × len(groups)): входит ли категория в группу. Код -1 — ни в одну."""
+        bits = np.array([self.bits[g] for g in groups], dtype=np.uint64)
+        masks = np.where(codes >= 0, self.masks[np.maximum(codes, 0)], np.uint64(0))
+        return ((masks[:, None] >> bits) & np.uint64(1)).astype(bool)
+
+
+REGISTRY = CategoryRegistry(GROUPS)
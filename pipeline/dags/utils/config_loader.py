@@ -1,22 +1,120 @@
 import yaml
 import json
 import os
+from dataclasses import dataclass, fields
 
-def load_airflow_vars():
-    path = "/opt/airflow/configs/airflow_variables.json"
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Config file not found: {path}")
+from utils.product_spec import compile_products
+
+AIRFLOW_VARS_PATH = "/opt/airflow/configs/airflow_variables.json"
+# configs/products.yaml из репозитория (в контейнере dags/../configs — это /opt/airflow/configs)
+DEFAULT_PRODUCTS_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "configs", "products.yaml")
+)
+
+# (path, parse) -> (mtime_ns, распарсенное значение); общий на процесс воркера
+_cache = {}
+# path -> (mtime_ns, BusinessParams, ProductPlan)
+_plans = {}
+
+
+def _load_cached(path, parse):
+    """
+    Парсит файл один раз и отдаёт закешированное значение, пока не изменится mtime.
+    Значения общие для всех вызывающих — не изменяйте их на месте.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    key = (path, parse)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    value = parse(path)
+    _cache[key] = (mtime, value)
+    return value
+
+
+def _read_json(path):
     with open(path) as f:
         return json.load(f)
 
-def load_config(path=None):
-    airflow_vars = load_airflow_vars()
-    path = path or airflow_vars["business_params"]
+
+def _read_yaml(path):
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
+
+def load_airflow_vars():
+    path = AIRFLOW_VARS_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Config file not found: {path}")
+    return _load_cached(path, _read_json)
+
+def load_config(path=None):
+    path = path or load_airflow_vars()["business_params"]
+    return _load_cached(path, _read_yaml)
+
 def load_templates(path=None):
-    airflow_vars = load_airflow_vars()
-    path = path or airflow_vars["templates"]
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+    path = path or load_airflow_vars()["templates"]
+    return _load_cached(path, _read_yaml)
+
+
+@dataclass(frozen=True)
+class BusinessParams:
+    """
+    Ставки из configs/business_params.yaml; значения по умолчанию — те же, что в yaml.
+    Их читают и план configs/products.yaml (батч), и score_* в tasks.compute_benefits (скоринг одного клиента),
+    поэтому оба пути считают одинаково. Годовые ставки (*_annual, *_annual_return) переводятся
+    в выгоду KZT/мес как rate / 12 * avg_balance. from_dict отвергает неизвестные ключи.
+    """
+    travel_cashback_rate: float = 0.04
+    premium_base_rate: float = 0.02
+    premium_high_balance_rate: float = 0.04
+    premium_balance_threshold: float = 100_000.0
+    premium_category_bonus: float = 0.04
+    # кешбэк кредитной карты в топ-3 категориях и онлайн
+    credit_card_rate_top3: float = 0.10
+    credit_card_online_rate: float = 0.10
+    fx_saving_per_tx: float = 500.0
+    # доля денежного разрыва, которую клиент закрывает сам: кредит наличными предлагается выше неё
+    loan_value_buffer_rate: float = 0.5
+    cash_loan_max_benefit: float = 150_000.0
+    deposit_multicurr_rate_annual: float = 0.03
+    deposit_saving_frozen_rate_annual: float = 0.06
+    deposit_accumulative_rate_annual: float = 0.04
+    investment_expected_annual_return: float = 0.05
+    gold_expected_annual_return: float = 0.02
+    # потолок выгоды кешбэчных карт (путешествия, премиальная, кредитная), KZT
+    cashback_cap: float = 200_000.0
+
+    @classmethod
+    def from_dict(cls, raw):
+        known = {f.name for f in fields(cls)}
+        unknown = set(raw or {}) - known
+        if unknown:
+            raise ValueError(f"Unknown business params: {sorted(unknown)}")
+        return cls(**{k: float(v) for k, v in (raw or {}).items()})
+
+
+def load_business_params(path=None):
+    """BusinessParams из yaml; перечитывается только при изменении файла."""
+    path = path or load_airflow_vars()["business_params"]
+    return _load_cached(path, _read_business_params)
+
+
+def _read_business_params(path):
+    return BusinessParams.from_dict(_read_yaml(path))
+
+
+def load_product_plan(path=None, params=None):
+    """
+    products.yaml, скомпилированный в utils.product_spec.ProductPlan со ставками params
+    (по умолчанию BusinessParams()). Компилируется один раз на (файл, mtime, params).
+    """
+    path = path or load_airflow_vars().get("products", DEFAULT_PRODUCTS_PATH)
+    params = params or BusinessParams()
+    mtime = os.stat(path).st_mtime_ns
+    hit = _plans.get(path)
+    if hit is not None and hit[0] == mtime and hit[1] == params:
+        return hit[2]
+    plan = compile_products(_load_cached(path, _read_yaml), params)
+    _plans[path] = (mtime, params, plan)
+    return plan
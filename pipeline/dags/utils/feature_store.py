@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Персистентный feature store сигналов: версия на день, читается через memory map
+FEATURE_STORE_DIR = os.getenv("RECO_FEATURE_STORE_DIR", "/opt/airflow/state/features")
+# сколько опубликованных версий оставлять (читатели старой версии дочитывают её, пока она не удалена)
+KEEP_VERSIONS = 3
+
+_EMPTY = np.iinfo(np.int64).min  # пустой слот хеш-индекса
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MASK64 = (1 << 64) - 1
+
+# Версия — директория <root>/versions/<version>/:
+#   meta.json           — число строк, колонки и dtypes, параметры индекса
+#   client_code.bin     — int64, строка -> client_code
+#   num_<i>.bin         — числовые сигналы, по файлу на колонку (fixed-width, memmap)
+#   details.bin         — JSON переменных полей (category_spend, top_categories, ...) подряд
+#   details_offsets.bin — int64, rows + 1 смещений в details.bin
+#   index_keys.bin / index_rows.bin — open addressing хеш-таблица client_code -> строка
+# <root>/CURRENT содержит имя текущей версии и подменяется атомарно.
+
+
+def _home_slots(keys, bits):
+    # Fibonacci hashing: старшие bits бит от key * 2^64/φ
+    return (keys.astype(np.uint64) * _GOLDEN) >> np.uint64(64 - bits)
+
+
+def build_index(codes):
+    """
+    Хеш-индекс client_code -> номер строки с линейным пробированием, заполнение не больше 1/2.
+    Строится векторно: на каждом раунде ключ занимает свой слот, если тот свободен и ключ первый
+    из претендентов, остальные сдвигаются на следующий слот.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    bits = max(4, int(np.ceil(np.log2(max(len(codes), 1) * 2))))
+    capacity = 1 << bits
+    keys = np.full(capacity, _EMPTY, dtype=np.int64)
+    rows = np.full(capacity, -1, dtype=np.int64)
+
+    pending = np.arange(len(codes))
+    slots = _home_slots(codes, bits).astype(np.int64)
+    while len(pending):
+        free = keys[slots] == _EMPTY
+        # среди претендентов на один свободный слот побеждает первый
+        _, first = np.unique(slots[free], return_index=True)
+        winners = np.flatnonzero(free)[first]
+        keys[slots[winners]] = codes[pending[winners]]
+        rows[slots[winners]] = pending[winners]
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[winners] = True
+        pending, slots = pending[~placed], (slots[~placed] + 1) & (capacity - 1)
+    return keys, rows, bits
+
+
+def _is_numeric(column):
+    return pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.is_bool_dtype(column.dtype)
+
+
+def _details_json(value):
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def publish_features(tables, root=None, version=None, keep=KEEP_VERSIONS):
+    """
+    Публикует сигналы (DataFrame index client_code из compute_signals_batch или список/генератор
+    таких кадров — например, по шардам) как новую версию store и переключает на неё CURRENT.
+
+    Кадры пишутся дописыванием по одному, поэтому в памяти одновременно только текущий.
+    Колонки числовых dtypes — в fixed-width файлы, остальные (dict/list/str) — JSON в details.bin.
+    Возвращает путь версии.
+    """
+    root = root or FEATURE_STORE_DIR
+    version = version or uuid.uuid4().hex[:12]
+    if isinstance(tables, pd.DataFrame):
+        tables = [tables]
+    versions_dir = os.path.join(root, "versions")
+    tmp_dir = os.path.join(versions_dir, f".{version}.{uuid.uuid4().hex[:8]}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        numeric, details, rows = None, None, 0
+        files = {}
+        offset = 0
+        offsets = [np.zeros(1, dtype=np.int64)]
+        for table in tables:
+            if numeric is None:
+                numeric = {c: table[c].dtype.str for c in table.columns if _is_numeric(table[c])}
+                details = [c for c in table.columns if c not in numeric]
+                files = {name: open(os.path.join(tmp_dir, name), "ab") for name in
+                         ["client_code.bin", "details.bin"] + [f"num_{i}.bin" for i in range(len(numeric))]}
+            missing = (set(numeric) | set(details)) - set(table.columns)
+            if missing:
+                raise ValueError(f"feature table is missing columns: {sorted(missing)}")
+
+            files["client_code.bin"].write(table.index.to_numpy(dtype=np.int64).tobytes())
+            for i, (column, dtype) in enumerate(numeric.items()):
+                files[f"num_{i}.bin"].write(table[column].to_numpy(dtype=dtype).tobytes())
+            blobs = [
+                json.dumps({c: _details_json(v) for c, v in zip(details, values)},
+                           ensure_ascii=False, separators=(",", ":")).encode()
+                for values in zip(*(table[c].tolist() for c in details))
+            ] if details else [b"{}"] * len(table)
+            files["details.bin"].write(b"".join(blobs))
+            lengths = np.fromiter((len(b) for b in blobs), dtype=np.int64, count=len(blobs))
+            offsets.append(offset + np.cumsum(lengths))
+            offset += int(lengths.sum())
+            rows += len(table)
+        for f in files.values():
+            f.close()
+        if numeric is None:
+            raise ValueError("no feature tables to publish")
+        np.concatenate(offsets).tofile(os.path.join(tmp_dir, "details_offsets.bin"))
+
+        codes = np.fromfile(os.path.join(tmp_dir, "client_code.bin"), dtype=np.int64)
+        if len(np.unique(codes)) != len(codes):
+            raise ValueError("duplicate client_code in feature tables")
+        keys, index_rows, bits = build_index(codes)
+        keys.tofile(os.path.join(tmp_dir, "index_keys.bin"))
+        index_rows.tofile(os.path.join(tmp_dir, "index_rows.bin"))
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "rows": rows, "numeric": list(numeric.items()),
+                       "details": details, "index_bits": bits}, f, ensure_ascii=False)
+
+        final_dir = os.path.join(versions_dir, version)
+        shutil.rmtree(final_dir, ignore_errors=True)  # повтор публикации той же версии
+        os.rename(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    tmp_current = os.path.join(root, f"CURRENT.{uuid.uuid4().hex}.tmp")
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_current, os.path.join(root, "CURRENT"))
+    _prune(versions_dir, version, keep)
+    return final_dir
+
+
+def _prune(versions_dir, current, keep):
+    # по времени публикации; уже открытые memmap'ы удалённой версии продолжают работать (POSIX)
+    names = [n for n in os.listdir(versions_dir) if not n.startswith(".")]
+    names.sort(key=lambda n: os.stat(os.path.join(versions_dir, n)).st_mtime)
+    stale = names[:-keep] if keep else []
+    for name in stale:
+        if name != current:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+
+class FeatureStore:
+    """
+    Чтение версии store: все файлы открыты как np.memmap (mode="r"), поэтому процессы,
+    открывшие одну версию, делят страницы page cache, а не копируют данные в свой heap.
+
+        store = FeatureStore.open()          # текущая версия (CURRENT)
+        store.get(client_code)               # dict сигналов как signals_for_client или None
+        store.column("avg_balance")          # memmap всей колонки
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.version = meta["version"]
+        self.rows = meta["rows"]
+        self.details = meta["details"]
+        self._bits = meta["index_bits"]
+        self._mask = (1 << self._bits) - 1
+        self._numeric = {name: self._map(f"num_{i}.bin", dtype) for i, (name, dtype) in enumerate(meta["numeric"])}
+        self.codes = self._map("client_code.bin", np.int64)
+        self._offsets = self._map("details_offsets.bin", np.int64)
+        self._blob = self._map("details.bin", np.uint8)
+        self._keys = self._map("index_keys.bin", np.int64)
+        self._rows = self._map("index_rows.bin", np.int64)
+
+    def _map(self, name, dtype):
+        path = os.path.join(self.path, name)
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    @classmethod
+    def open(cls, root=None):
+        root = root or FEATURE_STORE_DIR
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            version = f.read().strip()
+        return cls(os.path.join(root, "versions", version))
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self):
+        return list(self._numeric) + self.details
+
+    def row(self, client_code):
+        """Номер строки client_code или -1: хеш + линейное пробирование, O(1) в среднем."""
+        client_code = int(client_code)
+        slot = (((client_code & _MASK64) * int(_GOLDEN)) & _MASK64) >> (64 - self._bits)
+        while True:
+            key = self._keys[slot]
+            if key == client_code:
+                return int(self._rows[slot])
+            if key == _EMPTY:
+                return -1
+            slot = (slot + 1) & self._mask
+
+    def column(self, name):
+        return self._numeric[name]
+
+    def get(self, client_code):
+        i = self.row(client_code)
+        if i < 0:
+            return None
+        out = {name: values[i].item() for name, values in self._numeric.items()}
+        if self.details:
+            out.update(json.loads(self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()))
+        return out
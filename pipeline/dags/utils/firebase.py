@@ -1,5 +1,12 @@
-import requests
 import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import record_call
 
 FCM_URL = "https://fcm.googleapis.com/fcm/send"
 FCM_SERVER_KEY = "your_firebase_server_key"
@@ -23,6 +30,105 @@ def send_push_to_mobile(token, title, body, data=None):
     return r.json()
 
 
+# --- batch: пул соединений, ограниченный параллелизм, ретраи --- #
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# ошибки legacy FCM, после которых токен стоит удалить
+INVALID_TOKEN_ERRORS = {"InvalidRegistration", "NotRegistered", "MismatchSenderId"}
+
+
+class FcmBatchSender:
+    """
+    Отправка многих пушей через одну requests.Session (keep-alive пул на max_workers соединений)
+    и ThreadPoolExecutor на max_workers параллельных запросов.
+    Ретраит сетевые ошибки и RETRYABLE_STATUS с экспоненциальным backoff (учитывает Retry-After).
+    Пул закрывает close() или with FcmBatchSender(...) as sender.
+    """
+
+    def __init__(self, url=FCM_URL, server_key=FCM_SERVER_KEY, max_workers=32, timeout=10.0,
+                 attempts=3, backoff=0.5):
+        self.url = url
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"key={server_key}"
+        })
+
+    def _result(self, token, ok, status, error, attempts):
+        return {
+            "token": token,
+            "ok": ok,
+            "status": status,
+            "error": error,
+            "invalid_token": error in INVALID_TOKEN_ERRORS,
+            "attempts": attempts,
+        }
+
+    def send_one(self, message):
+        """message: {"token", "title", "body", "data"} -> результат по токену."""
+        token = message["token"]
+        payload = {
+            "to": token,
+            "notification": {"title": message.get("title", ""), "body": message.get("body", "")},
+            "data": message.get("data") or {}
+        }
+        status, error = None, None
+        for attempt in range(1, self.attempts + 1):
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                r = self.session.post(self.url, data=json.dumps(payload), timeout=self.timeout)
+                status = r.status_code
+                if status == 200:
+                    results = r.json().get("results") or [{}]
+                    error = results[0].get("error")
+                    if error != "Unavailable":
+                        record_call("fcm", time.perf_counter() - start, ok=error is None)
+                        return self._result(token, error is None, status, error, attempt)
+                elif status not in RETRYABLE_STATUS:
+                    record_call("fcm", time.perf_counter() - start, ok=False)
+                    return self._result(token, False, status, f"HTTP {status}", attempt)
+                else:
+                    error = f"HTTP {status}"
+                    retry_after = r.headers.get("Retry-After")
+            except requests.RequestException as e:
+                status, error = None, str(e)
+            record_call("fcm", time.perf_counter() - start, ok=False)
+            if attempt < self.attempts:
+                if retry_after and retry_after.isdigit():
+                    # раньше Retry-After сервер не примет: jitter только вверх
+                    time.sleep(float(retry_after) * random.uniform(1.0, 1.5))
+                else:
+                    time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        return self._result(token, False, status, error, self.attempts)
+
+    def send_many(self, messages):
+        """Результаты в порядке messages."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self.send_one, messages))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def invalid_tokens(results):
+    """Токены, которые FCM отверг как недействительные — их можно удалить из базы."""
+    return [r["token"] for r in results if r["invalid_token"]]
+
+
 # пример использования
 if __name__ == "__main__":
     token = "fcmtoken_from_mobile_app"
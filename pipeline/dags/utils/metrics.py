@@ -0,0 +1,192 @@
+import json
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from utils.result_sink import ResultSink, read_dataset
+
+# StatsD: свой хост RECO_STATSD_HOST или тот же, что у метрик Airflow (AIRFLOW__METRICS__STATSD_*)
+_AIRFLOW_STATSD_ON = os.getenv("AIRFLOW__METRICS__STATSD_ON", "false").lower() == "true"
+STATSD_HOST = os.getenv("RECO_STATSD_HOST") or (os.getenv("AIRFLOW__METRICS__STATSD_HOST") if _AIRFLOW_STATSD_ON else None)
+STATSD_PORT = int(os.getenv("RECO_STATSD_PORT") or os.getenv("AIRFLOW__METRICS__STATSD_PORT") or 8125)
+STATSD_PREFIX = os.getenv("RECO_STATSD_PREFIX", "reco")
+
+# внешние вызовы, которые считаются отдельно: число, ошибки, суммарная и максимальная латентность
+CALL_KINDS = ("llm", "fcm")
+METRICS_DATASET = "task_metrics"
+
+
+class StatsdClient:
+    """Fire-and-forget UDP в формате StatsD (name:value|ms / |c / |g). Без host ничего не шлёт."""
+
+    def __init__(self, host=STATSD_HOST, port=STATSD_PORT, prefix=STATSD_PREFIX):
+        self.prefix = prefix
+        self.address = (host, port) if host else None
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if host else None
+
+    def _send(self, name, value, kind):
+        if self._sock is None:
+            return
+        try:
+            self._sock.sendto(f"{self.prefix}.{name}:{value}|{kind}".encode(), self.address)
+        except OSError:
+            pass  # метрики не должны ронять таск
+
+    def timing(self, name, ms):
+        self._send(name, round(ms, 3), "ms")
+
+    def incr(self, name, value=1):
+        self._send(name, value, "c")
+
+    def gauge(self, name, value):
+        self._send(name, value, "g")
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса (Airflow исполняет каждый таск в отдельном процессе)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def record_call(kind, seconds, ok=True):
+    """Учёт внешнего вызова (kind из CALL_KINDS) в активном TaskMetrics; вне его — no-op."""
+    metrics = _active
+    if metrics is not None:
+        metrics.add_call(kind, seconds, ok)
+
+
+class TaskMetrics:
+    """
+    Замер одного таска: wall/CPU время, peak RSS, rows_in/rows_out и внешние вызовы.
+
+        with TaskMetrics("compute", run_id=ds, writer_id="shard_3", root=OUTPUT_DIR) as m:
+            m.rows_in = len(tx)
+            ...
+            m.rows_out = len(signals)
+
+    На выходе метрики уходят в StatsD (<prefix>.<task>.*) и строкой в датасет task_metrics
+    (ResultSink, один part-файл на writer_id — повтор таска заменяет свою строку).
+    Вызовы LLM/FCM учитываются через record_call из кода, который их делает.
+    """
+
+    def __init__(self, task, run_id, writer_id=None, root=None, statsd=None):
+        self.task = task
+        self.run_id = run_id
+        self.writer_id = writer_id or uuid.uuid4().hex[:8]
+        self.root = root
+        # свой клиент закрывается в __exit__; переданный снаружи — забота вызывающего
+        self._owns_statsd = statsd is None
+        self.statsd = statsd or StatsdClient()
+        self.rows_in = 0
+        self.rows_out = 0
+        self.calls = {kind: {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0} for kind in CALL_KINDS}
+        self.record = None
+        self._lock = threading.Lock()
+
+    def add_call(self, kind, seconds, ok=True):
+        ms = seconds * 1000
+        with self._lock:
+            stats = self.calls[kind]
+            stats["calls"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+        self.statsd.timing(f"{self.task}.{kind}.latency_ms", ms)
+        if not ok:
+            self.statsd.incr(f"{self.task}.{kind}.errors")
+
+    def __enter__(self):
+        global _active
+        with _active_lock:
+            self._previous, _active = _active, self
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        with _active_lock:
+            _active = self._previous
+        wall = time.perf_counter() - self._wall
+        self.record = {
+            "task": self.task,
+            "writer_id": self.writer_id,
+            "host": socket.gethostname(),
+            "ok": exc_type is None,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(time.process_time() - self._cpu, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_sec": round(self.rows_in / wall, 1) if wall else None,
+        }
+        for kind, stats in self.calls.items():
+            self.record.update({f"{kind}_{key}": round(value, 3) for key, value in stats.items()})
+
+        prefix = self.task
+        self.statsd.timing(f"{prefix}.wall_ms", self.record["wall_s"] * 1000)
+        self.statsd.timing(f"{prefix}.cpu_ms", self.record["cpu_s"] * 1000)
+        self.statsd.gauge(f"{prefix}.peak_rss_mb", self.record["peak_rss_mb"])
+        self.statsd.incr(f"{prefix}.rows_in", self.rows_in)
+        self.statsd.incr(f"{prefix}.rows_out", self.rows_out)
+        if self.record["rows_per_sec"] is not None:
+            self.statsd.gauge(f"{prefix}.rows_per_sec", self.record["rows_per_sec"])
+        for kind, stats in self.calls.items():
+            if stats["calls"]:
+                self.statsd.incr(f"{prefix}.{kind}.calls", stats["calls"])
+        if exc_type is not None:
+            self.statsd.incr(f"{prefix}.failed")
+        if self._owns_statsd:
+            self.statsd.close()
+
+        if self.root is not None:
+            with ResultSink(self.root, METRICS_DATASET, run_id=self.run_id,
+                            writer_id=f"{self.task}-{self.writer_id}") as sink:
+                sink.write(self.record)
+        return False
+
+
+def write_run_summary(root, run_id, path=None):
+    """
+    Сводка запуска по task_metrics: по таску — число попыток/шардов, суммы времени, строк и вызовов,
+    максимум RSS и throughput; плюс все строки по воркерам. Пишется атомарно в <root>/<run_id>/metrics.json.
+    """
+    df = read_dataset(root, METRICS_DATASET, run_id)
+    tasks = {}
+    if not df.empty:
+        sums = ["wall_s", "cpu_s", "rows_in", "rows_out"] + [f"{k}_{s}" for k in CALL_KINDS
+                                                             for s in ("calls", "errors", "total_ms")]
+        grouped = df.groupby("task", sort=False)
+        summary = grouped[sums].sum()
+        summary["writers"] = grouped.size()
+        summary["peak_rss_mb"] = grouped["peak_rss_mb"].max()
+        summary["max_wall_s"] = grouped["wall_s"].max()
+        for kind in CALL_KINDS:
+            summary[f"{kind}_max_ms"] = grouped[f"{kind}_max_ms"].max()
+        summary["rows_per_sec"] = (summary["rows_in"] / summary["wall_s"].where(summary["wall_s"] > 0)).round(1)
+        tasks = json.loads(summary.to_json(orient="index"))
+
+    doc = {
+        "run_id": run_id,
+        "tasks": tasks,
+        "workers": json.loads(df.to_json(orient="records")) if not df.empty else [],
+    }
+    path = path or os.path.join(root, str(run_id), "metrics.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,187 @@
+import ast
+
+import numpy as np
+
+_BINARY = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide,
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+    ast.And: np.logical_and, ast.Or: np.logical_or,
+}
+_FUNCTIONS = {"min": np.minimum, "max": np.maximum, "where": np.where, "abs": np.abs}
+# коммутативные операции: (a + b) и (b + a) — один узел плана
+_COMMUTATIVE = {np.add, np.multiply, np.minimum, np.maximum, np.equal, np.not_equal,
+                np.logical_and, np.logical_or}
+
+
+class ProductPlan:
+    """
+    Скомпилированные products.yaml: общий список узлов (колонки, константы, операции numpy)
+    без повторов и по индексу узла на benefit / usage / eligibility каждого продукта.
+    evaluate() проходит узлы один раз по порядку — цена на клиента не зависит от числа продуктов
+    в Python, только в numpy-операциях.
+    """
+
+    def __init__(self, products, alpha, beta, max_value, nodes, benefit, usage, when, defaults):
+        self.products = products
+        self.alpha = alpha
+        self.beta = beta
+        self.max_value = max_value
+        self.nodes = nodes
+        self.benefit = benefit
+        self.usage = usage
+        self.when = when
+        self.defaults = defaults
+
+    def _column(self, signals, name, resolvers):
+        if name in signals.columns:
+            return signals[name].to_numpy(dtype=float)
+        if name in resolvers:
+            return np.asarray(resolvers[name](signals), dtype=float)
+        if name in self.defaults:
+            return np.full(len(signals), float(self.defaults[name]))
+        raise KeyError(f"signal '{name}' is missing and has no default in products spec")
+
+    def evaluate_columns(self, signals, resolvers=None, variables=None):
+        """
+        [(benefit, usage)] по продуктам без выравнивания форм: массив на клиента (n,) или,
+        если формула зависит от переменных параметров, (V, n); константа — скаляр.
+        variables — {имя параметра: массив формы (V, 1)} для параметров, скомпилированных
+        как переменные (compile_products(..., variables=...)).
+        """
+        resolvers = resolvers or {}
+        variables = variables or {}
+        values = []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for kind, payload, args in self.nodes:
+                if kind == "const":
+                    values.append(payload)
+                elif kind == "column":
+                    values.append(self._column(signals, payload, resolvers))
+                elif kind == "param":
+                    values.append(variables[payload])
+                else:
+                    values.append(payload(*(values[i] for i in args)))
+        return [
+            (np.where(values[w], values[b], 0.0) if w is not None else values[b], values[u])
+            for b, u, w in zip(self.benefit, self.usage, self.when)
+        ]
+
+    def evaluate(self, signals, resolvers=None, variables=None):
+        """
+        (benefit, usage) — матрицы клиенты × products; benefit = 0 там, где when не выполнено.
+        С variables (см. evaluate_columns) — V × клиенты × products.
+        """
+        n = len(signals)
+        shape = (len(next(iter(variables.values()))), n) if variables else (n,)
+        if not self.products:
+            return np.zeros(shape + (0,)), np.zeros(shape + (0,))
+        columns = self.evaluate_columns(signals, resolvers, variables)
+        benefit = np.stack([np.broadcast_to(b, shape) for b, _ in columns], axis=-1)
+        usage = np.stack([np.broadcast_to(u, shape) for _, u in columns], axis=-1)
+        return benefit.astype(float), usage.astype(float)
+
+
+class _Compiler:
+    def __init__(self, params, variables=()):
+        self.params = params
+        self.variables = set(variables)
+        self.nodes = []
+        self._ids = {}
+
+    def _node(self, kind, payload, args=()):
+        key = (kind, payload if kind != "op" else id(payload), tuple(args))
+        if kind == "op" and payload in _COMMUTATIVE:
+            key = (kind, id(payload), tuple(sorted(args)))
+        if key not in self._ids:
+            self._ids[key] = len(self.nodes)
+            self.nodes.append((kind, payload, tuple(args)))
+        return self._ids[key]
+
+    def _op(self, fn, args):
+        # свёртка констант: параметры business_params подставлены на компиляции
+        if all(self.nodes[a][0] == "const" for a in args):
+            return self._node("const", float(fn(*(self.nodes[a][1] for a in args))))
+        return self._node("op", fn, args)
+
+    def compile(self, expr, where):
+        if isinstance(expr, (int, float)):
+            return self._node("const", float(expr))
+        try:
+            tree = ast.parse(str(expr), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"{where}: cannot parse '{expr}': {e}") from None
+        return self._visit(tree, where)
+
+    def _visit(self, node, where):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return self._node("const", float(node.value))
+        if isinstance(node, ast.Name):
+            if node.id in self.variables:
+                return self._node("param", node.id)
+            if self.params is not None and hasattr(self.params, node.id):
+                return self._node("const", float(getattr(self.params, node.id)))
+            return self._node("column", node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return self._op(_BINARY[type(node.op)], [self._visit(node.left, where), self._visit(node.right, where)])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self._op(np.negative, [self._visit(node.operand, where)])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self._op(np.logical_not, [self._visit(node.operand, where)])
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in _BINARY:
+            return self._op(_BINARY[type(node.ops[0])],
+                            [self._visit(node.left, where), self._visit(node.comparators[0], where)])
+        if isinstance(node, ast.BoolOp):
+            args = [self._visit(v, where) for v in node.values]
+            out = args[0]
+            for arg in args[1:]:
+                out = self._op(_BINARY[type(node.op)], [out, arg])
+            return out
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS \
+                and not node.keywords:
+            fn = _FUNCTIONS[node.func.id]
+            args = [self._visit(a, where) for a in node.args]
+            expected = {"where": 3, "abs": 1}.get(node.func.id, 2)
+            if len(args) != expected:
+                raise ValueError(f"{where}: {node.func.id}() takes {expected} arguments")
+            return self._op(fn, args)
+        raise ValueError(f"{where}: unsupported expression '{ast.unparse(node)}'")
+
+
+def compile_products(spec, params=None, variables=()):
+    """
+    products.yaml (dict) -> ProductPlan. params — utils.config_loader.BusinessParams: имена его полей
+    в формулах подставляются как константы, остальные имена — колонки таблицы сигналов.
+    variables — имена параметров, которые не подставляются, а передаются в evaluate() массивами
+    (перебор вариантов ставок за один проход, tasks.param_sweep).
+
+    Продукт: name, benefit (выражение), usage (выражение, по умолчанию 0), max_value, alpha, beta,
+    when (необязательное условие допуска: иначе benefit = 0 и utility = 0).
+    Выражения: + - * /, сравнения, and/or/not, min(a, b), max(a, b), where(cond, a, b), abs(x).
+    """
+    products = spec.get("products") or []
+    compiler = _Compiler(params, variables)
+    names, alpha, beta, max_value, benefit, usage, when = [], [], [], [], [], [], []
+    for i, product in enumerate(products):
+        name = product.get("name")
+        if not name:
+            raise ValueError(f"products[{i}]: name is required")
+        if name in names:
+            raise ValueError(f"products[{i}]: duplicate product '{name}'")
+        unknown = set(product) - {"name", "benefit", "usage", "max_value", "alpha", "beta", "when"}
+        if unknown:
+            raise ValueError(f"{name}: unknown keys {sorted(unknown)}")
+        for key in ("benefit", "max_value", "alpha", "beta"):
+            if key not in product:
+                raise ValueError(f"{name}: '{key}' is required")
+        names.append(name)
+        alpha.append(float(product["alpha"]))
+        beta.append(float(product["beta"]))
+        max_value.append(float(product["max_value"]))
+        benefit.append(compiler.compile(product["benefit"], f"{name}.benefit"))
+        usage.append(compiler.compile(product.get("usage", 0), f"{name}.usage"))
+        when.append(compiler.compile(product["when"], f"{name}.when") if "when" in product else None)
+    return ProductPlan(
+        names, np.array(alpha), np.array(beta), np.array(max_value),
+        compiler.nodes, benefit, usage, when, dict(spec.get("defaults") or {}),
+    )
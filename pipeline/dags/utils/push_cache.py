@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# SQLite-файл переживает запуски DAG; по умолчанию лежит в томе состояния
+PUSH_CACHE_PATH = os.getenv("PUSH_CACHE_PATH", "/opt/airflow/state/push_cache.sqlite")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 200_000
+# сколько отметок last_used копить в памяти до записи в базу
+TOUCH_BATCH = 1_000
+
+
+def bucket_amount(x) -> float:
+    """Округление до 2 значащих цифр: 123 456 -> 120 000. Близкие суммы попадают в один ключ."""
+    x = float(x or 0)
+    return float(f"{x:.2g}")
+
+
+# поля конкретного клиента: в ключ не входят, поэтому в модель для кешируемого текста не передаются —
+# текст из кеша получает каждый клиент с тем же fingerprint
+CLIENT_FIELDS = ("client_code", "client_id", "fcm_token", "name", "summary")
+
+
+def shared_payload(client_data: dict) -> dict:
+    """client_data без CLIENT_FIELDS: что видит модель, когда текст пишется в кеш."""
+    return {k: v for k, v in client_data.items() if k not in CLIENT_FIELDS}
+
+
+def fingerprint(provider: str, model: str, system_prompt: str, client_data: dict) -> str:
+    """
+    Ключ кеша по нормализованному payload: провайдер, модель, hash SYSTEM_PROMPT, продукт,
+    топ-категории и округлённые суммы. CLIENT_FIELDS в ключ не входят (см. shared_payload).
+    """
+    top3 = list(client_data.get("top3") or [])
+    spend = client_data.get("category_spend") or {}
+    normalized = {
+        "provider": provider,
+        "model": model,
+        "prompt": hashlib.sha256(system_prompt.encode()).hexdigest(),
+        "product": client_data.get("best_product"),
+        "value": bucket_amount(client_data.get("best_value")),
+        "balance": bucket_amount(client_data.get("avg_monthly_balance_KZT")),
+        "top3": top3,
+        "top3_spend": [bucket_amount(spend.get(c, 0)) for c in top3],
+    }
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+class PushCache:
+    """
+    Кеш сгенерированных текстов в SQLite (path=":memory:" — только в процессе).
+    Запись старше ttl считается промахом; при переполнении вытесняются давно не читанные (LRU).
+
+    Чтения не пишут в базу: отметки last_used копятся в памяти и пишутся одной транзакцией
+    раз в touch_batch попаданий, перед вытеснением и при close(). Число строк тоже считается в памяти,
+    COUNT(*) — только когда оценка превысила max_entries; тогда вытесняется запас до 90% ёмкости,
+    чтобы следующие set не вытесняли по одной строке. Соединение закрывает close() или with:
+
+        with PushCache() as cache:
+            ...
+    """
+
+    def __init__(self, path: str = None, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 touch_batch: int = TOUCH_BATCH):
+        self.path = path or PUSH_CACHE_PATH
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        if self.path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")  # параллельные mapped tasks читают без блокировок
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS push_cache ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS push_cache_last_used ON push_cache (last_used)")
+        self.conn.commit()
+        # оценка сверху: set с существующим ключом тоже +1, другие процессы не учитываются
+        self._count = len(self)
+        self._touched = {}
+        self._expired = set()
+
+    def get(self, key: str):
+        now = time.time()
+        row = self.conn.execute("SELECT text, created FROM push_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        text, created = row
+        if now - created > self.ttl:
+            self._expired.add(key)
+            return None
+        self._touched[key] = now
+        if len(self._touched) >= self.touch_batch:
+            self.flush()
+        return text
+
+    def set(self, key: str, text: str):
+        now = time.time()
+        self._touched.pop(key, None)
+        self._expired.discard(key)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO push_cache (key, text, created, last_used) VALUES (?, ?, ?, ?)",
+            (key, text, now, now),
+        )
+        self._count += 1
+        if self._count > self.max_entries:
+            self._evict()
+        self.conn.commit()
+
+    def flush(self):
+        """Пишет накопленные last_used и удаляет встреченные просроченные записи одной транзакцией."""
+        if self._touched:
+            self.conn.executemany("UPDATE push_cache SET last_used = ? WHERE key = ?",
+                                  [(t, k) for k, t in self._touched.items()])
+            self._touched = {}
+        if self._expired:
+            self.conn.executemany("DELETE FROM push_cache WHERE key = ?", [(k,) for k in self._expired])
+            self._expired = set()
+        self.conn.commit()
+
+    def _evict(self):
+        self.flush()  # LRU по актуальным last_used
+        count = len(self)
+        keep = self.max_entries - self.max_entries // 10
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM push_cache WHERE key IN"
+                " (SELECT key FROM push_cache ORDER BY last_used LIMIT ?)",
+                (count - keep,),
+            )
+            count = keep
+        self._count = count
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM push_cache").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,160 @@
+import csv
+import os
+import shutil
+import socket
+import time
+import uuid
+
+import pandas as pd
+
+
+class ResultSink:
+    """
+    Буферизованная запись строк в один датасет на запуск:
+
+        <root>/<dataset>/run=<run_id>/writer=<writer_id>.<version>/[<col>=<value>/]part-<writer_id>-<n>.<fmt>
+
+    Строки копятся в памяти и сбрасываются part-файлами по batch_size строк во временную
+    директорию _staging/<writer_id>.<version>/; commit() публикует её целиком одним os.rename.
+    У каждого писателя свой writer_id, поэтому параллельные mapped tasks не пересекаются.
+    Повтор таска с тем же writer_id публикует новую версию: read_dataset берёт у писателя только
+    последнюю, поэтому читатель видит либо все файлы прошлой попытки, либо все файлы новой,
+    а не смесь; старые версии удаляются после публикации.
+    """
+
+    def __init__(self, root, dataset, run_id, writer_id=None, batch_size=50_000, fmt="csv", partition_by=None):
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.dataset_dir = os.path.join(root, dataset, f"run={run_id}")
+        self.writer_id = writer_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # версия сортируется по времени: у писателя действует последняя опубликованная
+        self.version = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        self.staging_dir = os.path.join(self.dataset_dir, "_staging", f"{self.writer_id}.{self.version}")
+        self.batch_size = batch_size
+        self.fmt = fmt
+        self.partition_by = partition_by
+        self._rows = []
+        self._staged = []  # относительные пути part-файлов внутри staging_dir
+
+    def write(self, row: dict):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows):
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict(orient="records")
+        for row in rows:
+            self.write(row)
+
+    def write_frame(self, df):
+        """DataFrame целиком, минуя построчный буфер (большие батчи — например, backfill по датам)."""
+        self.flush()
+        if len(df):
+            self._stage(df)
+
+    def flush(self):
+        if not self._rows:
+            return
+        df = pd.DataFrame(self._rows)
+        self._rows = []
+        self._stage(df)
+
+    def _stage(self, df):
+        groups = df.groupby(self.partition_by, sort=False) if self.partition_by else [(None, df)]
+        for key, part in groups:
+            subdir = f"{self.partition_by}={key}" if self.partition_by else ""
+            name = f"part-{self.writer_id}-{len(self._staged):05d}.{self.fmt}"
+            path = os.path.join(self.staging_dir, subdir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.fmt == "csv":
+                part.to_csv(path, index=False, quoting=csv.QUOTE_MINIMAL)
+            else:
+                part.to_parquet(path, index=False)
+            self._staged.append(os.path.join(subdir, name))
+
+    def commit(self):
+        """Сбрасывает остаток буфера и публикует part-файлы. Возвращает их финальные пути."""
+        self.flush()
+        # пустая версия тоже публикуется: повтор без строк заменяет строки прошлой попытки
+        os.makedirs(self.staging_dir, exist_ok=True)
+        final_dir = os.path.join(self.dataset_dir, f"writer={self.writer_id}.{self.version}")
+        os.rename(self.staging_dir, final_dir)
+        for name in os.listdir(self.dataset_dir):
+            writer_id, version = _parse_writer_dir(name)
+            if writer_id == self.writer_id and version < self.version:
+                shutil.rmtree(os.path.join(self.dataset_dir, name), ignore_errors=True)  # прошлые попытки
+        paths = [os.path.join(final_dir, relative) for relative in self._staged]
+        self._staged = []
+        self.abort()
+        return paths
+
+    def abort(self):
+        """Отбрасывает буфер и неопубликованные файлы."""
+        self._rows = []
+        self._staged = []
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def _parse_writer_dir(name):
+    """"writer=<writer_id>.<version>" -> (writer_id, version); (None, None) для других имён."""
+    if not name.startswith("writer="):
+        return None, None
+    writer_id, _, version = name[len("writer="):].rpartition(".")
+    return writer_id, version
+
+
+def _latest_writer_dirs(dataset_dir):
+    latest = {}
+    for name in os.listdir(dataset_dir) if os.path.isdir(dataset_dir) else []:
+        writer_id, version = _parse_writer_dir(name)
+        if writer_id is not None and version > latest.get(writer_id, ("", ""))[0]:
+            latest[writer_id] = (version, name)
+    return sorted(name for _, name in latest.values())
+
+
+def read_dataset(root, dataset, run_id, attempts=3):
+    """
+    Все опубликованные part-файлы запуска одним DataFrame (колонка партиции восстанавливается из пути):
+    по последней версии каждого писателя. Если версию удалили во время чтения (её заменил повтор таска),
+    список версий перечитывается.
+    """
+    dataset_dir = os.path.join(root, dataset, f"run={run_id}")
+    for attempt in range(attempts):
+        try:
+            return _read_versions(dataset_dir, _latest_writer_dirs(dataset_dir))
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
+
+
+def _read_versions(dataset_dir, writer_dirs):
+    frames = []
+    for writer_dir in writer_dirs:
+        top = os.path.join(dataset_dir, writer_dir)
+        for dirpath, dirnames, filenames in os.walk(top, onerror=_raise):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.startswith("part-"):
+                    continue
+                path = os.path.join(dirpath, name)
+                df = pd.read_parquet(path) if name.endswith(".parquet") else pd.read_csv(path)
+                subdir = os.path.relpath(dirpath, top)
+                if subdir != ".":
+                    column, value = subdir.split("=", 1)
+                    df[column] = value
+                frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _raise(error):
+    raise error
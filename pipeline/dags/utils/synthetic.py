@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.categories import EVERYDAY_CATEGORIES, ONLINE_CATEGORIES, PREMIUM_CATEGORIES, TRAVEL_CATEGORIES
+
+# Синтетические данные в формате transactions.csv / transfers.csv / clients.csv для бенчмарков и тестов.
+CATEGORIES = EVERYDAY_CATEGORIES + TRAVEL_CATEGORIES + PREMIUM_CATEGORIES + ONLINE_CATEGORIES
+# базовая доля транзакций группы: повседневные траты чаще всего, путешествия и премиум реже
+_GROUP_WEIGHTS = [(EVERYDAY_CATEGORIES, 0.6), (TRAVEL_CATEGORIES, 0.1),
+                  (PREMIUM_CATEGORIES, 0.15), (ONLINE_CATEGORIES, 0.15)]
+# средний чек по группе, KZT (логнормальное распределение вокруг него)
+_GROUP_TICKET = [(EVERYDAY_CATEGORIES, 8_000), (TRAVEL_CATEGORIES, 45_000),
+                 (PREMIUM_CATEGORIES, 20_000), (ONLINE_CATEGORIES, 5_000)]
+
+TRANSFER_TYPES = ["salary_in", "stipend_in", "p2p_in", "card_in", "p2p_out", "card_out", "utilities_out",
+                  "loan_payment_out", "atm_withdrawal", "fx_buy", "fx_sell", "deposit_topup_out"]
+STATUSES = ["Стандартный клиент", "Зарплатный клиент", "Премиальный клиент", "Студент"]
+CITIES = ["Алматы", "Астана", "Шымкент", "Караганда", "Актобе"]
+PERIOD_START = pd.Timestamp("2025-06-01")
+PERIOD_DAYS = 90
+
+
+def _category_probs():
+    probs, tickets = [], []
+    for group, weight in _GROUP_WEIGHTS:
+        probs += [weight / len(group)] * len(group)
+    for group, ticket in _GROUP_TICKET:
+        tickets += [ticket] * len(group)
+    return np.array(probs), np.array(tickets, dtype=float)
+
+
+def generate_frames(n_clients, tx_per_client=40, tr_per_client=10, seed=0):
+    """
+    (transactions, transfers, clients) для n_clients клиентов за 90 дней.
+
+    У каждого клиента свой микс категорий: базовые доли групп, умноженные на
+    случайный «интерес» клиента (Dirichlet), поэтому у одних доминируют путешествия,
+    у других — онлайн или премиум. Число операций на клиента — Пуассон со средним
+    tx_per_client / tr_per_client. Генерация векторная, 1M клиентов укладывается в секунды.
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.arange(1, n_clients + 1, dtype=np.int64)
+    base, tickets = _category_probs()
+    n_cat = len(CATEGORIES)
+
+    # --- transactions: категория по персональному миксу (обратная функция распределения по строкам) ---
+    n_tx = np.maximum(rng.poisson(tx_per_client, n_clients), 1)
+    mix = base * rng.dirichlet(np.ones(n_cat), n_clients)
+    cdf = np.cumsum(mix / mix.sum(axis=1, keepdims=True), axis=1)
+    owner = np.repeat(np.arange(n_clients), n_tx)
+    u = rng.random(len(owner))
+    category = _sample_categories(cdf, owner, u)
+    amount = np.round(tickets[category] * rng.lognormal(0.0, 0.6, len(owner)), 2)
+    transactions = pd.DataFrame({
+        "client_code": codes[owner],
+        "date": PERIOD_START + pd.to_timedelta(rng.integers(0, PERIOD_DAYS, len(owner)), unit="D"),
+        "category": pd.Categorical.from_codes(category, CATEGORIES),
+        "amount": amount.astype("float32"),
+        "currency": "KZT",
+    })
+
+    # --- transfers ---
+    n_tr = rng.poisson(tr_per_client, n_clients)
+    owner = np.repeat(np.arange(n_clients), n_tr)
+    kind = rng.integers(0, len(TRANSFER_TYPES), len(owner))
+    types = np.array(TRANSFER_TYPES)[kind]
+    transfers = pd.DataFrame({
+        "client_code": codes[owner],
+        "date": PERIOD_START + pd.to_timedelta(rng.integers(0, PERIOD_DAYS, len(owner)), unit="D"),
+        "type": pd.Categorical(types, categories=TRANSFER_TYPES),
+        "direction": pd.Categorical(np.where(np.char.endswith(types, "_in"), "in", "out"), categories=["in", "out"]),
+        "amount": np.round(rng.lognormal(11.0, 0.8, len(owner)), 2).astype("float32"),
+        "currency": "KZT",
+    })
+
+    clients = pd.DataFrame({
+        "client_code": codes,
+        "name": [f"Клиент {c}" for c in codes],
+        "status": pd.Categorical(rng.choice(STATUSES, n_clients), categories=STATUSES),
+        "age": rng.integers(18, 70, n_clients).astype("float32"),
+        "city": pd.Categorical(rng.choice(CITIES, n_clients), categories=CITIES),
+        "avg_monthly_balance_KZT": np.round(rng.lognormal(12.5, 1.2, n_clients), 2),
+    })
+    return transactions, transfers, clients
+
+
+def _sample_categories(cdf, owner, u, chunk=1_000_000):
+    # кусками: bool-матрица (строки × категории) на десятки миллионов строк целиком не помещается в память
+    out = np.empty(len(owner), dtype=np.int64)
+    for start in range(0, len(owner), chunk):
+        sl = slice(start, start + chunk)
+        out[sl] = (u[sl, None] > cdf[owner[sl]]).sum(axis=1)
+    return out.clip(max=cdf.shape[1] - 1)
+
+
+def write_csv(out_dir, transactions, transfers, clients):
+    """Пишет кадры в out_dir как transactions.csv / transfers.csv / clients.csv; возвращает пути для load_data."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in ("transactions", "transfers", "clients")}
+    transactions.to_csv(paths["transactions"], index=False, date_format="%Y-%m-%d")
+    transfers.to_csv(paths["transfers"], index=False, date_format="%Y-%m-%d")
+    clients.to_csv(paths["clients"], index=False)
+    return paths